@@ -4,16 +4,127 @@ OCR Backend Flask应用
 """
 
 import os
+import shutil
+import importlib
 import logging
 import base64
 import tempfile
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from typing import Optional
+from urllib.parse import unquote
+from flask import Flask, Response, request, jsonify
+from werkzeug.exceptions import HTTPException
+
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台
+    fcntl = None
+
+# 模型链接完成标记文件，修改链接布局时需更新版本号
+MODEL_STAGING_SENTINEL = ".staged_v1"
+MODEL_STAGING_LOCK = ".staging.lock"
+
+
+def _link_file(src_file: Path, dst_file: Path) -> Optional[str]:
+    """
+    将文件链接到目标位置
+    
+    目标已指向源文件时直接跳过；否则优先使用硬链接（不占用额外磁盘，
+    读取时无需解析符号链接），跨设备等情况下依次回退到符号链接和复制。
+    
+    Returns:
+        Optional[str]: 实际使用的方式，目标已就绪时返回None
+    """
+    if dst_file.exists() and os.path.samefile(src_file, dst_file):
+        return None
+    
+    # 目标存在但不是源文件（或为失效的符号链接），先删除
+    if dst_file.exists() or dst_file.is_symlink():
+        dst_file.unlink()
+    
+    try:
+        os.link(src_file, dst_file)
+        return "硬链接"
+    except OSError:
+        pass
+    
+    try:
+        dst_file.symlink_to(src_file.absolute())
+        return "符号链接"
+    except OSError:
+        shutil.copy2(src_file, dst_file)
+        return "复制"
+
+
+def _link_tree(src_dir: Path, dst_dir: Path) -> int:
+    """
+    按源目录结构创建镜像目录，并将其中每个文件链接到镜像目录
+    
+    Returns:
+        int: 新建链接的文件数
+    """
+    # 旧版本使用目录符号链接，替换为镜像目录
+    if dst_dir.is_symlink():
+        dst_dir.unlink()
+    
+    linked = 0
+    for root, _, files in os.walk(src_dir, followlinks=True):
+        target_root = dst_dir / Path(root).relative_to(src_dir)
+        target_root.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            if _link_file(Path(root) / name, target_root / name):
+                linked += 1
+    return linked
+
+
+def _stage_model_links(local_models: Path, model_artifacts: Path, models_link: Path):
+    """创建 docling 查找模型所需的文件链接"""
+    if model_artifacts.exists():
+        layout_dir = model_artifacts / "layout"
+        tableformer_dir = model_artifacts / "tableformer"
+        
+        # 链接 layout 模型文件
+        if layout_dir.exists():
+            for file_name in ["model.safetensors", "preprocessor_config.json", "config.json"]:
+                src_file = layout_dir / file_name
+                dst_file = model_artifacts / file_name
+                if src_file.exists():
+                    method = _link_file(src_file, dst_file)
+                    if method:
+                        print(f"✅ 创建{method}: {dst_file} -> {src_file}")
+        
+        # 链接 tableformer 模型目录
+        if tableformer_dir.exists():
+            for mode in ["accurate", "fast"]:
+                src_dir = tableformer_dir / mode
+                dst_dir = model_artifacts / mode
+                if src_dir.exists() and _link_tree(src_dir, dst_dir):
+                    print(f"✅ 创建链接目录: {dst_dir} -> {src_dir}")
+    
+    # 链接模型目录
+    if _link_tree(local_models, models_link):
+        print(f"✅ 创建模型链接目录: {models_link} -> {local_models}")
+
+
+def _is_staged(sentinel: Path, local_models: Path) -> bool:
+    """标记文件存在且不早于模型目录的修改时间时，认为链接已就绪"""
+    try:
+        return sentinel.stat().st_mtime >= local_models.stat().st_mtime
+    except OSError:
+        return False
+
 
 # 配置docling使用项目本地模型
 def setup_local_models():
-    """配置docling使用项目本地模型"""
+    """
+    配置docling使用项目本地模型
+    
+    链接只在首次启动（或模型目录更新后）创建一次，完成后写入标记文件，
+    之后的启动直接跳过。多个worker同时启动时通过文件锁保证只有一个执行。
+    """
 
     project_root = Path(__file__).parent
     local_models = project_root / "docling_models"
@@ -25,102 +136,49 @@ def setup_local_models():
         docling_main_models = local_models / "ds4sd--docling-models"
         model_artifacts = docling_main_models / "model_artifacts"
 
+        # 创建缓存目录
+        local_cache.mkdir(exist_ok=True)
+        models_link = local_cache / "models"
+        sentinel = local_cache / MODEL_STAGING_SENTINEL
+
+        if not _is_staged(sentinel, local_models):
+            with open(local_cache / MODEL_STAGING_LOCK, 'w') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # 等待锁期间可能已由其他进程完成
+                    if not _is_staged(sentinel, local_models):
+                        _stage_model_links(local_models, model_artifacts, models_link)
+                        sentinel.touch()
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
         if model_artifacts.exists():
-            # 创建必要的符号链接，让 docling 能找到模型文件
-            layout_dir = model_artifacts / "layout"
-            tableformer_dir = model_artifacts / "tableformer"
-
-            # 创建 layout 模型的符号链接
-            if layout_dir.exists():
-                for file_name in ["model.safetensors", "preprocessor_config.json", "config.json"]:
-                    src_file = layout_dir / file_name
-                    dst_file = model_artifacts / file_name
-                    if src_file.exists():
-                        # 如果目标文件已存在，先删除
-                        if dst_file.exists() or dst_file.is_symlink():
-                            dst_file.unlink()
-                            print(f"🗑️  删除已存在的文件: {dst_file}")
-
-                        try:
-                            dst_file.symlink_to(src_file)
-                            print(f"✅ 创建符号链接: {dst_file} -> {src_file}")
-                        except OSError:
-                            # 如果符号链接失败，复制文件
-                            import shutil
-                            shutil.copy2(src_file, dst_file)
-                            print(f"✅ 复制文件: {src_file} -> {dst_file}")
-
-            # 创建 tableformer 模型的符号链接
-            if tableformer_dir.exists():
-                for mode in ["accurate", "fast"]:
-                    src_dir = tableformer_dir / mode
-                    dst_dir = model_artifacts / mode
-                    if src_dir.exists():
-                        # 如果目标目录已存在，先删除
-                        if dst_dir.exists() or dst_dir.is_symlink():
-                            if dst_dir.is_symlink():
-                                dst_dir.unlink()
-                                print(f"🗑️  删除已存在的符号链接: {dst_dir}")
-                            else:
-                                import shutil
-                                shutil.rmtree(dst_dir)
-                                print(f"🗑️  删除已存在的目录: {dst_dir}")
-
-                        try:
-                            dst_dir.symlink_to(src_dir)
-                            print(f"✅ 创建符号链接: {dst_dir} -> {src_dir}")
-                        except OSError:
-                            # 如果符号链接失败，复制目录
-                            import shutil
-                            shutil.copytree(src_dir, dst_dir)
-                            print(f"✅ 复制目录: {src_dir} -> {dst_dir}")
-
-            # 设置 docling 使用本地模型的环境变量
-            os.environ['DOCLING_ARTIFACTS_PATH'] = str(model_artifacts)
+            # docling 使用本地模型的路径
             artifacts_path = str(model_artifacts)
         elif docling_main_models.exists():
-            os.environ['DOCLING_ARTIFACTS_PATH'] = str(docling_main_models)
             artifacts_path = str(docling_main_models)
         else:
             # 如果没有找到主模型目录，使用整个模型目录
-            os.environ['DOCLING_ARTIFACTS_PATH'] = str(local_models)
             artifacts_path = str(local_models)
 
-        # 创建缓存目录
-        local_cache.mkdir(exist_ok=True)
-
-        # 创建符号链接或复制模型
-        models_link = local_cache / "models"
-        # 如果目标已存在，先删除
-        if models_link.exists() or models_link.is_symlink():
-            if models_link.is_symlink():
-                models_link.unlink()
-                print(f"🗑️  删除已存在的模型符号链接: {models_link}")
-            else:
-                import shutil
-                shutil.rmtree(models_link)
-                print(f"🗑️  删除已存在的模型目录: {models_link}")
-
-        try:
-            # 尝试创建符号链接
-            models_link.symlink_to(local_models.absolute())
-            print(f"✅ 创建模型符号链接: {models_link} -> {local_models}")
-        except OSError:
-            # 如果符号链接失败，复制目录
-            import shutil
-            shutil.copytree(local_models, models_link)
-            print(f"✅ 复制模型目录: {models_link}")
-
-        # 设置缓存目录环境变量
-        os.environ['DOCLING_CACHE_DIR'] = str(local_cache)
-
-        # 设置离线模式环境变量，防止访问外部网络
-        os.environ['HF_HUB_OFFLINE'] = '1'
-        os.environ['TRANSFORMERS_OFFLINE'] = '1'
-        os.environ['HF_DATASETS_OFFLINE'] = '1'
+        env_updates = {
+            'DOCLING_ARTIFACTS_PATH': artifacts_path,
+            # 缓存目录
+            'DOCLING_CACHE_DIR': str(local_cache),
+            # 离线模式，防止访问外部网络
+            'HF_HUB_OFFLINE': '1',
+            'TRANSFORMERS_OFFLINE': '1',
+            'HF_DATASETS_OFFLINE': '1'
+        }
+        # 已由容器/运维设置的环境变量优先，且无需重复写入
+        for key, value in env_updates.items():
+            os.environ.setdefault(key, value)
+        artifacts_path = os.environ['DOCLING_ARTIFACTS_PATH']
 
         print(f"✅ 配置docling使用本地模型: {artifacts_path}")
-        print(f"✅ 设置模型缓存目录: {local_cache}")
+        print(f"✅ 设置模型缓存目录: {os.environ['DOCLING_CACHE_DIR']}")
         print("✅ 已启用离线模式，禁止访问外部网络")
         return True
     else:
@@ -132,9 +190,16 @@ def setup_local_models():
 # 在导入processors之前设置模型路径
 setup_local_models()
 
-from config import get_config
-from processors import PDFProcessor, ImageProcessor, ExcelProcessor, HTMLProcessor, WordProcessor
-from utils import FileUtils, ResponseUtils
+from config import Config, get_config
+from utils import FileUtils, ResponseUtils, JobQueue, OrjsonProvider
+
+
+# 跨域响应头（允许任意来源）
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
+    'Access-Control-Allow-Headers': '*'
+}
 
 
 def create_app():
@@ -145,8 +210,14 @@ def create_app():
     config_class = get_config()
     config_class.init_app(app)
     
-    # 启用CORS
-    CORS(app, origins="*")
+    # 使用 orjson 序列化响应（jsonify 和预序列化的静态响应都经由 app.json）
+    app.json = OrjsonProvider(app)
+    
+    # 启用CORS：允许任意来源，响应头固定不变，直接在 after_request 中添加
+    @app.after_request
+    def add_cors_headers(response):
+        response.headers.update(CORS_HEADERS)
+        return response
     
     # 配置日志
     logging.basicConfig(
@@ -159,64 +230,327 @@ def create_app():
 
 app = create_app()
 
-
-def get_processor(file_type: str, config: dict):
+# 文件类型校验函数在模块加载时绑定一次，请求处理中不再重复查找
+_is_allowed_file = Config.is_allowed_file
+_get_file_type = Config.get_file_type
+_ALL_EXTENSIONS = Config.get_all_allowed_extensions()
+
+# 处理器配置在启动后不再变化，只构建一次，避免每个请求重复读取
+_PROCESSOR_CONFIG = {
+    'yunwu_api_key': app.config.get('YUNWU_API_KEY'),
+    'yunwu_api_base_url': app.config.get('YUNWU_API_BASE_URL'),
+    'gemini_model': app.config.get('DEFAULT_GEMINI_MODEL'),
+    'use_files_api': app.config.get('YUNWU_USE_FILES_API', False),
+    'yunwu_upload_url': app.config.get('YUNWU_UPLOAD_URL'),
+    'image_ocr_batch_size': app.config.get('IMAGE_OCR_BATCH_SIZE', 1),
+    'save_intermediate': app.config.get('SAVE_INTERMEDIATE_FILES', False),
+    'result_cache_dir': app.config.get('RESULT_CACHE_DIR', ''),
+    'result_cache_max_age': app.config.get('RESULT_CACHE_MAX_AGE', 7 * 24 * 3600),
+    'result_cache_max_size_mb': app.config.get('RESULT_CACHE_MAX_SIZE_MB', 1024),
+    'docling_tableformer_mode': app.config.get('DOCLING_TABLEFORMER_MODE', 'fast'),
+    'docling_num_threads': app.config.get('DOCLING_NUM_THREADS', 8),
+    'docling_half_precision': app.config.get('DOCLING_HALF_PRECISION', False),
+    'monkey_ocr_api_url': app.config.get('MONKEY_OCR_API_URL'),
+    'scanned_pdf_ocr_api_url': app.config.get('SCANNED_PDF_OCR_API_URL'),
+    'scanned_pdf_chunk_size': app.config.get('SCANNED_PDF_CHUNK_SIZE', 50),
+    'scanned_pdf_api_timeout': app.config.get('SCANNED_PDF_API_TIMEOUT', 300),
+    'scanned_pdf_request_delay': app.config.get('SCANNED_PDF_REQUEST_DELAY', 0.0),
+    'ocr_page_workers': app.config.get('OCR_PAGE_WORKERS', 8),
+    'pdf_text_workers': app.config.get('PDF_TEXT_WORKERS', 1),
+    'api_max_concurrency': app.config.get('API_MAX_CONCURRENCY', 4),
+    'api_requests_per_second': app.config.get('API_REQUESTS_PER_SECOND', 0.0),
+    'api_max_retries': app.config.get('API_MAX_RETRIES', 3),
+    'zhipuai_api_key': app.config.get('ZHIPUAI_API_KEY'),
+    'zhipuai_ocr_api_url': app.config.get('ZHIPUAI_OCR_API_URL'),
+    'zhipuai_ocr_language_type': app.config.get('ZHIPUAI_OCR_LANGUAGE_TYPE', 'CHN_ENG'),
+    'zhipuai_ocr_image_format': app.config.get('ZHIPUAI_OCR_IMAGE_FORMAT', 'jpeg')
+}
+_PROCESSOR_CONFIG_FROZEN = frozenset(_PROCESSOR_CONFIG.items())
+
+# 异步处理任务队列
+job_queue = JobQueue(
+    max_workers=app.config.get('PROCESSING_WORKERS', 2),
+    result_ttl=app.config.get('JOB_RESULT_TTL', 3600),
+    state_dir=app.config.get('JOB_STATE_DIR'),
+    max_runtime=app.config.get('JOB_MAX_RUNTIME', 3 * 3600)
+)
+
+
+# 文件类型 -> (处理器模块, 处理器类名)
+# 处理器模块依赖docling/torch等重量级库，在首次处理对应类型文件时才导入，
+# 健康检查等接口无需承担这部分启动开销
+PROCESSOR_CLASSES = {
+    'pdf': ('processors.pdf_processor', 'PDFProcessor'),
+    'image': ('processors.image_processor', 'ImageProcessor'),
+    'excel': ('processors.excel_processor', 'ExcelProcessor'),
+    'html': ('processors.html_processor', 'HTMLProcessor'),
+    'word': ('processors.word_processor', 'WordProcessor')
+}
+
+# 处理器实例缓存锁（按文件类型区分）：Flask多线程处理请求时，避免同一处理器被重复初始化，
+# 同时PDF处理器加载模型期间不阻塞其他类型文件的处理
+_processor_cache_locks = {file_type: threading.Lock() for file_type in PROCESSOR_CLASSES}
+
+
+@lru_cache(maxsize=None)
+def _build_processor(file_type: str, config_items: frozenset):
+    """按 (文件类型, 配置) 构建处理器实例，结果由lru_cache缓存复用"""
+    module_name, class_name = PROCESSOR_CLASSES[file_type]
+    processor_class = getattr(importlib.import_module(module_name), class_name)
+    return processor_class(dict(config_items))
+
+
+def get_processor(file_type: str):
     """
     根据文件类型获取对应的处理器
     
+    处理器实例（含docling模型等）按 (文件类型, 配置) 缓存，跨请求复用，
+    避免每次请求重复加载模型。
+    
     Args:
         file_type: 文件类型
-        config: 配置字典
         
     Returns:
         BaseProcessor: 对应的处理器实例
     """
-    processors = {
-        'pdf': PDFProcessor,
-        'image': ImageProcessor,
-        'excel': ExcelProcessor,
-        'html': HTMLProcessor,
-        'word': WordProcessor
-    }
-    
-    processor_class = processors.get(file_type)
-    if not processor_class:
+    if file_type not in PROCESSOR_CLASSES:
         raise ValueError(f"不支持的文件类型: {file_type}")
     
-    return processor_class(config)
+    with _processor_cache_locks[file_type]:
+        return _build_processor(file_type, _PROCESSOR_CONFIG_FROZEN)
+
+
+# 需要在启动时预加载的处理器类型（docling模型初始化耗时最长）
+WARMUP_FILE_TYPES = ('pdf', 'image')
+
+# 预加载完成标志，完成前健康检查返回 warming
+_READY = threading.Event()
+
+
+def _warm_models():
+    """
+    在后台线程中预先构建PDF/图片处理器并加载模型
+    
+    构建结果进入处理器缓存，首个请求直接复用；预加载期间到达的同类型请求
+    会在处理器缓存锁上等待预加载完成，而不是重复初始化。
+    """
+    for file_type in WARMUP_FILE_TYPES:
+        try:
+            get_processor(file_type)
+            app.logger.info(f"处理器预加载完成: {file_type}")
+        except Exception as e:
+            # 预加载失败不影响服务，首个请求时会再次尝试初始化
+            app.logger.error(f"处理器预加载失败: {file_type}, 错误: {e}", exc_info=True)
+    _READY.set()
+
+
+if not app.config.get('WARMUP_MODELS', True) or __name__ == '__mp_main__':
+    # python app.py 启动时，spawn方式创建的子进程（如PDF文本提取进程池）会以 __mp_main__ 重新导入本模块，
+    # 这些子进程不处理请求，不需要预加载模型
+    _READY.set()
+elif app.config.get('WARMUP_IN_BACKGROUND', True):
+    threading.Thread(target=_warm_models, name='model-warmup', daemon=True).start()
+else:
+    # gunicorn --preload：在master进程中同步加载，fork后各worker通过写时复制共享模型内存
+    _warm_models()
+
+
+# 静态接口响应允许代理缓存的时间(秒)
+STATIC_RESPONSE_MAX_AGE = 10
+
+
+def _encode_static_json(data: dict) -> bytes:
+    """按 jsonify 相同的格式预先序列化固定不变的响应体"""
+    return app.json.response(data).get_data()
+
+
+def _static_json_response(body: bytes):
+    """返回预序列化的JSON响应，允许上游代理短时间缓存"""
+    response = Response(body, mimetype='application/json')
+    response.headers['Cache-Control'] = f'public, max-age={STATIC_RESPONSE_MAX_AGE}'
+    return response
+
+
+def _static_error_response(body: bytes, status_code: int):
+    """返回预序列化的错误响应（不设置缓存头）"""
+    return Response(body, status=status_code, mimetype='application/json')
+
+
+def _format_max_content_length(max_length: Optional[int]) -> str:
+    """将上传大小上限格式化为提示文本，整MB时保持 "100MB" 的写法"""
+    if not max_length:
+        return "不限"
+    if max_length % (1024 * 1024) == 0:
+        return f"{max_length // (1024 * 1024)}MB"
+    return FileUtils.format_size(max_length)
+
+
+# 内容固定的错误响应体，启动时序列化一次（上传大小上限取自配置）
+_NO_FILE_JSON = _encode_static_json(ResponseUtils.no_file_response())
+_FILE_TOO_LARGE_JSON = _encode_static_json(
+    ResponseUtils.file_too_large_response(_format_max_content_length(app.config.get('MAX_CONTENT_LENGTH')))
+)
+_SERVER_ERROR_JSON = _encode_static_json(ResponseUtils.server_error_response())
+
+
+def _health_payload(status: str) -> dict:
+    """构建健康检查响应"""
+    return ResponseUtils.success_response(
+        data={
+            "status": status,
+            "service": "OCR Backend",
+            "version": "1.0.0",
+            "endpoints": {
+                "file_upload": "/api/process",
+                "stream_upload": "/api/process-stream",
+                "batch_upload": "/api/process-batch",
+                "base64_processing": "/api/process-base64",
+                "job_result": "/api/result/<job_id>",
+                "supported_types": "/api/supported-types",
+                "health_check": "/api/health"
+            }
+        },
+        message="服务运行正常"
+    )
+
+
+# 健康检查和支持类型的响应在启动后不变，预先序列化，避免每次探活都重新构建和编码
+_HEALTH_JSON = {
+    status: _encode_static_json(_health_payload(status))
+    for status in ("healthy", "warming")
+}
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """健康检查接口"""
-    return ResponseUtils.make_json_response(
-        ResponseUtils.success_response(
-            data={
-                "status": "healthy",
-                "service": "OCR Backend",
-                "version": "1.0.0",
-                "endpoints": {
-                    "file_upload": "/api/process",
-                    "base64_processing": "/api/process-base64",
-                    "supported_types": "/api/supported-types",
-                    "health_check": "/api/health"
-                }
-            },
-            message="服务运行正常"
+    """健康检查接口（请求参数 timestamp=true 时附带服务器时间，响应不再缓存）"""
+    status = "healthy" if _READY.is_set() else "warming"
+    
+    if request.args.get('timestamp', '').lower() in ('1', 'true', 'yes'):
+        payload = _health_payload(status)
+        payload['data']['timestamp'] = time.time()
+        return ResponseUtils.make_json_response(payload)
+    
+    return _static_json_response(_HEALTH_JSON[status])
+
+
+def _result_to_response(filename: str, file_type: str, result) -> tuple:
+    """
+    将处理结果转换为响应字典
+    
+    Args:
+        filename: 客户端提供的原始文件名
+        file_type: 文件类型
+        result: 处理器返回的 ProcessingResult
+        
+    Returns:
+        tuple: (响应字典, HTTP状态码)
+    """
+    if result.success:
+        return ResponseUtils.processing_response(
+            filename=filename,
+            content=result.content,
+            file_type=file_type,
+            processing_time=result.processing_time,
+            metadata=result.metadata
+        ), 200
+    return ResponseUtils.error_response(
+        f"文件处理失败: {result.error}"
+    ), 500
+
+
+def run_processing(file_path: str, filename: str) -> tuple:
+    """
+    处理已保存到上传目录的文件
+    
+    处理结束或出错时负责清理临时文件。不依赖请求上下文，
+    可在请求线程中同步调用，也可在任务队列的工作线程中执行。
+    
+    Args:
+        file_path: 已保存的文件路径
+        filename: 客户端提供的原始文件名
+        
+    Returns:
+        tuple: (响应字典, HTTP状态码)
+    """
+    try:
+        # 文件大小已由 MAX_CONTENT_LENGTH 在读取请求体时限制，无需落盘后再检查
+        
+        # 获取文件类型
+        file_type = _get_file_type(filename)
+        
+        # 调试信息（f-string在日志级别未启用时也会求值，先判断级别）
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug(f"处理器配置: {_PROCESSOR_CONFIG}")
+        
+        # 获取处理器并处理文件
+        processor = get_processor(file_type)
+        result = processor.process_with_timing(Path(file_path))
+        
+        # 清理临时文件
+        if app.config.get('CLEANUP_TEMP_FILES', True):
+            FileUtils.cleanup_file(file_path)
+        
+        # 返回处理结果
+        return _result_to_response(filename, file_type, result)
+            
+    except ValueError as e:
+        # 清理文件
+        FileUtils.cleanup_file(file_path)
+        return ResponseUtils.error_response(str(e)), 400
+    
+    except Exception as e:
+        # 清理文件
+        FileUtils.cleanup_file(file_path)
+        app.logger.error(f"处理文件时发生异常: {e}", exc_info=True)
+        return ResponseUtils.server_error_response("文件处理过程中发生错误"), 500
+
+
+def process_saved_file(file_path: str, filename: str):
+    """
+    处理已保存到上传目录的文件并构建JSON响应
+    
+    各上传接口（multipart、Base64、流式上传）在落盘后共用此流程。
+    请求参数 async=true 时将处理任务提交到任务队列，立即返回202和任务ID，
+    客户端通过 /api/result/<job_id> 查询结果；否则同步处理并返回结果。
+    
+    Args:
+        file_path: 已保存的文件路径
+        filename: 客户端提供的原始文件名
+        
+    Returns:
+        Flask Response对象
+    """
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        job_id = job_queue.submit(run_processing, file_path, filename)
+        return ResponseUtils.make_json_response(
+            ResponseUtils.success_response(
+                data={
+                    "job_id": job_id,
+                    "status": JobQueue.STATUS_QUEUED,
+                    "result_url": f"/api/result/{job_id}"
+                },
+                message="任务已提交"
+            ),
+            202
         )
-    )
+    
+    data, status_code = run_processing(file_path, filename)
+    return ResponseUtils.make_json_response(data, status_code)
 
 
 @app.route('/api/process', methods=['POST'])
 def process_file():
-    """文件处理接口"""
+    """
+    文件处理接口（multipart/form-data）
+    
+    已不推荐使用：multipart解析会先将整个请求体缓存到临时文件再复制到上传目录，
+    大文件请使用 PUT /api/process-stream 直接流式上传。
+    """
     try:
         # 检查是否有文件上传
         if 'file' not in request.files:
-            return ResponseUtils.make_json_response(
-                ResponseUtils.no_file_response(),
-                400
-            )
+            return _static_error_response(_NO_FILE_JSON, 400)
         
         file = request.files['file']
         
@@ -228,18 +562,17 @@ def process_file():
             )
         
         # 检查文件类型
-        from config import Config
-        if not Config.is_allowed_file(file.filename):
+        if not _is_allowed_file(file.filename):
             return ResponseUtils.make_json_response(
                 ResponseUtils.unsupported_file_type_response(
                     FileUtils.get_file_extension(file.filename) or "unknown",
-                    Config.get_all_allowed_extensions()
+                    _ALL_EXTENSIONS
                 ),
                 415
             )
         
         # 保存上传的文件
-        success, file_path, error = FileUtils.save_uploaded_file(
+        success, file_path, error, bytes_written = FileUtils.save_uploaded_file(
             file, app.config['UPLOAD_FOLDER']
         )
         
@@ -249,89 +582,206 @@ def process_file():
                 500
             )
         
-        try:
-            # 验证文件大小
-            valid, size_error = FileUtils.validate_file_size(file_path, 100)
-            if not valid:
-                FileUtils.cleanup_file(file_path)
-                return ResponseUtils.make_json_response(
-                    ResponseUtils.file_too_large_response("100MB"),
-                    413
-                )
-            
-            # 获取文件类型
-            file_type = Config.get_file_type(file.filename)
-            
-            # 准备处理器配置
-            processor_config = {
-                'yunwu_api_key': app.config.get('YUNWU_API_KEY'),
-                'yunwu_api_base_url': app.config.get('YUNWU_API_BASE_URL'),
-                'gemini_model': app.config.get('DEFAULT_GEMINI_MODEL'),
-                'save_intermediate': app.config.get('SAVE_INTERMEDIATE_FILES', False),
-                'docling_tableformer_mode': app.config.get('DOCLING_TABLEFORMER_MODE', 'fast'),
-                'monkey_ocr_api_url': app.config.get('MONKEY_OCR_API_URL'),
-                'scanned_pdf_ocr_api_url': app.config.get('SCANNED_PDF_OCR_API_URL'),
-                'scanned_pdf_chunk_size': app.config.get('SCANNED_PDF_CHUNK_SIZE', 50),
-                'scanned_pdf_api_timeout': app.config.get('SCANNED_PDF_API_TIMEOUT', 300),
-                'scanned_pdf_request_delay': app.config.get('SCANNED_PDF_REQUEST_DELAY', 0.0),
-                'zhipuai_api_key': app.config.get('ZHIPUAI_API_KEY'),
-                'zhipuai_ocr_api_url': app.config.get('ZHIPUAI_OCR_API_URL'),
-                'zhipuai_ocr_language_type': app.config.get('ZHIPUAI_OCR_LANGUAGE_TYPE', 'CHN_ENG')
-            }
-            
-            # 调试信息
-            app.logger.info(f"处理器配置: {processor_config}")
-            
-            # 获取处理器并处理文件
-            processor = get_processor(file_type, processor_config)
-            result = processor.process_with_timing(Path(file_path))
+        # 文件大小取自写入时的计数，无需再 stat 已保存的文件
+        if bytes_written == 0:
+            FileUtils.cleanup_file(file_path)
+            return ResponseUtils.make_json_response(
+                ResponseUtils.error_response("上传的文件为空"),
+                400
+            )
+        
+        app.logger.info(f"处理上传文件: {file.filename}, 大小: {FileUtils.format_size(bytes_written)}")
+        
+        return process_saved_file(file_path, file.filename)
+    
+    except HTTPException:
+        # 交由对应的错误处理器（如超过 MAX_CONTENT_LENGTH 时的413）
+        raise
+    
+    except Exception as e:
+        app.logger.error(f"API调用异常: {e}", exc_info=True)
+        return _static_error_response(_SERVER_ERROR_JSON, 500)
+
+
+def run_batch_processing(saved_files: list) -> list:
+    """
+    批量处理已保存的文件
+    
+    同类型文件交给同一个处理器的 process_batch 一次处理，
+    以便处理器合并推理（如PDF的docling批量转换）。处理结束后清理临时文件。
+    
+    Args:
+        saved_files: [(原始文件名, 已保存的文件路径), ...]
+        
+    Returns:
+        list: 与输入顺序一致的 (响应字典, HTTP状态码)
+    """
+    responses = [None] * len(saved_files)
+    
+    # 按文件类型分组
+    groups = {}
+    for index, (filename, file_path) in enumerate(saved_files):
+        groups.setdefault(_get_file_type(filename), []).append(index)
+    
+    try:
+        for file_type, indices in groups.items():
+            try:
+                processor = get_processor(file_type)
+                results = processor.process_batch([Path(saved_files[i][1]) for i in indices])
+            except ValueError as e:
+                for i in indices:
+                    responses[i] = (ResponseUtils.error_response(str(e)), 400)
+                continue
+            except Exception as e:
+                app.logger.error(f"批量处理文件时发生异常: {e}", exc_info=True)
+                for i in indices:
+                    responses[i] = (ResponseUtils.server_error_response("文件处理过程中发生错误"), 500)
+                continue
             
-            # 清理临时文件
-            if app.config.get('CLEANUP_TEMP_FILES', True):
+            for i, result in zip(indices, results):
+                responses[i] = _result_to_response(saved_files[i][0], file_type, result)
+    finally:
+        # 清理临时文件
+        if app.config.get('CLEANUP_TEMP_FILES', True):
+            for _, file_path in saved_files:
                 FileUtils.cleanup_file(file_path)
-            
-            # 返回处理结果
-            if result.success:
+    
+    return responses
+
+
+@app.route('/api/process-batch', methods=['POST'])
+def process_batch_files():
+    """
+    批量文件处理接口（multipart/form-data，字段名 files 可重复）
+    
+    同类型文件在一次推理中处理，避免逐个请求重复初始化模型和设备。
+    所有文件都通过校验后才会开始处理，单个文件处理失败不影响其他文件。
+    """
+    saved_files = []
+    try:
+        files = request.files.getlist('files')
+        if not files:
+            return _static_error_response(_NO_FILE_JSON, 400)
+        
+        # 检查文件名和文件类型
+        for file in files:
+            if file.filename == '':
                 return ResponseUtils.make_json_response(
-                    ResponseUtils.processing_response(
-                        filename=file.filename,
-                        content=result.content,
-                        file_type=file_type,
-                        processing_time=result.processing_time,
-                        metadata=result.metadata
-                    )
+                    ResponseUtils.error_response("未选择文件"),
+                    400
                 )
-            else:
+            if not _is_allowed_file(file.filename):
                 return ResponseUtils.make_json_response(
-                    ResponseUtils.error_response(
-                        f"文件处理失败: {result.error}"
+                    ResponseUtils.unsupported_file_type_response(
+                        FileUtils.get_file_extension(file.filename) or "unknown",
+                        _ALL_EXTENSIONS
                     ),
+                    415
+                )
+        
+        # 保存上传的文件
+        for file in files:
+            success, file_path, error, _ = FileUtils.save_uploaded_file(
+                file, app.config['UPLOAD_FOLDER']
+            )
+            if not success:
+                for _, saved_path in saved_files:
+                    FileUtils.cleanup_file(saved_path)
+                return ResponseUtils.make_json_response(
+                    ResponseUtils.error_response(error),
                     500
                 )
-                
-        except ValueError as e:
-            # 清理文件
-            FileUtils.cleanup_file(file_path)
+            saved_files.append((file.filename, file_path))
+        
+        # 文件交由批量处理负责清理
+        batch_files, saved_files = saved_files, []
+        responses = run_batch_processing(batch_files)
+        
+        return ResponseUtils.make_json_response(
+            ResponseUtils.success_response(
+                data={
+                    "total": len(responses),
+                    "succeeded": sum(1 for _, code in responses if code == 200),
+                    "results": [data for data, _ in responses]
+                },
+                message="批量处理完成"
+            )
+        )
+    
+    except HTTPException:
+        # 交由对应的错误处理器（如超过 MAX_CONTENT_LENGTH 时的413）
+        raise
+    
+    except Exception as e:
+        for _, saved_path in saved_files:
+            FileUtils.cleanup_file(saved_path)
+        app.logger.error(f"API调用异常: {e}", exc_info=True)
+        return _static_error_response(_SERVER_ERROR_JSON, 500)
+
+
+@app.route('/api/process-stream', methods=['PUT'])
+def process_stream_file():
+    """
+    流式上传处理接口
+    
+    请求体为原始文件内容（非multipart），文件名通过 X-Filename 请求头传递
+    （非ASCII文件名需URL编码）。请求体按块直接写入上传目录，
+    不经过Werkzeug的multipart解析和二次复制。
+    """
+    try:
+        # 检查文件名
+        filename = unquote(request.headers.get('X-Filename', '')).strip()
+        if not filename:
             return ResponseUtils.make_json_response(
-                ResponseUtils.error_response(str(e)),
+                ResponseUtils.error_response("缺少请求头: X-Filename"),
                 400
             )
         
-        except Exception as e:
-            # 清理文件
-            FileUtils.cleanup_file(file_path)
-            app.logger.error(f"处理文件时发生异常: {e}", exc_info=True)
+        # 检查文件类型
+        if not _is_allowed_file(filename):
             return ResponseUtils.make_json_response(
-                ResponseUtils.server_error_response("文件处理过程中发生错误"),
+                ResponseUtils.unsupported_file_type_response(
+                    FileUtils.get_file_extension(filename) or "unknown",
+                    _ALL_EXTENSIONS
+                ),
+                415
+            )
+        
+        # 在读取请求体之前拒绝超过大小限制的请求
+        max_length = app.config.get('MAX_CONTENT_LENGTH')
+        if max_length and request.content_length and request.content_length > max_length:
+            return _static_error_response(_FILE_TOO_LARGE_JSON, 413)
+        
+        # 将请求体流式写入上传目录
+        success, file_path, error, bytes_written = FileUtils.save_stream_to_file(
+            request.stream, filename, app.config['UPLOAD_FOLDER']
+        )
+        
+        if not success:
+            return ResponseUtils.make_json_response(
+                ResponseUtils.error_response(error),
                 500
             )
+        
+        # 文件大小取自写入时的计数，无需再 stat 已保存的文件
+        if bytes_written == 0:
+            FileUtils.cleanup_file(file_path)
+            return ResponseUtils.make_json_response(
+                ResponseUtils.error_response("请求体为空"),
+                400
+            )
+        
+        app.logger.info(f"处理流式上传文件: {filename}, 大小: {FileUtils.format_size(bytes_written)}")
+        
+        return process_saved_file(file_path, filename)
+    
+    except HTTPException:
+        # 交由对应的错误处理器（如超过 MAX_CONTENT_LENGTH 时的413）
+        raise
     
     except Exception as e:
-        app.logger.error(f"API调用异常: {e}", exc_info=True)
-        return ResponseUtils.make_json_response(
-            ResponseUtils.server_error_response(),
-            500
-        )
+        app.logger.error(f"流式上传API调用异常: {e}", exc_info=True)
+        return _static_error_response(_SERVER_ERROR_JSON, 500)
 
 
 @app.route('/api/process-base64', methods=['POST'])
@@ -365,12 +815,11 @@ def process_base64_file():
             )
         
         # 检查文件类型
-        from config import Config
-        if not Config.is_allowed_file(filename):
+        if not _is_allowed_file(filename):
             return ResponseUtils.make_json_response(
                 ResponseUtils.unsupported_file_type_response(
                     FileUtils.get_file_extension(filename) or "unknown",
-                    Config.get_all_allowed_extensions()
+                    _ALL_EXTENSIONS
                 ),
                 415
             )
@@ -410,117 +859,78 @@ def process_base64_file():
                 500
             )
         
-        try:
-            # 验证文件大小
-            valid, size_error = FileUtils.validate_file_size(temp_file_path, 100)
-            if not valid:
-                FileUtils.cleanup_file(temp_file_path)
-                return ResponseUtils.make_json_response(
-                    ResponseUtils.file_too_large_response("100MB"),
-                    413
-                )
-            
-            # 获取文件类型
-            file_type = Config.get_file_type(filename)
-            
-            # 准备处理器配置
-            processor_config = {
-                'yunwu_api_key': app.config.get('YUNWU_API_KEY'),
-                'yunwu_api_base_url': app.config.get('YUNWU_API_BASE_URL'),
-                'gemini_model': app.config.get('DEFAULT_GEMINI_MODEL'),
-                'save_intermediate': app.config.get('SAVE_INTERMEDIATE_FILES', False),
-                'docling_tableformer_mode': app.config.get('DOCLING_TABLEFORMER_MODE', 'fast'),
-                'monkey_ocr_api_url': app.config.get('MONKEY_OCR_API_URL'),
-                'scanned_pdf_ocr_api_url': app.config.get('SCANNED_PDF_OCR_API_URL'),
-                'scanned_pdf_chunk_size': app.config.get('SCANNED_PDF_CHUNK_SIZE', 50),
-                'scanned_pdf_api_timeout': app.config.get('SCANNED_PDF_API_TIMEOUT', 300),
-                'scanned_pdf_request_delay': app.config.get('SCANNED_PDF_REQUEST_DELAY', 0.0)
-            }
-            
-            # 调试信息
-            app.logger.info(f"处理Base64文件: {filename}, 大小: {FileUtils.get_file_size_str(temp_file_path)}")
-            app.logger.info(f"处理器配置: {processor_config}")
-            
-            # 获取处理器并处理文件
-            processor = get_processor(file_type, processor_config)
-            result = processor.process_with_timing(Path(temp_file_path))
-            
-            # 清理临时文件
-            if app.config.get('CLEANUP_TEMP_FILES', True):
-                FileUtils.cleanup_file(temp_file_path)
-            
-            # 返回处理结果
-            if result.success:
-                return ResponseUtils.make_json_response(
-                    ResponseUtils.processing_response(
-                        filename=filename,
-                        content=result.content,
-                        file_type=file_type,
-                        processing_time=result.processing_time,
-                        metadata=result.metadata
-                    )
-                )
-            else:
-                return ResponseUtils.make_json_response(
-                    ResponseUtils.error_response(
-                        f"文件处理失败: {result.error}"
-                    ),
-                    500
-                )
-                
-        except ValueError as e:
-            # 清理文件
-            FileUtils.cleanup_file(temp_file_path)
-            return ResponseUtils.make_json_response(
-                ResponseUtils.error_response(str(e)),
-                400
-            )
+        app.logger.info(f"处理Base64文件: {filename}, 大小: {FileUtils.format_size(len(file_bytes))}")
         
-        except Exception as e:
-            # 清理文件
-            FileUtils.cleanup_file(temp_file_path)
-            app.logger.error(f"处理Base64文件时发生异常: {e}", exc_info=True)
-            return ResponseUtils.make_json_response(
-                ResponseUtils.server_error_response("文件处理过程中发生错误"),
-                500
-            )
+        return process_saved_file(temp_file_path, filename)
+    
+    except HTTPException:
+        # 交由对应的错误处理器（如超过 MAX_CONTENT_LENGTH 时的413）
+        raise
     
     except Exception as e:
         app.logger.error(f"Base64 API调用异常: {e}", exc_info=True)
+        return _static_error_response(_SERVER_ERROR_JSON, 500)
+
+
+@app.route('/api/result/<job_id>', methods=['GET'])
+def get_job_result(job_id):
+    """异步任务结果查询接口"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return ResponseUtils.make_json_response(
+            ResponseUtils.error_response("任务不存在或已过期", 404),
+            404
+        )
+    
+    if job['status'] == JobQueue.STATUS_FINISHED:
+        data, status_code = job['result']
+        return ResponseUtils.make_json_response(data, status_code)
+    
+    if job['status'] == JobQueue.STATUS_FAILED:
         return ResponseUtils.make_json_response(
-            ResponseUtils.server_error_response(),
+            ResponseUtils.server_error_response(f"任务执行失败: {job['error']}"),
             500
         )
-
-
-@app.route('/api/supported-types', methods=['GET'])
-def get_supported_types():
-    """获取支持的文件类型接口"""
-    from config import Config
+    
     return ResponseUtils.make_json_response(
         ResponseUtils.success_response(
             data={
-                "supported_extensions": Config.get_all_allowed_extensions(),
-                "file_types": {
-                    "pdf": "PDF文档",
-                    "excel": "Excel表格",
-                    "image": "图像文件",
-                    "html": "HTML网页",
-                    "word": "Word文档"
-                }
+                "job_id": job_id,
+                "status": job['status']
             },
-            message="获取支持的文件类型成功"
-        )
+            message="任务处理中"
+        ),
+        202
+    )
+
+
+_SUPPORTED_TYPES_JSON = _encode_static_json(
+    ResponseUtils.success_response(
+        data={
+            "supported_extensions": _ALL_EXTENSIONS,
+            "file_types": {
+                "pdf": "PDF文档",
+                "excel": "Excel表格",
+                "image": "图像文件",
+                "html": "HTML网页",
+                "word": "Word文档"
+            }
+        },
+        message="获取支持的文件类型成功"
     )
+)
+
+
+@app.route('/api/supported-types', methods=['GET'])
+def get_supported_types():
+    """获取支持的文件类型接口"""
+    return _static_json_response(_SUPPORTED_TYPES_JSON)
 
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
     """文件过大错误处理"""
-    return ResponseUtils.make_json_response(
-        ResponseUtils.file_too_large_response("100MB"),
-        413
-    )
+    return _static_error_response(_FILE_TOO_LARGE_JSON, 413)
 
 
 @app.errorhandler(404)
@@ -536,10 +946,7 @@ def not_found(error):
 def internal_error(error):
     """500错误处理"""
     app.logger.error(f"服务器内部错误: {error}")
-    return ResponseUtils.make_json_response(
-        ResponseUtils.server_error_response(),
-        500
-    )
+    return _static_error_response(_SERVER_ERROR_JSON, 500)
 
 
 if __name__ == '__main__':
@@ -563,6 +970,7 @@ if __name__ == '__main__':
     else:
         app.logger.info("智谱OCR API密钥未配置，扫描PDF将使用MonkeyOCR服务")
     
+    # 开发调试用；生产环境请使用 gunicorn -c gunicorn.conf.py app:app（见 start.sh）
     app.run(
         host=app.config['HOST'],
         port=app.config['PORT'],
@@ -47,6 +47,10 @@ class Config:
         'word': ['.doc', '.docx']
     }
     
+    # 扩展名 -> 文件类型 的反向索引，以及全部扩展名，类加载时计算一次
+    _EXT_TO_TYPE = {ext: file_type for file_type, exts in ALLOWED_EXTENSIONS.items() for ext in exts}
+    _ALL_EXTENSIONS = tuple(_EXT_TO_TYPE)
+    
     
     # 日志配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -56,11 +60,15 @@ class Config:
     YUNWU_API_KEY = os.environ.get('YUNWU_API_KEY')
     YUNWU_API_BASE_URL = os.environ.get('YUNWU_API_BASE_URL', 'https://yunwu.ai/v1')
     DEFAULT_GEMINI_MODEL = os.environ.get('DEFAULT_GEMINI_MODEL', 'gemini-2.0-flash-exp')
+    YUNWU_USE_FILES_API = os.environ.get('YUNWU_USE_FILES_API', 'false').lower() == 'true'  # 图片先经Files API上传原始字节，不再base64内联
+    YUNWU_UPLOAD_URL = os.environ.get('YUNWU_UPLOAD_URL')  # Files API上传地址，默认由 YUNWU_API_BASE_URL 的域名推导
+    IMAGE_OCR_BATCH_SIZE = int(os.environ.get('IMAGE_OCR_BATCH_SIZE', 1))  # 批量接口中每次Gemini请求合并的图片数，1为不合并
     
     # 智谱OCR API配置
     ZHIPUAI_API_KEY = os.environ.get('ZHIPUAI_API_KEY')
     ZHIPUAI_OCR_API_URL = os.environ.get('ZHIPUAI_OCR_API_URL', 'https://open.bigmodel.cn/api/paas/v4/files/ocr')
     ZHIPUAI_OCR_LANGUAGE_TYPE = os.environ.get('ZHIPUAI_OCR_LANGUAGE_TYPE', 'CHN_ENG')
+    ZHIPUAI_OCR_IMAGE_FORMAT = os.environ.get('ZHIPUAI_OCR_IMAGE_FORMAT', 'jpeg').lower()  # 扫描PDF页面图片格式：jpeg 或 png
     
     # MonkeyOCR API配置（兼容旧参数）
     MONKEY_OCR_API_URL = os.environ.get('MONKEY_OCR_API_URL', 'http://115.190.121.59:7860/api/process-base64')
@@ -68,13 +76,34 @@ class Config:
     SCANNED_PDF_CHUNK_SIZE = int(os.environ.get('SCANNED_PDF_CHUNK_SIZE', 50))
     SCANNED_PDF_API_TIMEOUT = int(os.environ.get('SCANNED_PDF_API_TIMEOUT', 300))
     SCANNED_PDF_REQUEST_DELAY = float(os.environ.get('SCANNED_PDF_REQUEST_DELAY', 0))
+    OCR_PAGE_WORKERS = int(os.environ.get('OCR_PAGE_WORKERS', 8))  # 扫描PDF并发OCR的页数
+    PDF_TEXT_WORKERS = int(os.environ.get('PDF_TEXT_WORKERS', 1))  # 多页PDF并行提取文本的进程数，默认1为串行；每个服务进程各自启动子进程
+
+    # 外部API限流配置（云雾/智谱/MonkeyOCR，每个上游服务单独计算）
+    # 限流在每个worker进程内独立计算，对上游的总并发/速率为 gunicorn worker数 × 该值
+    API_MAX_CONCURRENCY = int(os.environ.get('API_MAX_CONCURRENCY', 4))  # 每个worker进程对每个上游的最大并发请求数
+    API_REQUESTS_PER_SECOND = float(os.environ.get('API_REQUESTS_PER_SECOND', 0))  # 每个worker进程对每个上游每秒最大请求数，0为不限制
+    API_MAX_RETRIES = int(os.environ.get('API_MAX_RETRIES', 3))  # 遇到429/503时的最大尝试次数
 
     # Docling模型配置
     DOCLING_TABLEFORMER_MODE = os.environ.get('DOCLING_TABLEFORMER_MODE', 'fast')  # 'fast' 或 'accurate'
+    DOCLING_NUM_THREADS = int(os.environ.get('DOCLING_NUM_THREADS', min(8, os.cpu_count() or 1)))  # 每个worker进程的docling推理线程数（gunicorn.conf.py 默认按worker数分摊CPU核数）
+    DOCLING_HALF_PRECISION = os.environ.get('DOCLING_HALF_PRECISION', 'false').lower() == 'true'  # CUDA上使用TF32低精度矩阵运算
 
     # 处理选项
     SAVE_INTERMEDIATE_FILES = os.environ.get('SAVE_INTERMEDIATE_FILES', 'false').lower() == 'true'
     CLEANUP_TEMP_FILES = os.environ.get('CLEANUP_TEMP_FILES', 'true').lower() == 'true'
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '')  # 按文件内容(SHA-256)缓存处理结果的目录，留空不缓存
+    RESULT_CACHE_MAX_AGE = int(os.environ.get('RESULT_CACHE_MAX_AGE', 7 * 24 * 3600))  # 缓存结果保留时间(秒)，0表示不过期
+    RESULT_CACHE_MAX_SIZE_MB = int(os.environ.get('RESULT_CACHE_MAX_SIZE_MB', 1024))  # 缓存目录总大小上限(MB)，超过时淘汰最早的结果，0表示不限制
+    
+    # 异步任务队列配置
+    PROCESSING_WORKERS = int(os.environ.get('PROCESSING_WORKERS', 2))  # 异步处理工作线程数
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))  # 任务结果保留时间(秒)
+    JOB_MAX_RUNTIME = int(os.environ.get('JOB_MAX_RUNTIME', 3 * 3600))  # 任务最长处理时间(秒)，超过仍未完成（如worker重启）时视为失败
+    JOB_STATE_DIR = os.environ.get('JOB_STATE_DIR', str(BASE_DIR / 'jobs'))  # 任务状态目录，多个worker进程共享，可查询其他worker的任务
+    WARMUP_MODELS = os.environ.get('WARMUP_MODELS', 'true').lower() == 'true'  # 启动时后台预加载PDF/图片处理器
+    WARMUP_IN_BACKGROUND = os.environ.get('WARMUP_IN_BACKGROUND', 'true').lower() == 'true'  # false时在导入应用时同步预加载（gunicorn --preload）
     
     @classmethod
     def init_app(cls, app):
@@ -90,29 +119,23 @@ class Config:
     @classmethod
     def get_all_allowed_extensions(cls):
         """获取所有支持的文件扩展名"""
-        extensions = []
-        for file_type, exts in cls.ALLOWED_EXTENSIONS.items():
-            extensions.extend(exts)
-        return extensions
+        return cls._ALL_EXTENSIONS
     
     @classmethod
     def get_file_type(cls, filename):
         """根据文件名获取文件类型"""
         if not filename or '.' not in filename:
             return None
-            
-        ext = '.' + filename.rsplit('.', 1)[1].lower()
         
-        for file_type, extensions in cls.ALLOWED_EXTENSIONS.items():
-            if ext in extensions:
-                return file_type
-        
-        return None
+        return cls._EXT_TO_TYPE.get('.' + filename.rpartition('.')[2].lower())
     
     @classmethod
     def is_allowed_file(cls, filename):
         """检查文件是否被允许"""
-        return cls.get_file_type(filename) is not None
+        if not filename:
+            return False
+        
+        return filename.lower().endswith(cls._ALL_EXTENSIONS)
 
 
 class DevelopmentConfig(Config):
@@ -1,18 +1,53 @@
 import gradio as gr
+import io
 import os
 import base64
-from pdf2image import convert_from_path
+import hashlib
 import re
 import zipfile
 import subprocess
+import threading
 from pathlib import Path
 import tempfile
 import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
 
 from PIL import Image
 from loguru import logger
 
+# PDF渲染优先使用PyMuPDF（进程内逐页渲染），未安装时回退到pdf2image（调用pdftoppm）
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    PYMUPDF_AVAILABLE = False
+
+# LaTeX表格优先用matplotlib在进程内绘制，未安装时使用pdflatex
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    # 依次尝试常见中文字体，均不存在时使用默认字体
+    matplotlib.rcParams["font.sans-serif"] = [
+        "Noto Sans CJK SC", "Source Han Sans SC", "PingFang SC", "Microsoft YaHei", "SimHei", "DejaVu Sans"
+    ]
+    matplotlib.rcParams["axes.unicode_minus"] = False
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+# 单元格文本用pylatexenc转为纯文本（处理转义字符、重音等），$...$ 原样保留交给mathtext
+try:
+    from pylatexenc.latex2text import LatexNodes2Text
+    latex_to_text = LatexNodes2Text(math_mode="verbatim").latex_to_text
+    PYLATEXENC_AVAILABLE = True
+except ImportError:
+    PYLATEXENC_AVAILABLE = False
+
 # 支持的文件类型
 supported_file_types = [
     ".pdf", ".doc", ".docx",
@@ -21,27 +56,130 @@ supported_file_types = [
     ".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff", ".tif"
 ]
 
+# 正则在模块加载时编译一次，表格较多的文档逐个单元格处理时不再重复查找编译缓存
+_HTML_BLOCK_RE = re.compile(r'<html>(.*?)</html>', re.DOTALL)
+_TABULAR_RE = re.compile(r"(\\begin\{tabular\}.*?\\end\{tabular\})", re.DOTALL)
+_TABULAR_BEGIN_RE = re.compile(r"\\begin\{tabular\}(\{[^{}]*(\{[^{}]*\}[^{}]*)*\})?")
+_TABULAR_RULE_RE = re.compile(r"\\(hline|toprule|midrule|bottomrule|cline\{[^}]*\})")
+_TABULAR_ROW_RE = re.compile(r"\\\\")
+_MULTICOLUMN_RE = re.compile(r"\\multicolumn\{(\d+)\}\{[^}]*\}\{(.*)\}$", re.DOTALL)
+_MULTIROW_RE = re.compile(r"\\multirow\{[^}]*\}\{[^}]*\}\{(.*)\}", re.DOTALL)
+_TEXT_MACRO_RE = re.compile(r"\\(textbf|textit|emph|text|mathrm)\{([^}]*)\}")
+_CELL_SEP_RE = re.compile(r"(?<!\\)&")
+_LATEX_ESCAPE_RE = re.compile(r"\\([%&_#{}])")
+_INLINE_MATH_RE = re.compile(r"\$[^$]*\$")
+_LATEX_COMMAND_RE = re.compile(r"\\[A-Za-z]+")
+
 if __name__ == '__main__':
     # 后端API配置
     BACKEND_URL = os.environ.get("BACKEND_URL", "http://115.190.121.59:7860")
+    # 复用连接访问后端，连续解析时不必每次重新建立TCP连接；只对连接失败重试，不会重复提交已发出的文件
+    backend_session = requests.Session()
+    _backend_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                   max_retries=Retry(total=2, read=0, backoff_factor=0.3))
+    backend_session.mount('http://', _backend_adapter)
+    backend_session.mount('https://', _backend_adapter)
     
-    def render_latex_table_to_image(latex_content, temp_dir):
-        """渲染LaTeX表格为图像"""
-        try:
-            pattern = r"(\\begin\{tabular\}.*?\\end\{tabular\})"
-            matches = re.findall(pattern, latex_content, re.DOTALL)
-            
-            if matches:
-                table_content = matches[0]
-            elif '\\begin{tabular}' in latex_content:
-                if '\\end{tabular}' not in latex_content:
-                    table_content = latex_content + '\n\\end{tabular}'
+    # 离线模式（network_troubleshooting.py 写入 .env 的 OFFLINE_MODE=true）下在本进程内直接调用处理器，不经过HTTP
+    OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "").lower() == "true"
+    if OFFLINE_MODE:
+        import sys
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        from app import get_processor
+        from config import Config
+    
+    def process_locally(file_path):
+        """在本进程内处理文件，返回与 /api/process 响应相同结构的字典"""
+        file_type = Config.get_file_type(os.path.basename(file_path))
+        if not file_type:
+            return {'success': False, 'error': f"不支持的文件类型: {Path(file_path).suffix}"}
+        
+        result = get_processor(file_type).process_with_timing(Path(file_path))
+        if not result.success:
+            return {'success': False, 'error': f"文件处理失败: {result.error}"}
+        return {'success': True, 'content': result.content}
+    # 设为false时LaTeX表格始终用pdflatex渲染
+    USE_MATPLOTLIB_TABLES = os.environ.get("USE_MATPLOTLIB_TABLES", "true").lower() == "true"
+    
+    def open_pdf(file_path):
+        """打开PDF，返回 (文档句柄, 总页数)，页面在 render_pdf_page 中按需渲染"""
+        if PYMUPDF_AVAILABLE:
+            doc = fitz.open(file_path)
+            return doc, doc.page_count
+        return file_path, pdfinfo_from_path(file_path)["Pages"]
+
+    def close_pdf(doc):
+        """关闭 open_pdf 打开的文档"""
+        if PYMUPDF_AVAILABLE and doc is not None:
+            doc.close()
+
+    def render_pdf_page(doc, index, dpi=150, max_height=None):
+        """渲染PDF的单页为PIL图像，max_height 仅作用于pdf2image回退（在pdftocairo中直接缩放）"""
+        if PYMUPDF_AVAILABLE:
+            pix = doc.load_page(index).get_pixmap(dpi=dpi)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        # 输出JPEG而不是默认的未压缩PPM，减少临时文件读写和解码开销
+        return convert_from_path(
+            doc, dpi=dpi, first_page=index + 1, last_page=index + 1,
+            fmt="jpeg", use_pdftocairo=True, size=(None, max_height)
+        )[0]
+    
+    def parse_latex_tabular(table_content):
+        """将 tabular 环境解析为单元格文本的二维列表（展开 multicolumn，去掉常见格式命令）"""
+        body = _TABULAR_BEGIN_RE.sub("", table_content)
+        body = body.replace("\\end{tabular}", "")
+        body = _TABULAR_RULE_RE.sub("", body)
+
+        rows = []
+        for raw_row in _TABULAR_ROW_RE.split(body):
+            if not raw_row.strip():
+                continue
+            cells = []
+            for cell in _CELL_SEP_RE.split(raw_row):
+                cell = cell.strip()
+                span = 1
+                multicolumn = _MULTICOLUMN_RE.match(cell)
+                if multicolumn:
+                    span, cell = int(multicolumn.group(1)), multicolumn.group(2)
+                cell = _MULTIROW_RE.sub(r"\1", cell)
+                cell = _TEXT_MACRO_RE.sub(r"\2", cell)
+                if PYLATEXENC_AVAILABLE:
+                    cell = latex_to_text(cell)
                 else:
-                    table_content = latex_content
-            else:
-                return latex_content
-            
-            full_latex = r"""
+                    cell = _LATEX_ESCAPE_RE.sub(r"\1", cell)
+                cells.append(cell.strip())
+                cells.extend([""] * (span - 1))
+            rows.append(cells)
+
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def render_table_with_matplotlib(table_content):
+        """用matplotlib绘制表格，单元格中的 $...$ 由mathtext渲染，返回PNG字节"""
+        rows = parse_latex_tabular(table_content)
+        if not rows or not rows[0]:
+            raise ValueError("表格为空")
+        # 公式之外仍残留LaTeX命令（如图形、自定义宏）时mathtext无法正确显示，交给pdflatex
+        if any(_LATEX_COMMAND_RE.search(_INLINE_MATH_RE.sub("", cell)) for row in rows for cell in row):
+            raise ValueError("单元格包含无法在进程内渲染的LaTeX命令")
+
+        fig = plt.figure(figsize=(max(2, 1.2 * len(rows[0])), max(1, 0.35 * len(rows))))
+        try:
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.axis("off")
+            table = ax.table(cellText=rows, loc="center", cellLoc="center")
+            table.auto_set_font_size(False)
+            table.set_fontsize(10)
+            table.auto_set_column_width(list(range(len(rows[0]))))
+            buf = io.BytesIO()
+            fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+            return buf.getvalue()
+        finally:
+            plt.close(fig)
+
+    def render_table_with_pdflatex(table_content, temp_dir):
+        """用pdflatex编译表格并渲染为PNG字节，编译失败时返回None"""
+        full_latex = r"""
 \documentclass{article}
 \usepackage[utf8]{inputenc}
 \usepackage{booktabs}
@@ -53,40 +191,124 @@ if __name__ == '__main__':
 """ + table_content + r"""
 \end{document}
 """
+        
+        unique_id = str(uuid.uuid4())[:8]
+        tex_path = os.path.join(temp_dir, f"table_{unique_id}.tex")
+        pdf_path = os.path.join(temp_dir, f"table_{unique_id}.pdf")
+        
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(full_latex)
+        
+        result = subprocess.run(
+            ["pdflatex", "-interaction=batchmode", "-halt-on-error", "-output-directory", temp_dir, tex_path], 
+            timeout=20, capture_output=True, text=True
+        )
+        
+        if result.returncode != 0 or not os.path.exists(pdf_path):
+            return None
+        
+        # PNG直接编码到内存；.tex/.pdf/.aux/.log 留在 temp_dir 中，由调用方的临时目录统一清理
+        doc, _ = open_pdf(pdf_path)
+        try:
+            buf = io.BytesIO()
+            render_pdf_page(doc, 0, dpi=300).save(buf, "PNG")
+        finally:
+            close_pdf(doc)
+        
+        return buf.getvalue()
+
+    # 已渲染表格的缓存：内存中保留最近使用的若干张，磁盘上按内容哈希长期保存
+    TABLE_CACHE_SIZE = 512
+    TABLE_CACHE_DIR = Path(os.environ.get(
+        "LATEX_TABLE_CACHE_DIR", Path.home() / ".cache" / "ocr_backend" / "latex_tables"
+    ))
+    table_png_cache = OrderedDict()
+    # 表格图片默认以磁盘缓存文件的URL引用（由Gradio文件接口提供），设为true时内联为base64 data URI
+    INLINE_TABLE_IMAGES = os.environ.get("INLINE_TABLE_IMAGES", "false").lower() == "true"
+
+    def table_cache_path(table_content):
+        """表格在磁盘缓存中的PNG路径（按内容的SHA-256命名）"""
+        return TABLE_CACHE_DIR / f"{hashlib.sha256(table_content.encode('utf-8')).hexdigest()}.png"
+
+    def get_table_png(table_content, temp_dir):
+        """按表格内容的SHA-256获取渲染结果，依次查内存、磁盘缓存，均未命中时渲染；渲染失败返回None"""
+        cache_path = table_cache_path(table_content)
+        digest = cache_path.stem
+        
+        png = table_png_cache.get(digest)
+        if png is not None:
+            table_png_cache.move_to_end(digest)
+            return png
+        
+        if cache_path.exists():
+            png = cache_path.read_bytes()
+        else:
+            png = None
+            if USE_MATPLOTLIB_TABLES and MATPLOTLIB_AVAILABLE:
+                try:
+                    png = render_table_with_matplotlib(table_content)
+                except Exception as e:
+                    logger.warning(f"matplotlib渲染表格失败，回退到pdflatex: {e}")
+            if png is None:
+                png = render_table_with_pdflatex(table_content, temp_dir)
+            if png is None:
+                return None
+            try:
+                TABLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                cache_path.write_bytes(png)
+            except OSError as e:
+                logger.warning(f"写入表格缓存失败: {e}")
+        
+        table_png_cache[digest] = png
+        while len(table_png_cache) > TABLE_CACHE_SIZE:
+            table_png_cache.popitem(last=False)
+        return png
+
+    def render_latex_table_to_image(latex_content, temp_dir):
+        """渲染LaTeX表格为图像（优先matplotlib，失败时回退到pdflatex），相同表格只渲染一次"""
+        try:
+            matches = _TABULAR_RE.findall(latex_content)
             
-            unique_id = str(uuid.uuid4())[:8]
-            tex_path = os.path.join(temp_dir, f"table_{unique_id}.tex")
-            pdf_path = os.path.join(temp_dir, f"table_{unique_id}.pdf")
-            png_path = os.path.join(temp_dir, f"table_{unique_id}.png")
-            
-            with open(tex_path, "w", encoding="utf-8") as f:
-                f.write(full_latex)
-            
-            result = subprocess.run(
-                ["pdflatex", "-interaction=nonstopmode", "-output-directory", temp_dir, tex_path], 
-                timeout=20, capture_output=True, text=True
-            )
+            if matches:
+                table_content = matches[0]
+            elif '\\begin{tabular}' in latex_content:
+                if '\\end{tabular}' not in latex_content:
+                    table_content = latex_content + '\n\\end{tabular}'
+                else:
+                    table_content = latex_content
+            else:
+                return latex_content
             
-            if result.returncode != 0 or not os.path.exists(pdf_path):
+            png = get_table_png(table_content, temp_dir)
+            if png is None:
                 return f"<pre>{latex_content}</pre>"
             
-            images = convert_from_path(pdf_path, dpi=300)
-            images[0].save(png_path, "PNG")
-            
-            with open(png_path, "rb") as f:
-                img_data = f.read()
-            img_base64 = base64.b64encode(img_data).decode("utf-8")
-            
-            # 清理临时文件
-            for file_path in [tex_path, pdf_path, png_path]:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+            # 引用磁盘缓存文件，避免大量表格以base64内联导致页面HTML膨胀；缓存写入失败时仍内联
+            cache_path = table_cache_path(table_content)
+            if not INLINE_TABLE_IMAGES and cache_path.exists():
+                return f'<img src="/gradio_api/file={cache_path}" style="max-width:100%;height:auto;">'
             
+            img_base64 = base64.b64encode(png).decode("utf-8")
             return f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%;height:auto;">'
             
         except Exception as e:
             return f"<pre>{latex_content}</pre>"
 
+    # 已生成的下载压缩包：{压缩包路径: Markdown内容的SHA-256}，同一文件重复解析且结果不变时不重新压缩
+    zip_digests = {}
+
+    def write_markdown_zip(zip_path, md_name, md_content):
+        """将Markdown写入压缩包；gr.DownloadButton 只接受文件路径，因此仍落盘，但内容未变时直接复用"""
+        md_bytes = md_content.encode('utf-8')
+        digest = hashlib.sha256(md_bytes).hexdigest()
+        if zip_digests.get(zip_path) == digest and os.path.exists(zip_path):
+            return
+        
+        # Markdown文本在压缩级别3时压缩率与默认级别6相近，速度约快一倍
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=3) as zipf:
+            zipf.writestr(md_name, md_bytes)
+        zip_digests[zip_path] = digest
+
     def parse_document_and_return_results(file_path):
         """解析文档并返回结果"""
         if file_path is None:
@@ -105,25 +327,27 @@ if __name__ == '__main__':
             return (error_msg, error_msg, gr.update(value=None, visible=False), gr.update(value=None, visible=False))
         
         try:
-            # 调用后端API
-            with open(file_path, 'rb') as f:
-                files = {'file': (os.path.basename(file_path), f)}
-                response = requests.post(f"{BACKEND_URL}/api/process", files=files, timeout=300)
-            
-            if response.status_code != 200:
-                error_msg = f"API调用失败: HTTP {response.status_code}"
-                return (error_msg, error_msg, gr.update(value=None, visible=False), gr.update(value=None, visible=False))
-            
-            result = response.json()
+            if OFFLINE_MODE:
+                result = process_locally(file_path)
+            else:
+                # 调用后端API
+                with open(file_path, 'rb') as f:
+                    files = {'file': (os.path.basename(file_path), f)}
+                    response = backend_session.post(f"{BACKEND_URL}/api/process", files=files, timeout=300)
+                
+                if response.status_code != 200:
+                    error_msg = f"API调用失败: HTTP {response.status_code}"
+                    return (error_msg, error_msg, gr.update(value=None, visible=False), gr.update(value=None, visible=False))
+                
+                result = response.json()
             if not result.get('success'):
                 error_msg = f"处理失败: {result.get('error', '未知错误')}"
                 return (error_msg, error_msg, gr.update(value=None, visible=False), gr.update(value=None, visible=False))
             
             md_content_ori = result.get('content', "处理完成，但未生成内容")
             
-            # 处理Markdown内容
-            temp_dir = tempfile.mkdtemp()
-            try:
+            # 处理Markdown内容，pdflatex的中间文件都写在本次解析的临时目录中，退出时一并删除
+            with tempfile.TemporaryDirectory() as temp_dir:
                 # 处理LaTeX表格
                 def replace_html_latex_table(match):
                     html_content = match.group(1)
@@ -131,20 +355,13 @@ if __name__ == '__main__':
                         return render_latex_table_to_image(html_content, temp_dir)
                     return match.group(0)
                 
-                md_content = re.sub(r'<html>(.*?)</html>', replace_html_latex_table, md_content_ori, flags=re.DOTALL)
-                
-            finally:
-                import shutil
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir, ignore_errors=True)
+                md_content = _HTML_BLOCK_RE.sub(replace_html_latex_table, md_content_ori)
             
             # 创建下载文件
             parent_path = os.path.dirname(file_path)
             name = Path(file_path).stem
             zip_path = os.path.join(parent_path, f"{name}_markdown.zip")
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.writestr(f"{name}.md", md_content_ori.encode('utf-8'))
+            write_markdown_zip(zip_path, f"{name}.md", md_content_ori)
             
             return (
                 md_content_ori,
@@ -161,31 +378,178 @@ if __name__ == '__main__':
             error_msg = f"处理出错: {str(e)}"
             return (error_msg, error_msg, gr.update(value=None, visible=False), gr.update(value=None, visible=False))
 
-    # PDF缓存
-    pdf_cache = {"images": [], "current_page": 0, "total_pages": 0}
+    # 预览页图像最多缓存的页数，超出时淘汰最久未访问的页，再次访问时重新渲染
+    PREVIEW_CACHE_PAGES = 8
+
+    # 预览图片以JPEG临时文件交给 gr.Image(type="filepath")，前端按文件下载，不经过base64编码
+    PREVIEW_JPEG_QUALITY = 85
+    # 预览框高度为800，按低DPI渲染并限制尺寸即可；OCR使用后端按原始文件处理，不受影响
+    PREVIEW_DPI = 72
+    PREVIEW_MAX_SIZE = (900, 1100)
+
+    # PDF预览页的磁盘缓存（跨会话、跨重启），按 (文件路径, 修改时间, 大小, DPI, 页码) 命名，
+    # 重新打开同一文件时直接读取；总大小超过上限时按访问时间淘汰最旧的页
+    PAGE_CACHE_DIR = Path(os.environ.get(
+        "PDF_PAGE_CACHE_DIR", Path.home() / ".cache" / "ocr_backend" / "pages"
+    ))
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get("PDF_PAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    # 每写入多少页检查一次缓存总大小
+    PAGE_CACHE_SWEEP_INTERVAL = 50
+    page_cache_state = {"writes": 0}
+    page_cache_sweep_lock = threading.Lock()
+
+    def new_pdf_cache():
+        """
+        创建预览缓存：images 为 {页码: 预览图片路径} 的LRU，翻页时按需渲染
+
+        缓存通过 gr.State 按会话保存，各事件处理函数接收并返回它，并发用户之间互不影响。
+        temp_files 记录本会话生成的临时图片，淘汰或清除时删除。
+        """
+        return {"doc": None, "source_key": None, "images": OrderedDict(), "temp_files": set(),
+                "current_page": 0, "total_pages": 0}
+
+    def save_preview_image(pdf_cache, image):
+        """将预览图像保存为JPEG临时文件并返回路径"""
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            image.convert("RGB").save(f, "JPEG", quality=PREVIEW_JPEG_QUALITY)
+        pdf_cache["temp_files"].add(f.name)
+        return f.name
+
+    def remove_preview_file(pdf_cache, path):
+        """删除本会话生成的临时预览图片（用户上传的原图不删除）"""
+        if path in pdf_cache["temp_files"]:
+            pdf_cache["temp_files"].discard(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def reset_pdf_cache(pdf_cache):
+        """关闭已打开的PDF，删除临时预览图片并清空缓存"""
+        close_pdf(pdf_cache["doc"])
+        for path in list(pdf_cache["temp_files"]):
+            remove_preview_file(pdf_cache, path)
+        pdf_cache["doc"] = None
+        pdf_cache["source_key"] = None
+        pdf_cache["images"] = OrderedDict()
+        pdf_cache["current_page"] = 0
+        pdf_cache["total_pages"] = 0
+
+    def page_cache_path(pdf_cache, index):
+        """预览页在磁盘缓存中的路径"""
+        key = hashlib.sha1(
+            f"{pdf_cache['source_key']}|{PREVIEW_DPI}|{PREVIEW_MAX_SIZE}|{index}".encode("utf-8")
+        ).hexdigest()
+        return PAGE_CACHE_DIR / key[:2] / f"{key}.jpg"
+
+    def save_page_to_cache(image, cache_path):
+        """将预览页写入磁盘缓存（先写临时文件再替换，并发会话不会读到写了一半的图片）"""
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            image.convert("RGB").save(tmp_path, "JPEG", quality=PREVIEW_JPEG_QUALITY)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        page_cache_state["writes"] += 1
+        if page_cache_state["writes"] % PAGE_CACHE_SWEEP_INTERVAL == 0:
+            threading.Thread(target=sweep_page_cache, daemon=True).start()
+
+    def sweep_page_cache():
+        """在后台按访问时间淘汰最旧的缓存页，直到总大小不超过上限"""
+        if not page_cache_sweep_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for path in PAGE_CACHE_DIR.rglob("*.jpg"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                if total <= PAGE_CACHE_MAX_BYTES:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+        finally:
+            page_cache_sweep_lock.release()
+
+    def get_page_image(pdf_cache, index):
+        """获取预览页图片路径，依次查会话LRU、磁盘缓存，均未命中时渲染"""
+        images = pdf_cache["images"]
+        if index in images:
+            images.move_to_end(index)
+            return images[index]
+
+        cache_path = page_cache_path(pdf_cache, index)
+        if cache_path.exists():
+            # 更新修改时间作为最近访问时间，供淘汰时排序
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+            path = str(cache_path)
+        else:
+            image = render_pdf_page(pdf_cache["doc"], index, dpi=PREVIEW_DPI, max_height=PREVIEW_MAX_SIZE[1])
+            image.thumbnail(PREVIEW_MAX_SIZE, Image.LANCZOS)
+            try:
+                save_page_to_cache(image, cache_path)
+                path = str(cache_path)
+            except OSError as e:
+                logger.warning(f"写入预览页缓存失败: {e}")
+                path = save_preview_image(pdf_cache, image)
+        images[index] = path
+        while len(images) > PREVIEW_CACHE_PAGES:
+            _, evicted = images.popitem(last=False)
+            remove_preview_file(pdf_cache, evicted)
+        return path
+
+    def load_pdf_into_cache(pdf_cache, file):
+        """打开PDF并重置缓存，只记录页数，不渲染页面"""
+        reset_pdf_cache(pdf_cache)
+        doc, total_pages = open_pdf(file)
+        stat = os.stat(file)
+        pdf_cache["doc"] = doc
+        pdf_cache["source_key"] = f"{os.path.abspath(file)}|{stat.st_mtime_ns}|{stat.st_size}"
+        pdf_cache["total_pages"] = total_pages
 
-    def load_file(file):
+    def load_file(file, pdf_cache):
         """加载文件预览"""
         file_ext = Path(file).suffix.lower()
         
         if file_ext == '.pdf':
-            pages = convert_from_path(file, dpi=150)
-        elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']:
-            pages = [Image.open(file)]
+            load_pdf_into_cache(pdf_cache, file)
+            return get_page_image(pdf_cache, 0), f"<div id='page_info_box'>1 / {pdf_cache['total_pages']}</div>"
+        
+        reset_pdf_cache(pdf_cache)
+        if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']:
+            # 图片尺寸不超过预览上限时直接使用上传的文件，否则生成缩略图
+            with Image.open(file) as img:
+                if img.width <= PREVIEW_MAX_SIZE[0] and img.height <= PREVIEW_MAX_SIZE[1]:
+                    preview = file
+                else:
+                    img.thumbnail(PREVIEW_MAX_SIZE, Image.LANCZOS)
+                    preview = save_preview_image(pdf_cache, img)
         else:
             # 创建简单预览
             img = Image.new('RGB', (800, 600), color='lightgray')
-            pages = [img]
+            preview = save_preview_image(pdf_cache, img)
         
-        pdf_cache["images"] = pages
-        pdf_cache["current_page"] = 0
-        pdf_cache["total_pages"] = len(pages)
-        return pages[0], f"<div id='page_info_box'>1 / {len(pages)}</div>"
+        pdf_cache["images"] = OrderedDict({0: preview})
+        pdf_cache["total_pages"] = 1
+        return preview, "<div id='page_info_box'>1 / 1</div>"
 
-    def turn_page(direction):
+    def turn_page(direction, pdf_cache):
         """翻页"""
-        if not pdf_cache["images"]:
-            return None, "<div id='page_info_box'>0 / 0</div>"
+        if not pdf_cache["total_pages"]:
+            return None, "<div id='page_info_box'>0 / 0</div>", pdf_cache
 
         if direction == "prev":
             pdf_cache["current_page"] = max(0, pdf_cache["current_page"] - 1)
@@ -193,13 +557,13 @@ if __name__ == '__main__':
             pdf_cache["current_page"] = min(pdf_cache["total_pages"] - 1, pdf_cache["current_page"] + 1)
 
         index = pdf_cache["current_page"]
-        return pdf_cache["images"][index], f"<div id='page_info_box'>{index + 1} / {pdf_cache['total_pages']}</div>"
+        return get_page_image(pdf_cache, index), f"<div id='page_info_box'>{index + 1} / {pdf_cache['total_pages']}</div>", pdf_cache
 
-    def parse_and_update_view(file_path):
+    def parse_and_update_view(file_path, pdf_cache):
         """解析文档并更新视图"""
         if file_path is None:
             return (gr.update(), "请上传文件", "请上传文件", "<div id='page_info_box'>0 / 0</div>",
-                   gr.update(value=None, visible=True), gr.update(value=None, visible=True))
+                   gr.update(value=None, visible=True), gr.update(value=None, visible=True), pdf_cache)
 
         # 在解析前再次检查文件大小
         try:
@@ -213,63 +577,15 @@ if __name__ == '__main__':
         # 调用解析函数
         md_content_ori, md_content, layout_pdf_update, zip_update = parse_document_and_return_results(file_path)
         
-        # 保持当前预览状态，不重新加载
-        file_ext = Path(file_path).suffix.lower()
-        
-        if file_ext == '.pdf':
-            # PDF文件：保持当前页面状态
-            if pdf_cache["images"]:
-                current_page = pdf_cache["current_page"]
-                preview_image = pdf_cache["images"][current_page]
-                page_info = f"<div id='page_info_box'>{current_page + 1} / {pdf_cache['total_pages']}</div>"
-            else:
-                # 如果缓存为空，重新加载
-                try:
-                    pages = convert_from_path(file_path, dpi=150)
-                    pdf_cache["images"] = pages
-                    pdf_cache["current_page"] = 0
-                    pdf_cache["total_pages"] = len(pages)
-                    preview_image = pages[0]
-                    page_info = f"<div id='page_info_box'>1 / {len(pages)}</div>"
-                except:
-                    preview_image = None
-                    page_info = "<div id='page_info_box'>0 / 0</div>"
-        elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']:
-            # 图像文件：保持当前图像显示
-            if pdf_cache["images"]:
-                preview_image = pdf_cache["images"][0]
-                page_info = f"<div id='page_info_box'>1 / 1</div>"
-            else:
-                # 重新加载图像
-                try:
-                    image = Image.open(file_path)
-                    pdf_cache["images"] = [image]
-                    pdf_cache["current_page"] = 0
-                    pdf_cache["total_pages"] = 1
-                    preview_image = image
-                    page_info = f"<div id='page_info_box'>1 / 1</div>"
-                except:
-                    preview_image = None
-                    page_info = "<div id='page_info_box'>0 / 0</div>"
-        else:
-            # 其他文件类型：保持当前状态
-            if pdf_cache["images"]:
-                current_page = pdf_cache["current_page"]
-                preview_image = pdf_cache["images"][current_page] if current_page < len(pdf_cache["images"]) else None
-                page_info = f"<div id='page_info_box'>{current_page + 1} / {pdf_cache['total_pages']}</div>"
-            else:
-                preview_image = None
-                page_info = "<div id='page_info_box'>0 / 0</div>"
-        
-        return (preview_image, md_content, md_content_ori, page_info, layout_pdf_update, zip_update)
+        # 解析不改变预览：预览由上传处理函数负责渲染并保存在会话缓存中，
+        # 这里不再重新渲染，也不重复回传当前页图像
+        return (gr.update(), md_content, md_content_ori, gr.update(), layout_pdf_update, zip_update, pdf_cache)
 
-    def clear_all():
+    def clear_all(pdf_cache):
         """清除所有内容"""
-        pdf_cache["images"] = []
-        pdf_cache["current_page"] = 0
-        pdf_cache["total_pages"] = 0
+        reset_pdf_cache(pdf_cache)
         return (None, None, "## 🕐 等待解析结果...", "🕐 等待解析结果...", "<div id='page_info_box'>0 / 0</div>",
-               gr.update(value=None, visible=True), gr.update(value=None, visible=True))
+               gr.update(value=None, visible=True), gr.update(value=None, visible=True), pdf_cache)
 
     def validate_file_upload(file):
         """验证上传的文件"""
@@ -287,17 +603,17 @@ if __name__ == '__main__':
 
         return file
 
-    def load_file_with_validation(file):
+    def load_file_with_validation(file, pdf_cache):
         """验证并加载文件预览"""
         # 先验证文件
         validated_file = validate_file_upload(file)
         if validated_file is None:
             # 验证失败，返回空状态
-            return None, None, "<div id='page_info_box'>0 / 0</div>"
+            return None, None, "<div id='page_info_box'>0 / 0</div>", pdf_cache
 
         # 验证通过，加载预览
-        preview_image, page_info = load_file(validated_file)
-        return validated_file, preview_image, page_info
+        preview_image, page_info = load_file(validated_file, pdf_cache)
+        return validated_file, preview_image, page_info, pdf_cache
 
     css = """
     #page_info_html { display: flex; align-items: center; justify-content: center; height: 100%; margin: 0 12px; }
@@ -309,6 +625,8 @@ if __name__ == '__main__':
 
     with gr.Blocks(title='文档处理工具') as demo:
         gr.HTML("<h1 style='text-align: center;'>文档处理工具</h1>")
+        # 每个会话独立的预览缓存
+        pdf_state = gr.State(new_pdf_cache())
         
         with gr.Row():
             with gr.Column(scale=1):
@@ -321,7 +639,7 @@ if __name__ == '__main__':
                 with gr.Row():
                     with gr.Column(scale=3):
                         gr.Markdown("### 👁️ 文件预览")
-                        pdf_view = gr.Image(label="预览", height=800, show_label=False)
+                        pdf_view = gr.Image(label="预览", height=800, show_label=False, type="filepath")
                         with gr.Row():
                             prev_btn = gr.Button("⬅ 上一页")
                             page_info = gr.HTML("<div id='page_info_box'>0 / 0</div>", elem_id="page_info_html")
@@ -342,15 +660,19 @@ if __name__ == '__main__':
         # 事件绑定
         file_input.upload(
             fn=load_file_with_validation,
-            inputs=file_input,
-            outputs=[file_input, pdf_view, page_info]
+            inputs=[file_input, pdf_state],
+            outputs=[file_input, pdf_view, page_info, pdf_state]
         )
-        prev_btn.click(fn=lambda: turn_page("prev"), outputs=[pdf_view, page_info])
-        next_btn.click(fn=lambda: turn_page("next"), outputs=[pdf_view, page_info])
-        parse_button.click(fn=parse_and_update_view, inputs=file_input, 
-                          outputs=[pdf_view, md_view, md_raw, page_info, pdf_download_button, md_download_button])
-        clear_button.click(fn=clear_all, 
-                          outputs=[file_input, pdf_view, md_view, md_raw, page_info, pdf_download_button, md_download_button])
+        prev_btn.click(fn=lambda state: turn_page("prev", state), inputs=pdf_state,
+                       outputs=[pdf_view, page_info, pdf_state])
+        next_btn.click(fn=lambda state: turn_page("next", state), inputs=pdf_state,
+                       outputs=[pdf_view, page_info, pdf_state])
+        parse_button.click(fn=parse_and_update_view, inputs=[file_input, pdf_state], 
+                          outputs=[pdf_view, md_view, md_raw, page_info, pdf_download_button, md_download_button, pdf_state])
+        clear_button.click(fn=clear_all, inputs=pdf_state,
+                          outputs=[file_input, pdf_view, md_view, md_raw, page_info, pdf_download_button, md_download_button, pdf_state])
 
+    TABLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    PAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
     demo.launch(server_port=7861, debug=False, share=False, inbrowser=False,
-                theme="ocean", css=css)
+                theme="ocean", css=css, allowed_paths=[str(TABLE_CACHE_DIR), str(PAGE_CACHE_DIR)])
@@ -2,54 +2,94 @@ import os
 import time
 import math
 import PyPDF2
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-def parse_pdf_chunk(chunk_path: str) -> str:
+# 文本提取优先使用PyMuPDF（C实现，比PyPDF2快数倍且提取质量更好）
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+def get_page_count(pdf_path: str) -> int:
+    """获取PDF总页数"""
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+
+    with open(pdf_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def extract_text_chunk(pdf_path: str, start_page: int, end_page: int) -> str:
     """
-    解析单个PDF块的函数。
-    这部分是您需要根据自己的需求修改的核心，将这里的逻辑替换为真实的API调用。
+    从PDF的一个页码范围中提取文本（或字节数据，取决于您的API需求）。
+    每个工作进程独立打开原始PDF，只读取自己负责的页，无需预先拆分成小文件。
+    纯CPU计算且受GIL限制，在进程池中执行。
 
     Args:
-        chunk_path (str): 临时生成的PDF小文件的路径。
+        pdf_path (str): 原始PDF文件的路径。
+        start_page (int): 起始页码（从0开始，包含）。
+        end_page (int): 结束页码（不包含）。
 
     Returns:
-        str: 对这个PDF块的解析结果。
+        str: 提取的文本。
     """
-    print(f"开始处理PDF块: {chunk_path}...")
-    
-    # 1. 从PDF块中提取文本（或字节数据，取决于您的API需求）
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(pdf_path) as doc:
+            return "\n".join(doc.load_page(p).get_text("text") for p in range(start_page, end_page))
+
     text_content = ""
-    try:
-        with open(chunk_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text_content += page.extract_text() or ""
-    except Exception as e:
-        print(f"提取 {chunk_path} 文本时出错: {e}")
-        return ""
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_num in range(start_page, end_page):
+            text_content += reader.pages[page_num].extract_text() or ""
+    return text_content
+
+
+def call_api(chunk_name: str, text_content: str) -> str:
+    """
+    调用API解析单个PDF块的内容。
+    这部分是您需要根据自己的需求修改的核心，将这里的逻辑替换为真实的API调用。
+    主要耗时在等待网络，在线程池中执行。
 
+    Args:
+        chunk_name (str): PDF块的名称（用于日志和结果标注）。
+        text_content (str): 从该PDF块提取的文本。
+
+    Returns:
+        str: 对这个PDF块的解析结果。
+    """
     # --- 这里是模拟API调用的部分 ---
     # 在实际应用中，您应该在这里调用类似 gemini-api 的服务
     # 例如: result = your_gemini_api_call(text_content)
-    print(f"模拟API调用，处理 {chunk_path} 的内容...")
+    print(f"模拟API调用，处理 {chunk_name} 的内容...")
     time.sleep(2)  # 模拟网络延迟和处理耗时
     
     # 模拟API返回的结果
-    api_result = f"--- 从 {os.path.basename(chunk_path)} 解析的内容 ---\n{text_content[:200]}...\n--- 解析结束 ---\n\n"
+    api_result = f"--- 从 {chunk_name} 解析的内容 ---\n{text_content[:200]}...\n--- 解析结束 ---\n\n"
     # --- 模拟结束 ---
     
-    print(f"处理完成: {chunk_path}")
+    print(f"处理完成: {chunk_name}")
     
     return api_result
 
 
+def chunk_name(start_page: int, end_page: int) -> str:
+    """PDF块的名称（页码从1开始）"""
+    return f"第{start_page + 1}-{end_page}页"
+
+
 def process_pdf_in_parallel(pdf_path: str, num_threads: int) -> str:
     """
-    将一个PDF文件拆分，并使用多线程并行处理，最后拼接结果。
+    将一个PDF文件按页码范围分块，并行处理，最后拼接结果。
+
+    文本提取是CPU密集型任务，使用进程池绕开GIL；API调用是I/O密集型任务，使用线程池。
+    每个块提取完成后立即提交API调用，不必等所有块都提取完。
 
     Args:
         pdf_path (str): 原始PDF文件的路径。
-        num_threads (int): 希望使用的线程数。
+        num_threads (int): 分块数，也是并发API调用的线程数。
 
     Returns:
         str: 拼接后的完整解析内容。
@@ -57,70 +97,54 @@ def process_pdf_in_parallel(pdf_path: str, num_threads: int) -> str:
     if not os.path.exists(pdf_path):
         return "错误：PDF文件不存在。"
 
-    # 创建一个临时目录来存放拆分后的PDF块
-    temp_dir = "pdf_chunks"
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-
-    # 1. 拆分PDF
-    chunk_paths = []
+    # 1. 按页码范围分块（只记录范围，不写临时文件）
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            total_pages = len(reader.pages)
-            if total_pages == 0:
-                return "错误：PDF文件没有内容。"
-
-            pages_per_thread = math.ceil(total_pages / num_threads)
-
-            for i in range(num_threads):
-                start_page = i * pages_per_thread
-                # 确保最后一页不会超出范围
-                end_page = min(start_page + pages_per_thread, total_pages)
-                
-                if start_page >= total_pages:
-                    continue
-
-                writer = PyPDF2.PdfWriter()
-                for page_num in range(start_page, end_page):
-                    writer.add_page(reader.pages[page_num])
-
-                chunk_path = os.path.join(temp_dir, f"chunk_{i}.pdf")
-                with open(chunk_path, 'wb') as chunk_file:
-                    writer.write(chunk_file)
-                chunk_paths.append((i, chunk_path)) # 保存索引和路径，用于后续排序
+        total_pages = get_page_count(pdf_path)
     except Exception as e:
-        return f"拆分PDF时出错: {e}"
+        return f"读取PDF时出错: {e}"
+
+    if total_pages == 0:
+        return "错误：PDF文件没有内容。"
+
+    pages_per_thread = math.ceil(total_pages / num_threads)
+    chunks = []
+    for start_page in range(0, total_pages, pages_per_thread):
+        # 确保最后一页不会超出范围
+        end_page = min(start_page + pages_per_thread, total_pages)
+        chunks.append((len(chunks), start_page, end_page)) # 保存索引和页码范围，用于后续排序
 
-    # 2. 使用线程池并行处理
-    all_results = ["" for _ in range(len(chunk_paths))] # 创建一个列表用于按顺序存放结果
+    # 2. 进程池提取文本，线程池调用API
+    all_results = ["" for _ in range(len(chunks))] # 创建一个列表用于按顺序存放结果
     
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        # 使用一个字典来映射 future 和它的原始索引
-        future_to_index = {executor.submit(parse_pdf_chunk, path): index for index, path in chunk_paths}
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(chunks))) as process_pool, \
+            ThreadPoolExecutor(max_workers=num_threads) as thread_pool:
+        # 使用字典来映射 future 和它的原始索引
+        extract_futures = {
+            process_pool.submit(extract_text_chunk, pdf_path, start, end): index
+            for index, start, end in chunks
+        }
+        api_futures = {}
+
+        for future in as_completed(extract_futures):
+            original_index = extract_futures[future]
+            name = chunk_name(*chunks[original_index][1:])
+            try:
+                text_content = future.result()
+            except Exception as e:
+                print(f"提取 {name} 文本时出错: {e}")
+                text_content = ""
+            api_futures[thread_pool.submit(call_api, name, text_content)] = original_index
 
-        for future in as_completed(future_to_index):
-            original_index = future_to_index[future]
+        for future in as_completed(api_futures):
+            original_index = api_futures[future]
             try:
-                result_content = future.result()
-                all_results[original_index] = result_content # 将结果存放到正确的位置
+                all_results[original_index] = future.result() # 将结果存放到正确的位置
             except Exception as e:
-                chunk_path = chunk_paths[original_index][1]
-                print(f"处理 {chunk_path} 的线程中发生错误: {e}")
-                all_results[original_index] = f"--- 处理 {os.path.basename(chunk_path)} 时出错 ---"
-
-    # 3. 清理临时文件
-    for _, path in chunk_paths:
-        try:
-            os.remove(path)
-        except OSError as e:
-            print(f"删除临时文件 {path} 失败: {e}")
-    try:
-        os.rmdir(temp_dir)
-    except OSError as e:
-        print(f"删除临时目录 {temp_dir} 失败: {e}")
+                name = chunk_name(*chunks[original_index][1:])
+                print(f"处理 {name} 的线程中发生错误: {e}")
+                all_results[original_index] = f"--- 处理 {name} 时出错 ---"
         
-    # 4. 拼接最终结果
+    # 3. 拼接最终结果
     return "".join(all_results)
 
 
@@ -150,7 +174,7 @@ if __name__ == "__main__":
     
     # --- 调用核心函数 ---
     FILE_PATH = DUMMY_PDF_PATH # 替换为您的PDF文件路径
-    NUM_THREADS = 5          # 根据您的CPU核心数和API限制来调整
+    NUM_THREADS = 5          # 并发API调用数，根据API限制来调整
     
     print("\n" + "="*50)
     print(f"开始并行处理PDF，文件: {FILE_PATH}, 线程数: {NUM_THREADS}")
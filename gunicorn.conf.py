@@ -0,0 +1,30 @@
+"""
+Gunicorn 配置
+生产环境启动: gunicorn -c gunicorn.conf.py app:app
+
+preload_app 开启时，模型路径设置和处理器预加载在master进程中完成后再fork worker，
+各worker通过写时复制共享只读的模型内存，且从第一个请求起就是热的。
+"""
+
+import os
+import multiprocessing
+
+# 在导入config之前决定预加载方式：preload时在master中同步预加载，
+# 避免fork时后台预加载线程持有锁或加载到一半
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+if preload_app:
+    os.environ.setdefault('WARMUP_IN_BACKGROUND', 'false')
+
+# 每个worker各自加载docling模型、各自计算外部API限流（API_MAX_CONCURRENCY 等按worker生效），
+# 默认只启动少量worker；未指定 DOCLING_NUM_THREADS 时按worker数分摊CPU核数，避免推理线程数超过核数
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+os.environ.setdefault('DOCLING_NUM_THREADS', str(max(1, min(8, multiprocessing.cpu_count() // workers))))
+
+from config import Config  # noqa: E402  （同时加载.env）
+
+bind = f"{Config.HOST}:{Config.PORT}"
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# OCR处理单个文件可能持续数分钟
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+loglevel = Config.LOG_LEVEL.lower()
+accesslog = '-'
@@ -1,4 +1,21 @@
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 流式构建multipart请求体，上传大文件时无需先把整个请求体读入内存
+try:
+    from requests_toolbelt import MultipartEncoder
+    TOOLBELT_AVAILABLE = True
+except ImportError:
+    TOOLBELT_AVAILABLE = False
+
+# 复用连接，连续解析多个文件时不必每次重新建立TCP连接；只对连接失败重试，不会重复上传已发出的文件
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                       max_retries=Retry(total=2, read=0, backoff_factor=0.3))
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
 
 def parse_pdf(file_path):
     """
@@ -9,9 +26,14 @@ def parse_pdf(file_path):
     url = "http://38.60.251.79:7860/api/parse"  
     
     with open(file_path, 'rb') as f:
-        files = {'file': (file_path.split('/')[-1], f, 'application/pdf')}
-        response = requests.post(url, files=files)
+        if TOOLBELT_AVAILABLE:
+            m = MultipartEncoder(fields={'file': (os.path.basename(file_path), f, 'application/pdf')})
+            response = session.post(url, data=m, headers={'Content-Type': m.content_type}, stream=True)
+        else:
+            files = {'file': (os.path.basename(file_path), f, 'application/pdf')}
+            response = session.post(url, files=files, stream=True)
     
+    # 先根据状态码判断，成功时才读取响应体并解析JSON
     if response.status_code == 200:
         return response.json()['markdown']
     else:
@@ -25,5 +47,3 @@ if __name__ == "__main__":
         print(markdown_content)
     except Exception as e:
         print(f"发生错误: {e}")
-        
-        
@@ -12,6 +12,69 @@ import urllib.error
 from pathlib import Path
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+# 各项探测都是纯网络等待，用线程并发执行，总耗时取决于最慢的一项而不是超时时间之和
+PROBE_TIMEOUT = 10
+
+def run_probes(probe, targets):
+    """
+    并发执行探测并按完成顺序打印结果
+
+    Args:
+        probe: 探测函数，接收单个目标，返回要打印的文本
+        targets: 探测目标列表
+    """
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [executor.submit(probe, target) for target in targets]
+        for future in as_completed(futures):
+            print(future.result())
+
+@lru_cache(maxsize=None)
+def resolve_host(host):
+    """
+    解析主机的IPv4地址，结果在DNS检查和端口检查之间共享
+
+    Args:
+        host: 域名或IP
+
+    Returns:
+        str: IP地址
+    """
+    return socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
+def probe_url(url):
+    """测试单个URL的连接"""
+    try:
+        response = urllib.request.urlopen(url, timeout=PROBE_TIMEOUT)
+        return f"测试连接: {url}\n✅ 连接成功 - 状态码: {response.getcode()}\n"
+    except urllib.error.URLError as e:
+        return f"测试连接: {url}\n❌ 连接失败: {e}\n"
+    except Exception as e:
+        return f"测试连接: {url}\n❌ 连接错误: {e}\n"
+
+def probe_dns(domain):
+    """解析单个域名"""
+    try:
+        return f"✅ {domain} -> {resolve_host(domain)}"
+    except socket.gaierror as e:
+        return f"❌ {domain} DNS解析失败: {e}"
+
+def probe_port(target):
+    """测试单个主机端口的TCP连接"""
+    host, port = target
+    try:
+        ip = resolve_host(host)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(PROBE_TIMEOUT)
+            result = sock.connect_ex((ip, port))
+        
+        if result == 0:
+            return f"✅ {host}:{port} - 连接成功"
+        return f"❌ {host}:{port} - 连接失败 (错误码: {result})"
+    except Exception as e:
+        return f"❌ {host}:{port} - 连接错误: {e}"
 
 def check_internet_connection():
     """检查基本的互联网连接"""
@@ -24,16 +87,7 @@ def check_internet_connection():
         "https://yunwu.ai"
     ]
     
-    for url in test_urls:
-        try:
-            print(f"测试连接: {url}")
-            response = urllib.request.urlopen(url, timeout=10)
-            print(f"✅ 连接成功 - 状态码: {response.getcode()}")
-        except urllib.error.URLError as e:
-            print(f"❌ 连接失败: {e}")
-        except Exception as e:
-            print(f"❌ 连接错误: {e}")
-        print()
+    run_probes(probe_url, test_urls)
 
 def check_dns_resolution():
     """检查DNS解析"""
@@ -46,12 +100,7 @@ def check_dns_resolution():
         "github.com"
     ]
     
-    for domain in domains:
-        try:
-            ip = socket.gethostbyname(domain)
-            print(f"✅ {domain} -> {ip}")
-        except socket.gaierror as e:
-            print(f"❌ {domain} DNS解析失败: {e}")
+    run_probes(probe_dns, domains)
 
 def check_proxy_settings():
     """检查代理设置"""
@@ -77,19 +126,7 @@ def check_firewall_ports():
         ("38.60.251.79", 7860)  # MonkeyOCR API
     ]
     
-    for host, port in test_connections:
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            result = sock.connect_ex((host, port))
-            sock.close()
-            
-            if result == 0:
-                print(f"✅ {host}:{port} - 连接成功")
-            else:
-                print(f"❌ {host}:{port} - 连接失败 (错误码: {result})")
-        except Exception as e:
-            print(f"❌ {host}:{port} - 连接错误: {e}")
+    run_probes(probe_port, test_connections)
 
 def suggest_solutions():
     """提供解决方案建议"""
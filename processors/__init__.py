@@ -1,14 +1,23 @@
 """
 处理器模块
 提供各种文件类型的OCR处理功能
+
+各处理器依赖docling/torch/openpyxl等库，按属性首次访问时才导入对应子模块（PEP 562），
+导入 processors.pdf_processor 等子模块时也不会连带加载其他处理器
 """
 
+import importlib
+
 from .base import BaseProcessor
-from .pdf_processor import PDFProcessor
-from .image_processor import ImageProcessor
-from .excel_processor import ExcelProcessor
-from .html_processor import HTMLProcessor
-from .word_processor import WordProcessor
+
+# 处理器类名 -> 所在子模块
+_LAZY_PROCESSORS = {
+    'PDFProcessor': '.pdf_processor',
+    'ImageProcessor': '.image_processor',
+    'ExcelProcessor': '.excel_processor',
+    'HTMLProcessor': '.html_processor',
+    'WordProcessor': '.word_processor'
+}
 
 __all__ = [
     'BaseProcessor',
@@ -18,3 +27,18 @@ __all__ = [
     'HTMLProcessor',
     'WordProcessor'
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_PROCESSORS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    processor_class = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到模块命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = processor_class
+    return processor_class
+
+
+def __dir__():
+    return sorted(__all__)
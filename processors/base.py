@@ -4,14 +4,97 @@
 """
 
 import os
+import json
+import mmap
+import stat
+import shutil
 import time
 import logging
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.rate_limiter import RateLimiter
+from utils.result_cache import ResultCache
+
+# JSON请求体/响应优先使用orjson（直接生成bytes），未安装时使用标准库json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# base64编码优先使用SIMD实现的pybase64，未安装时使用标准库（接口相同）
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 logger = logging.getLogger(__name__)
 
+# 文件读写缓冲区大小（默认8KB，逐块读写大文件时系统调用过多）
+IO_BUFFER_SIZE = 1 << 20
+
+# 请求体中base64数据的占位字符串，序列化后替换为编码结果
+BASE64_PLACEHOLDER = '\u0000base64\u0000'
+
+# 分块base64编码的输入块大小（3的倍数，块之间无填充字符）
+BASE64_CHUNK_SIZE = 3 * 16 * 1024
+
+# 不影响处理结果的配置项（缓存目录、并发/限流/超时），不计入结果缓存键
+CACHE_KEY_IGNORED_CONFIG = frozenset({
+    'result_cache_dir', 'result_cache_max_age', 'result_cache_max_size_mb', 'save_intermediate', 'docling_num_threads',
+    'ocr_page_workers', 'pdf_text_workers', 'api_max_concurrency', 'api_requests_per_second',
+    'api_max_retries', 'scanned_pdf_api_timeout', 'scanned_pdf_request_delay'
+})
+
+# 密钥不写入缓存键，只计入是否已配置：是否配置智谱密钥决定扫描PDF使用的OCR引擎
+CACHE_KEY_SECRET_CONFIG = frozenset({'yunwu_api_key', 'zhipuai_api_key'})
+
+
+class Base64JSONBody:
+    """
+    按需编码的JSON请求体
+    
+    迭代时才逐块读取文件并base64编码，内存占用只与块大小有关；实现了 __len__，
+    requests 据此设置 Content-Length 而不使用分块传输。每次迭代都从头生成，
+    限流器退避重试、连接重试时可重复发送
+    """
+    
+    def __init__(self, segments: List[bytes], file_paths: List[Path], file_sizes: List[int]):
+        """
+        Args:
+            segments: JSON序列化结果按占位字符串拆分后的片段，比文件数多一个
+            file_paths: 依次填入各占位处的文件
+            file_sizes: 各文件大小（字节）
+        """
+        self.segments = segments
+        self.file_paths = file_paths
+        self.file_sizes = file_sizes
+        self.length = sum(len(segment) for segment in segments) + sum(
+            4 * ((file_size + 2) // 3) + 2 for file_size in file_sizes
+        )
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    def __iter__(self):
+        for segment, file_path, file_size in zip(self.segments, self.file_paths, self.file_sizes):
+            yield segment + b'"'
+            # 空文件无法mmap
+            if file_size:
+                with open(file_path, 'rb') as file_handle, \
+                        mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for offset in range(0, file_size, BASE64_CHUNK_SIZE):
+                        yield base64.b64encode(mm[offset:offset + BASE64_CHUNK_SIZE])
+            yield b'"'
+        yield self.segments[-1]
+
 
 class ProcessingResult:
     """处理结果类"""
@@ -21,7 +104,7 @@ class ProcessingResult:
         self.success = success
         self.content = content
         self.error = error
-        self.processing_time = processing_time
+        self.processing_time = processing_time  # 处理耗时（秒，由单调时钟 time.perf_counter 计算）
         self.metadata = metadata or {}
     
     def to_dict(self) -> Dict[str, Any]:
@@ -47,6 +130,23 @@ class BaseProcessor(ABC):
         """
         self.config = config or {}
         self.logger = logging.getLogger(self.__class__.__name__)
+        # 支持的扩展名集合，校验时O(1)查找
+        self._supported_extensions = frozenset(self.get_supported_extensions())
+        # 当前线程最近一次校验的 (文件路径, stat结果)，供同一处理流程中的 get_file_info 复用；
+        # 处理器实例跨请求、跨线程共享，因此按线程保存
+        self._last_stat = threading.local()
+        # 按文件内容缓存处理结果（配置了 result_cache_dir 时启用）
+        cache_dir = self.config.get('result_cache_dir')
+        self.result_cache = ResultCache(
+            cache_dir,
+            max_age=int(self.config.get('result_cache_max_age', 0)),
+            max_size=int(self.config.get('result_cache_max_size_mb', 0)) * 1024 * 1024
+        ) if cache_dir else None
+        # 影响输出的配置（模型、接口地址、识别参数等）变化时缓存键随之变化，不会返回旧配置下的结果
+        self._config_digest = ResultCache.config_digest({
+            key: bool(value) if key in CACHE_KEY_SECRET_CONFIG else value
+            for key, value in self.config.items() if key not in CACHE_KEY_IGNORED_CONFIG
+        })
     
     @abstractmethod
     def process(self, file_path: Path) -> ProcessingResult:
@@ -81,26 +181,196 @@ class BaseProcessor(ABC):
         Returns:
             bool: 文件是否有效
         """
-        if not file_path.exists():
+        # 只调用一次stat，再根据结果判断类型和大小
+        try:
+            st = file_path.stat()
+        except FileNotFoundError:
             self.logger.error(f"文件不存在: {file_path}")
             return False
+        except OSError as e:
+            self.logger.error(f"读取文件信息失败: {file_path}, {e}")
+            return False
         
-        if not file_path.is_file():
+        if not stat.S_ISREG(st.st_mode):
             self.logger.error(f"路径不是文件: {file_path}")
             return False
         
-        if file_path.stat().st_size == 0:
+        if st.st_size == 0:
             self.logger.error(f"文件为空: {file_path}")
             return False
         
         # 检查文件扩展名
         file_ext = file_path.suffix.lower()
-        if file_ext not in self.get_supported_extensions():
+        if file_ext not in self._supported_extensions:
             self.logger.error(f"不支持的文件类型: {file_ext}")
             return False
         
+        self._last_stat.entry = (file_path, st)
         return True
     
+    def get_rate_limiter(self, upstream: str) -> RateLimiter:
+        """
+        获取外部API的共享限流器
+        
+        同一上游服务的请求在进程内共用并发名额和请求间隔，
+        参数来自配置项 api_max_concurrency / api_requests_per_second / api_max_retries。
+        
+        Args:
+            upstream: 上游服务名称
+            
+        Returns:
+            RateLimiter: 限流器实例
+        """
+        return RateLimiter.for_upstream(
+            upstream,
+            max_concurrency=int(self.config.get('api_max_concurrency', 4)),
+            requests_per_second=float(self.config.get('api_requests_per_second', 0.0)),
+            max_retries=int(self.config.get('api_max_retries', 3))
+        )
+    
+    @staticmethod
+    def create_session(pool_size: int) -> requests.Session:
+        """
+        创建调用外部API的长连接会话
+        
+        连接池大小应与限流器的最大并发一致。连接失效（如空闲长连接被服务端关闭）时重新建连，
+        不重试读超时；429/503 的退避重试由限流器负责
+        
+        Args:
+            pool_size: 连接池大小
+            
+        Returns:
+            requests.Session: 会话实例
+        """
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size),
+                              max_retries=Retry(total=2, read=0, backoff_factor=0.3))
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    @staticmethod
+    def encode_file_base64(file_path: Path) -> bytes:
+        """
+        将文件内容编码为base64
+        
+        直接对内存映射编码，不先把整个文件读成bytes
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            bytes: base64编码结果（只含ASCII字符）
+        """
+        with open(file_path, 'rb') as file_handle:
+            # 空文件无法mmap
+            if os.fstat(file_handle.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return base64.b64encode(mm)
+    
+    @staticmethod
+    def dumps_json(payload: Any) -> bytes:
+        """
+        将请求数据序列化为UTF-8编码的JSON
+        
+        Args:
+            payload: 请求数据
+            
+        Returns:
+            bytes: JSON请求体
+        """
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(payload)
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    
+    @staticmethod
+    def loads_json(data: bytes) -> Any:
+        """
+        解析JSON响应体（如 response.content）
+        
+        Args:
+            data: JSON字节串
+            
+        Returns:
+            Any: 解析结果
+        """
+        if ORJSON_AVAILABLE:
+            return orjson.loads(data)
+        return json.loads(data)
+    
+    @classmethod
+    def build_json_body(cls, payload: Dict[str, Any], *file_paths: Path) -> Base64JSONBody:
+        """
+        生成包含文件base64数据的JSON请求体
+        
+        payload 中以 BASE64_PLACEHOLDER 标记数据位置，按出现顺序依次对应 file_paths；
+        base64字符在JSON中无需转义，发送时按块把文件的内存映射编码后直接写入连接，
+        不生成完整的base64数据，也不经过 bytes -> str 解码和序列化器对大字符串的再次复制
+        
+        Args:
+            payload: 请求数据
+            *file_paths: 需要编码的文件路径
+            
+        Returns:
+            Base64JSONBody: 可直接作为 requests 的 data 参数的请求体
+        """
+        segments = cls.dumps_json(payload).split(cls.dumps_json(BASE64_PLACEHOLDER))
+        if len(segments) != len(file_paths) + 1:
+            raise ValueError(f"请求数据中有 {len(segments) - 1} 处base64占位，但提供了 {len(file_paths)} 个文件")
+        
+        file_sizes = [os.stat(file_path).st_size for file_path in file_paths]
+        return Base64JSONBody(segments, list(file_paths), file_sizes)
+    
+    def lookup_cached_result(self, file_path: Path, start_time: float) -> Tuple[Optional[str], Optional[ProcessingResult]]:
+        """
+        查找文件的缓存结果，批量处理路径与单文件路径共用
+        
+        Args:
+            file_path: 已通过校验的输入文件路径
+            start_time: 处理开始时间（time.perf_counter）
+            
+        Returns:
+            Tuple[Optional[str], Optional[ProcessingResult]]: (缓存键, 命中时的处理结果)，未启用缓存时缓存键为None
+        """
+        if not self.result_cache:
+            return None, None
+        cache_key = self.result_cache.make_key(self.__class__.__name__, file_path, self._config_digest)
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        self.logger.info(f"命中结果缓存: {file_path.name}")
+        return cache_key, ProcessingResult(
+            success=True,
+            content=cached.get('content', ''),
+            processing_time=time.perf_counter() - start_time,
+            metadata={**cached.get('metadata', {}), 'cache_hit': True}
+        )
+    
+    def is_cacheable(self, result: ProcessingResult) -> bool:
+        """
+        判断处理结果是否可以缓存；只缓存成功的结果，失败（如上游接口异常）时下次重新处理。
+        结果可能部分失败的处理器需覆盖此方法
+        
+        Args:
+            result: 处理结果
+            
+        Returns:
+            bool: 是否可以缓存
+        """
+        return result.success
+    
+    def store_cached_result(self, cache_key: Optional[str], result: ProcessingResult):
+        """
+        写入处理结果缓存（仅 is_cacheable 为真的结果）
+        
+        Args:
+            cache_key: lookup_cached_result 返回的缓存键，为None时不缓存
+            result: 处理结果
+        """
+        if cache_key and self.is_cacheable(result):
+            self.result_cache.set(cache_key, {'content': result.content, 'metadata': result.metadata})
+    
     def process_with_timing(self, file_path: Path) -> ProcessingResult:
         """
         带计时的处理方法
@@ -111,7 +381,7 @@ class BaseProcessor(ABC):
         Returns:
             ProcessingResult: 处理结果
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             # 验证文件
@@ -119,16 +389,22 @@ class BaseProcessor(ABC):
                 return ProcessingResult(
                     success=False,
                     error="文件验证失败",
-                    processing_time=time.time() - start_time
+                    processing_time=time.perf_counter() - start_time
                 )
             
             self.logger.info(f"开始处理文件: {file_path.name}")
             
+            # 相同内容的文件已处理过时直接返回缓存的结果
+            cache_key, cached = self.lookup_cached_result(file_path, start_time)
+            if cached is not None:
+                return cached
+            
             # 调用具体的处理方法
             result = self.process(file_path)
+            self.store_cached_result(cache_key, result)
             
             # 更新处理时间
-            result.processing_time = time.time() - start_time
+            result.processing_time = time.perf_counter() - start_time
             
             if result.success:
                 self.logger.info(f"文件处理成功: {file_path.name}, 耗时: {result.processing_time:.2f}秒")
@@ -138,7 +414,7 @@ class BaseProcessor(ABC):
             return result
             
         except Exception as e:
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             error_msg = f"处理文件时发生异常: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
             
@@ -148,6 +424,18 @@ class BaseProcessor(ABC):
                 processing_time=processing_time
             )
     
+    def process_batch(self, file_paths: List[Path]) -> List[ProcessingResult]:
+        """
+        批量处理文件，默认逐个调用 process_with_timing，子类可覆盖实现合并推理
+        
+        Args:
+            file_paths: 输入文件路径列表
+            
+        Returns:
+            List[ProcessingResult]: 与输入顺序一致的处理结果
+        """
+        return [self.process_with_timing(file_path) for file_path in file_paths]
+    
     def cleanup_temp_files(self, *file_paths):
         """
         清理临时文件
@@ -156,17 +444,25 @@ class BaseProcessor(ABC):
             *file_paths: 要清理的文件路径
         """
         for file_path in file_paths:
+            if not isinstance(file_path, (str, Path)):
+                continue
+            
+            # 直接删除，由内核判断文件是否存在，不再逐个 exists()/is_file() 检查
+            try:
+                os.unlink(file_path)
+                self.logger.debug(f"已删除临时文件: {file_path}")
+                continue
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                # 目录需要递归删除（Linux返回EISDIR，macOS返回EPERM）
+                if not os.path.isdir(file_path):
+                    self.logger.warning(f"清理临时文件失败: {file_path}, 错误: {e}")
+                    continue
+            
             try:
-                if isinstance(file_path, (str, Path)):
-                    path = Path(file_path)
-                    if path.exists():
-                        if path.is_file():
-                            path.unlink()
-                            self.logger.debug(f"已删除临时文件: {path}")
-                        elif path.is_dir():
-                            import shutil
-                            shutil.rmtree(path)
-                            self.logger.debug(f"已删除临时目录: {path}")
+                shutil.rmtree(file_path)
+                self.logger.debug(f"已删除临时目录: {file_path}")
             except Exception as e:
                 self.logger.warning(f"清理临时文件失败: {file_path}, 错误: {e}")
     
@@ -181,12 +477,14 @@ class BaseProcessor(ABC):
             Dict: 文件信息
         """
         try:
-            stat = file_path.stat()
+            # 复用 validate_file 在本线程中对同一文件的stat结果
+            entry = getattr(self._last_stat, 'entry', None)
+            st = entry[1] if entry and entry[0] == file_path else file_path.stat()
             return {
                 'name': file_path.name,
-                'size': stat.st_size,
+                'size': st.st_size,
                 'extension': file_path.suffix.lower(),
-                'modified_time': stat.st_mtime
+                'modified_time': st.st_mtime
             }
         except Exception as e:
             self.logger.error(f"获取文件信息失败: {e}")
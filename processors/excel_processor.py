@@ -3,13 +3,16 @@ Excel处理器
 处理Excel文件，支持.xls和.xlsx格式，包含合并单元格处理
 """
 
+import io
+import re
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from .base import BaseProcessor, ProcessingResult
+from .base import BaseProcessor, ProcessingResult, IO_BUFFER_SIZE
 
 # Excel处理相关导入
 try:
+    import numpy as np
     import pandas as pd
     from openpyxl import load_workbook
     from openpyxl.utils import range_boundaries
@@ -19,6 +22,13 @@ except ImportError:
     EXCEL_AVAILABLE = False
 
 
+# 工作表XML中单元格数据的结束位置（</sheetData> 或空的 <sheetData/>，可能带命名空间前缀）
+_SHEET_DATA_END_RE = re.compile(rb'</(?:\w+:)?sheetData>|<(?:\w+:)?sheetData\s*/>')
+_SHEET_DATA_END_MAX_LEN = 64
+# <mergeCell ref="A1:B2"/>
+_MERGE_CELL_RE = re.compile(rb'<(?:\w+:)?mergeCell\s+ref="([^"]+)"')
+
+
 class ExcelProcessor(BaseProcessor):
     """Excel文档处理器"""
     
@@ -49,51 +59,138 @@ class ExcelProcessor(BaseProcessor):
         Returns:
             Dict: {工作表名: DataFrame}
         """
-        wb = load_workbook(file_path)
+        # 只读模式按行流式解析工作表XML，不为每个单元格创建Cell对象；data_only读取公式的缓存结果
+        wb = load_workbook(file_path, read_only=True, data_only=True)
         sheets_data = {}
         
-        # 确定要处理的工作表列表
-        sheets_to_process = [wb.active] if active_sheet_only else wb.worksheets
-        
-        for ws in sheets_to_process:
-            # 创建合并单元格映射
-            merged_map = {}
-            if ws.merged_cells.ranges:
-                for merged_range in ws.merged_cells.ranges:
-                    min_col, min_row, max_col, max_row = range_boundaries(str(merged_range))
-                    for row in range(min_row, max_row + 1):
-                        for col in range(min_col, max_col + 1):
-                            merged_map[(row, col)] = (min_row, min_col)
-            
-            # 构建完整数据
-            data = []
-            for row in ws.iter_rows():
-                row_data = []
-                for cell in row:
-                    if (cell.row, cell.column) in merged_map:
-                        m_row, m_col = merged_map[(cell.row, cell.column)]
-                        if cell.row == m_row and cell.column == m_col:
-                            row_data.append(cell.value)
-                        else:
-                            row_data.append("")  # 标记为合并单元格
-                    else:
-                        row_data.append(cell.value)
-                data.append(row_data)
-            
-            # 创建DataFrame
-            if data:
-                # 处理列名
-                headers = data[0] if data else []
-                # 确保列名不为None
-                headers = [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(headers)]
+        try:
+            # 确定要处理的工作表列表
+            sheets_to_process = [wb.active] if active_sheet_only else wb.worksheets
+            
+            # 私有接口不可用时的合并范围（首次需要时一次性加载）
+            fallback_merged = None
+            
+            for ws in sheets_to_process:
+                # 只读模式按 <dimension> 记录的范围迭代，部分程序生成的文件该记录缺失或过时，
+                # 读取前清除，按实际数据确定范围
+                ws.reset_dimensions()
+                # 一次性读出所有行，按最长行补齐为二维数组（只读模式下缺失的单元格为None）
+                rows = list(ws.iter_rows(values_only=True))
+                width = max((len(row) for row in rows), default=0)
+                values = np.empty((len(rows), width), dtype=object)
+                for row_idx, row in enumerate(rows):
+                    values[row_idx, :len(row)] = row
+                
+                sheet_merged = self._read_merged_ranges(ws)
+                if sheet_merged is None:
+                    if fallback_merged is None:
+                        fallback_merged = self._load_merged_ranges(file_path)
+                    sheet_merged = fallback_merged.get(ws.title, [])
                 
-                # 创建DataFrame
-                df_data = data[1:] if len(data) > 1 else []
-                df = pd.DataFrame(df_data, columns=headers)
-                sheets_data[ws.title] = df
+                # 合并范围转换为从0开始、左闭右开的 (起始行, 结束行, 起始列, 结束列)
+                merged_ranges = []
+                for merged_range in sheet_merged:
+                    min_col, min_row, max_col, max_row = range_boundaries(merged_range)
+                    merged_ranges.append((min_row - 1, max_row, min_col - 1, max_col))
+                
+                df = self._build_dataframe(values, merged_ranges)
+                if df is not None:
+                    sheets_data[ws.title] = df
+        finally:
+            # 只读模式会保持xlsx压缩包打开，需显式关闭
+            wb.close()
         
         return sheets_data
     
+    @staticmethod
+    def _build_dataframe(values, merged_ranges):
+        """
+        将工作表的二维数组转换为DataFrame，合并区域按左上角单元格的值整块填充
+        
+        Args:
+            values: 单元格值的二维object数组，首行作为列名
+            merged_ranges: 合并范围列表，元素为从0开始、左闭右开的 (起始行, 结束行, 起始列, 结束列)
+            
+        Returns:
+            DataFrame: 工作表数据，工作表为空时返回None
+        """
+        if not values.shape[0]:
+            return None
+        
+        # 每个合并区域一次切片赋值，无需逐个单元格查表
+        nrows, ncols = values.shape
+        for rlo, rhi, clo, chi in merged_ranges:
+            if rlo < nrows and clo < ncols:
+                values[rlo:rhi, clo:chi] = values[rlo, clo]
+        
+        # 处理列名，确保列名不为None
+        headers = [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(values[0])]
+        return pd.DataFrame(values[1:], columns=headers)
+    
+    @staticmethod
+    def _load_merged_ranges(file_path: Path) -> Dict[str, list]:
+        """
+        以非只读模式加载工作簿，通过公开的 merged_cells 读取各工作表的合并范围
+        
+        比 _read_merged_ranges 慢得多（为每个单元格创建对象），仅在其不可用时使用
+        
+        Args:
+            file_path: Excel文件路径
+            
+        Returns:
+            Dict: {工作表名: 合并范围字符串列表}
+        """
+        wb = load_workbook(file_path)
+        try:
+            return {ws.title: [str(cell_range) for cell_range in ws.merged_cells.ranges] for ws in wb.worksheets}
+        finally:
+            wb.close()
+    
+    @staticmethod
+    def _read_merged_ranges(ws) -> Optional[list]:
+        """
+        读取只读工作表的合并单元格范围
+        
+        只读工作表不提供 merged_cells。<mergeCells> 位于工作表XML中 <sheetData> 之后，
+        这里按块读取XML字节、跳过单元格数据部分，只对其后的内容做正则匹配，不进行XML解析；
+        没有合并单元格的工作表几乎没有额外开销。
+        
+        打开工作表XML用的是 ReadOnlyWorksheet._get_source（openpyxl私有方法，
+        requirements.txt 固定了openpyxl版本）；该方法不存在时返回None，
+        由调用方改用 _load_merged_ranges。
+        
+        Args:
+            ws: openpyxl 只读工作表
+            
+        Returns:
+            Optional[list]: 合并范围字符串列表，如 ['A1:B2']；无法读取时为None
+        """
+        get_source = getattr(ws, '_get_source', None)
+        if get_source is None:
+            return None
+        
+        tail = None
+        carry = b''
+        with get_source() as src:
+            while True:
+                chunk = src.read(IO_BUFFER_SIZE)
+                if not chunk:
+                    break
+                if tail is not None:
+                    tail.append(chunk)
+                    continue
+                data = carry + chunk
+                match = _SHEET_DATA_END_RE.search(data)
+                if match:
+                    tail = [data[match.end():]]
+                else:
+                    # 保留块尾，防止结束标签跨块
+                    carry = data[-_SHEET_DATA_END_MAX_LEN:]
+        
+        if tail is None:
+            return []
+        return [ref.decode('ascii') for ref in _MERGE_CELL_RE.findall(b''.join(tail))]
+    
     def parse_xls_file(self, file_path: Path, active_sheet_only: bool = False) -> Dict[str, Any]:
         """
         使用xlrd处理.xls文件
@@ -105,51 +202,34 @@ class ExcelProcessor(BaseProcessor):
         Returns:
             Dict: {工作表名: DataFrame}
         """
-        wb = xlrd.open_workbook(file_path, formatting_info=True)
+        # formatting_info=True 不能去掉：xlrd只在解析格式记录时才提取合并单元格信息。
+        # on_demand=True 时工作表按需加载，处理完一个就卸载，多工作表文件不必同时驻留内存
+        wb = xlrd.open_workbook(file_path, formatting_info=True, on_demand=True)
         sheets_data = {}
         
-        # 确定要处理的工作表列表
-        if active_sheet_only:
-            sheets_to_process = [wb.sheet_by_index(wb.active_sheet)]
-        else:
-            sheets_to_process = [wb.sheet_by_index(i) for i in range(wb.nsheets)]
-        
-        for ws in sheets_to_process:
-            # 获取合并单元格信息
-            merged_cells = ws.merged_cells
-            merged_map = {}
-            
-            for crange in merged_cells:
-                rlo, rhi, clo, chi = crange
-                for row in range(rlo, rhi):
-                    for col in range(clo, chi):
-                        merged_map[(row, col)] = (rlo, clo)
-            
-            # 构建完整数据
-            data = []
-            for row_idx in range(ws.nrows):
-                row_data = []
+        try:
+            # 确定要处理的工作表列表
+            if active_sheet_only:
+                sheet_indexes = [wb.active_sheet]
+            else:
+                sheet_indexes = range(wb.nsheets)
+            
+            for sheet_index in sheet_indexes:
+                ws = wb.sheet_by_index(sheet_index)
+                
+                # 按列整体读取（col_values 在xlrd内部完成），不再逐个单元格调用 cell_value
+                values = np.empty((ws.nrows, ws.ncols), dtype=object)
                 for col_idx in range(ws.ncols):
-                    if (row_idx, col_idx) in merged_map:
-                        m_row, m_col = merged_map[(row_idx, col_idx)]
-                        if row_idx == m_row and col_idx == m_col:
-                            row_data.append(ws.cell_value(row_idx, col_idx))
-                        else:
-                            row_data.append("")  # 标记为合并单元格
-                    else:
-                        row_data.append(ws.cell_value(row_idx, col_idx))
-                data.append(row_data)
-            
-            # 创建DataFrame
-            if data:
-                # 处理列名
-                headers = data[0] if data else []
-                headers = [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(headers)]
+                    values[:, col_idx] = ws.col_values(col_idx)
+                
+                # xlrd的合并范围已是从0开始、左闭右开的 (起始行, 结束行, 起始列, 结束列)
+                df = self._build_dataframe(values, ws.merged_cells)
+                if df is not None:
+                    sheets_data[ws.name] = df
                 
-                # 创建DataFrame
-                df_data = data[1:] if len(data) > 1 else []
-                df = pd.DataFrame(df_data, columns=headers)
-                sheets_data[ws.name] = df
+                wb.unload_sheet(sheet_index)
+        finally:
+            wb.release_resources()
         
         return sheets_data
     
@@ -171,6 +251,43 @@ class ExcelProcessor(BaseProcessor):
         else:
             return self.parse_xlsx_file(file_path, active_sheet_only)
     
+    @staticmethod
+    def _format_markdown_cell(value) -> str:
+        """将单元格值格式化为Markdown表格中的文本（空值为空字符串，转义竖线，换行转为<br>）"""
+        if value is None or (isinstance(value, float) and value != value):
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            # xls中的整数以浮点数存储，去掉多余的 .0
+            return str(int(value))
+        text = str(value)
+        if '|' in text:
+            text = text.replace('|', '\\|')
+        if '\n' in text:
+            text = text.replace('\r\n', '\n').replace('\n', '<br>')
+        return text
+    
+    @classmethod
+    def dataframe_to_markdown(cls, df) -> str:
+        """
+        将DataFrame逐行写成Markdown表格
+        
+        不经过 tabulate（df.to_markdown 会先测量每列宽度并补齐空格），
+        按行直接写入StringIO，耗时和内存与单元格数量成线性关系。
+        
+        Args:
+            df: 工作表数据
+            
+        Returns:
+            str: Markdown表格
+        """
+        fmt = cls._format_markdown_cell
+        buf = io.StringIO()
+        buf.write('| ' + ' | '.join(map(fmt, df.columns)) + ' |\n')
+        buf.write('|' + ' --- |' * len(df.columns) + '\n')
+        for row in df.itertuples(index=False, name=None):
+            buf.write('| ' + ' | '.join(map(fmt, row)) + ' |\n')
+        return buf.getvalue().rstrip('\n')
+    
     def convert_to_markdown(self, sheets_data: Dict[str, Any], file_name: str) -> str:
         """
         将Excel数据转换为Markdown格式
@@ -182,26 +299,26 @@ class ExcelProcessor(BaseProcessor):
         Returns:
             str: Markdown格式的内容
         """
-        markdown_content = f"# {file_name}\n\n"
+        # 各段先收集到列表，最后一次性拼接
+        parts = [f"# {file_name}\n\n"]
         
         for sheet_name, df in sheets_data.items():
-            markdown_content += f"## {sheet_name}\n\n"
+            parts.append(f"## {sheet_name}\n\n")
             
             if not df.empty:
                 # 转换为Markdown表格
                 try:
-                    markdown_table = df.to_markdown(index=False)
-                    markdown_content += markdown_table
+                    parts.append(self.dataframe_to_markdown(df))
                 except Exception as e:
                     self.logger.warning(f"转换工作表 {sheet_name} 为Markdown时出错: {e}")
                     # 回退到简单的文本格式
-                    markdown_content += f"```\n{df.to_string(index=False)}\n```"
+                    parts.append(f"```\n{df.to_string(index=False)}\n```")
             else:
-                markdown_content += "*此工作表为空*"
+                parts.append("*此工作表为空*")
             
-            markdown_content += "\n\n"
+            parts.append("\n\n")
         
-        return markdown_content.strip()
+        return "".join(parts).strip()
     
     def process(self, file_path: Path) -> ProcessingResult:
         """
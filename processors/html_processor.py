@@ -3,19 +3,58 @@ HTML处理器
 处理HTML文件，将HTML内容转换为Markdown格式
 """
 
+import re
 from pathlib import Path
 from typing import Dict, Any
 
-from .base import BaseProcessor, ProcessingResult
+from .base import BaseProcessor, ProcessingResult, IO_BUFFER_SIZE
 
 # HTML处理相关导入
 try:
-    from bs4 import BeautifulSoup, Comment
-    import html2text
+    from bs4 import BeautifulSoup, Comment, Tag
     HTML_AVAILABLE = True
 except ImportError:
     HTML_AVAILABLE = False
 
+# 安装了markdownify时直接遍历已解析的文档树生成Markdown，无需先序列化为字符串再由html2text重新解析
+try:
+    from markdownify import MarkdownConverter
+    MARKDOWNIFY_AVAILABLE = True
+except ImportError:
+    MARKDOWNIFY_AVAILABLE = False
+
+# html2text仅在未安装markdownify时作为备用转换器（不在requirements.txt中）
+try:
+    import html2text
+    HTML2TEXT_AVAILABLE = True
+except ImportError:
+    HTML2TEXT_AVAILABLE = False
+
+# 优先使用C实现的lxml解析器，未安装时回退到标准库的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 非UTF-8文件的编码检测（charset_normalizer 随 requests 一起安装）
+try:
+    import charset_normalizer
+    CHARSET_DETECTION_AVAILABLE = True
+except ImportError:
+    CHARSET_DETECTION_AVAILABLE = False
+
+# 编码检测使用的样本大小
+_ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# 换行符两侧除换行外的空白字符（与 str.strip 处理的字符一致）
+_LINE_WHITESPACE_RE = re.compile(r'[^\S\n]*\n[^\S\n]*')
+# 三个及以上连续换行（即两个以上空行）
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+# 清理时整体移除的标签
+_REMOVED_TAGS = frozenset(["script", "style", "nav", "header", "footer", "aside"])
+
 
 class HTMLProcessor(BaseProcessor):
     """HTML文档处理器"""
@@ -29,16 +68,29 @@ class HTMLProcessor(BaseProcessor):
         """
         super().__init__(config)
         
-        if not HTML_AVAILABLE:
+        if not HTML_AVAILABLE or not (MARKDOWNIFY_AVAILABLE or HTML2TEXT_AVAILABLE):
             raise ImportError("HTML处理相关库未安装，无法处理HTML文件")
         
-        # 配置html2text转换器
-        self.h = html2text.HTML2Text()
-        self.h.ignore_links = False
-        self.h.ignore_images = False
-        self.h.body_width = 0  # 不限制行宽
-        self.h.unicode_snob = True
-        self.h.escape_snob = True
+        # MarkdownConverter只保存转换选项，不保存文档状态，可在线程间共享
+        self.md_converter = MarkdownConverter(heading_style='atx', bullets='*') if MARKDOWNIFY_AVAILABLE else None
+    
+    def _create_html2text(self) -> "html2text.HTML2Text":
+        """
+        创建html2text转换器
+        
+        HTML2Text在解析过程中保存文档状态，不能在多个线程间共享，
+        处理器实例会被跨请求缓存，因此每次转换都创建新的转换器。
+        
+        Returns:
+            html2text.HTML2Text: 配置好的转换器
+        """
+        h = html2text.HTML2Text()
+        h.ignore_links = False
+        h.ignore_images = False
+        h.body_width = 0  # 不限制行宽
+        h.unicode_snob = True
+        h.escape_snob = True
+        return h
     
     def get_supported_extensions(self) -> list:
         """获取支持的文件扩展名"""
@@ -54,27 +106,107 @@ class HTMLProcessor(BaseProcessor):
         Returns:
             str: 清理后的HTML内容
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = BeautifulSoup(html_content, HTML_PARSER)
+        self.clean_soup(soup)
+        return str(soup)
+    
+    def clean_soup(self, soup: BeautifulSoup) -> None:
+        """
+        在已解析的文档树上原地移除不必要的元素
         
-        # 移除脚本和样式
-        for script in soup(["script", "style"]):
-            script.decompose()
+        Args:
+            soup: BeautifulSoup对象
+        """
+        _, scan = self._scan_soup(soup)
+        self._remove_scanned(scan)
+    
+    @staticmethod
+    def _scan_soup(soup: BeautifulSoup) -> tuple[Dict[str, Any], Dict[str, list]]:
+        """
+        一次遍历文档树，同时提取元数据并收集需要清理的节点
         
-        # 移除注释
-        comments = soup.findAll(text=lambda text: isinstance(text, Comment))
-        for comment in comments:
+        Args:
+            soup: BeautifulSoup对象
+            
+        Returns:
+            tuple: (元数据, {'tags': 整体移除的标签, 'comments': 注释, 'blocks': 待检查是否为空的p/div})
+        """
+        title = None
+        meta_items = []
+        language = None
+        scan = {'tags': [], 'comments': [], 'blocks': []}
+        
+        for node in soup.descendants:
+            if isinstance(node, Tag):
+                name = node.name
+                if name in _REMOVED_TAGS:
+                    scan['tags'].append(node)
+                elif name in ('p', 'div'):
+                    scan['blocks'].append(node)
+                elif name == 'meta':
+                    meta_name = node.get('name') or node.get('property')
+                    content = node.get('content')
+                    if meta_name and content:
+                        meta_items.append((meta_name, content))
+                elif name == 'title' and title is None:
+                    title = node.get_text().strip()
+                elif name == 'html' and language is None:
+                    language = node.get('lang') or ''
+            elif isinstance(node, Comment):
+                scan['comments'].append(node)
+        
+        # 组装顺序与逐项查找时一致：标题、meta（同名时后者覆盖）、语言
+        metadata = {}
+        if title is not None:
+            metadata['title'] = title
+        metadata.update(meta_items)
+        if language:
+            metadata['language'] = language
+        
+        return metadata, scan
+    
+    @staticmethod
+    def _remove_scanned(scan: Dict[str, list]) -> None:
+        """移除 _scan_soup 收集到的节点"""
+        # 先移除注释：位于下面被移除标签内的注释在标签decompose后已失效，再extract会报错
+        for comment in scan['comments']:
             comment.extract()
         
-        # 移除一些不必要的标签
-        for tag in soup(["nav", "header", "footer", "aside"]):
-            tag.decompose()
+        # 移除脚本、样式和导航等不必要的标签（嵌套在已移除标签内的跳过）
+        for tag in scan['tags']:
+            if not tag.decomposed:
+                tag.decompose()
         
-        # 移除空的段落和div
-        for tag in soup.find_all(['p', 'div']):
-            if not tag.get_text(strip=True):
+        # 移除空的段落和div（需在上面的节点移除之后判断）
+        for tag in scan['blocks']:
+            if not tag.decomposed and not tag.get_text(strip=True):
                 tag.decompose()
+    
+    @staticmethod
+    def decode_html(raw: bytes) -> tuple[str, str]:
+        """
+        解码HTML文件内容
         
-        return str(soup)
+        优先按UTF-8严格解码（绝大多数文件），失败时用 charset_normalizer 根据前64KB检测编码，
+        检测不出时按GBK处理；无法解码的字节替换为U+FFFD，不会静默丢弃。
+        
+        Args:
+            raw: 文件的原始字节
+            
+        Returns:
+            tuple: (HTML文本, 使用的编码)
+        """
+        try:
+            return raw.decode('utf-8-sig'), 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        
+        encoding = None
+        if CHARSET_DETECTION_AVAILABLE:
+            best = charset_normalizer.from_bytes(raw[:_ENCODING_SAMPLE_SIZE]).best()
+            encoding = best.encoding if best else None
+        encoding = encoding or 'gbk'
+        return raw.decode(encoding, errors='replace'), encoding
     
     def extract_metadata(self, soup: BeautifulSoup) -> Dict[str, Any]:
         """
@@ -86,27 +218,7 @@ class HTMLProcessor(BaseProcessor):
         Returns:
             Dict: 元数据字典
         """
-        metadata = {}
-        
-        # 提取标题
-        title_tag = soup.find('title')
-        if title_tag:
-            metadata['title'] = title_tag.get_text().strip()
-        
-        # 提取meta信息
-        meta_tags = soup.find_all('meta')
-        for meta in meta_tags:
-            name = meta.get('name') or meta.get('property')
-            content = meta.get('content')
-            if name and content:
-                metadata[name] = content
-        
-        # 提取语言
-        html_tag = soup.find('html')
-        if html_tag and html_tag.get('lang'):
-            metadata['language'] = html_tag.get('lang')
-        
-        return metadata
+        return self._scan_soup(soup)[0]
     
     def convert_to_markdown(self, html_content: str) -> tuple[str, Dict[str, Any]]:
         """
@@ -118,43 +230,25 @@ class HTMLProcessor(BaseProcessor):
         Returns:
             tuple: (Markdown内容, 元数据)
         """
-        # 解析HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 提取元数据
-        metadata = self.extract_metadata(soup)
+        # 解析HTML（只解析一次，在同一次遍历中提取元数据并收集要清理的节点）
+        soup = BeautifulSoup(html_content, HTML_PARSER)
+        metadata, scan = self._scan_soup(soup)
         
         # 清理HTML
-        cleaned_html = self.clean_html(html_content)
+        self._remove_scanned(scan)
         
         # 转换为Markdown
-        markdown_content = self.h.handle(cleaned_html)
-        
-        # 清理Markdown内容
-        lines = markdown_content.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            # 跳过空行和只包含空格的行
-            if line:
-                cleaned_lines.append(line)
-            elif cleaned_lines and cleaned_lines[-1]:  # 保留段落间的空行
-                cleaned_lines.append('')
-        
-        # 移除连续的空行
-        final_lines = []
-        prev_empty = False
-        for line in cleaned_lines:
-            if not line:
-                if not prev_empty:
-                    final_lines.append(line)
-                prev_empty = True
-            else:
-                final_lines.append(line)
-                prev_empty = False
-        
-        return '\n'.join(final_lines).strip(), metadata
+        if self.md_converter is not None:
+            # 只转换正文，<head> 中的标题等已作为元数据提取
+            markdown_content = self.md_converter.convert_soup(soup.body or soup)
+        else:
+            markdown_content = self._create_html2text().handle(str(soup))
+        
+        # 清理Markdown内容：去掉每行首尾空白，连续空行合并为一个
+        markdown_content = _LINE_WHITESPACE_RE.sub('\n', markdown_content)
+        markdown_content = _BLANK_LINES_RE.sub('\n\n', markdown_content)
+        
+        return markdown_content.strip(), metadata
     
     def process(self, file_path: Path) -> ProcessingResult:
         """
@@ -169,9 +263,10 @@ class HTMLProcessor(BaseProcessor):
         try:
             self.logger.info(f"开始处理HTML文件: {file_path.name}")
             
-            # 读取HTML文件
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                html_content = f.read()
+            # 读取HTML文件（只读取一次，再按检测到的编码解码）
+            with open(file_path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+                raw = f.read()
+            html_content, encoding = self.decode_html(raw)
             
             if not html_content.strip():
                 return ProcessingResult(
@@ -193,6 +288,7 @@ class HTMLProcessor(BaseProcessor):
             metadata = {
                 'file_type': 'html',
                 'file_size': file_info.get('size', 0),
+                'encoding': encoding,
                 'html_metadata': html_metadata
             }
             
@@ -201,36 +297,6 @@ class HTMLProcessor(BaseProcessor):
                 content=markdown_content,
                 metadata=metadata
             )
-            
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            try:
-                with open(file_path, 'r', encoding='gbk', errors='ignore') as f:
-                    html_content = f.read()
-                
-                markdown_content, html_metadata = self.convert_to_markdown(html_content)
-                
-                file_info = self.get_file_info(file_path)
-                metadata = {
-                    'file_type': 'html',
-                    'file_size': file_info.get('size', 0),
-                    'encoding': 'gbk',
-                    'html_metadata': html_metadata
-                }
-                
-                return ProcessingResult(
-                    success=True,
-                    content=markdown_content,
-                    metadata=metadata
-                )
-                
-            except Exception as e:
-                error_msg = f"处理HTML文件编码失败: {str(e)}"
-                self.logger.error(error_msg, exc_info=True)
-                return ProcessingResult(
-                    success=False,
-                    error=error_msg
-                )
         
         except Exception as e:
             error_msg = f"处理HTML文件失败: {str(e)}"
@@ -3,20 +3,33 @@
 使用云雾AI的Gemini模型提取图像中的文本内容
 """
 
-import base64
+import re
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional
-import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
 
-from .base import BaseProcessor, ProcessingResult
+from .base import BaseProcessor, ProcessingResult, BASE64_PLACEHOLDER
 
-# 图像处理相关导入
-try:
-    from openai import OpenAI
-    IMAGE_API_AVAILABLE = True
-except ImportError:
-    IMAGE_API_AVAILABLE = False
+# 扩展名（不含点） -> MIME类型
+MIME_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'bmp': 'image/bmp',
+    'tiff': 'image/tiff',
+    'tif': 'image/tiff'
+}
+
+SUPPORTED_EXTENSIONS = tuple(f'.{ext}' for ext in MIME_TYPES)
+
+DEFAULT_PROMPT = "请提取这个图像中的所有文本内容，并以Markdown格式返回。保留原始格式和表格结构，忽略水印和印章。"
+
+# 合并请求时模型在每张图像内容前输出的分隔行
+_PAGE_MARKER_RE = re.compile(r'^[ \t]*-{3}\s*PAGE\s*(\d+)\s*-{3}[ \t]*$', re.MULTILINE)
 
 
 class ImageProcessor(BaseProcessor):
@@ -31,9 +44,16 @@ class ImageProcessor(BaseProcessor):
         """
         super().__init__(config)
         
+        # 处理器实例跨请求缓存，复用同一Session与云雾API保持长连接，避免每张图片重新握手
+        self.session = self.create_session(int(self.config.get('api_max_concurrency', 4)))
+        
+    def close(self):
+        """关闭HTTP会话，释放连接池中的连接"""
+        self.session.close()
+        
     def get_supported_extensions(self) -> list:
         """获取支持的文件扩展名"""
-        return ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff', '.tif']
+        return list(SUPPORTED_EXTENSIONS)
     
     def get_mime_type(self, file_path: Path) -> str:
         """
@@ -45,20 +65,7 @@ class ImageProcessor(BaseProcessor):
         Returns:
             str: MIME类型
         """
-        ext = file_path.suffix.lower().lstrip('.')
-        
-        mime_types = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-            'bmp': 'image/bmp',
-            'tiff': 'image/tiff',
-            'tif': 'image/tiff'
-        }
-        
-        return mime_types.get(ext, 'image/jpeg')
+        return MIME_TYPES.get(file_path.suffix[1:].lower(), 'image/jpeg')
     
     def encode_image(self, file_path: Path) -> str:
         """
@@ -70,8 +77,84 @@ class ImageProcessor(BaseProcessor):
         Returns:
             str: base64编码的图像数据
         """
-        with open(file_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return self.encode_file_base64(file_path).decode('ascii')
+    
+    def get_upload_url(self) -> str:
+        """
+        获取Files API的上传地址
+        
+        未配置 yunwu_upload_url 时由 yunwu_api_base_url 的域名拼接 /upload/v1beta/files
+        
+        Returns:
+            str: 上传地址
+        """
+        upload_url = self.config.get('yunwu_upload_url')
+        if upload_url:
+            return upload_url
+        parts = urlsplit(self.config.get('yunwu_api_base_url') or 'https://yunwu.ai/v1beta/models')
+        return f"{parts.scheme}://{parts.netloc}/upload/v1beta/files"
+    
+    def upload_image(self, file_path: Path, mime_type: str, api_key: str) -> Optional[str]:
+        """
+        通过Gemini Files API上传原始图片（可续传上传协议：start 后一次性 upload, finalize）
+        
+        请求体直接使用文件对象流式发送，不做base64编码，传输字节数比内联方式少约1/4
+        
+        Args:
+            file_path: 图像文件路径
+            mime_type: MIME类型
+            api_key: 云雾API密钥
+            
+        Returns:
+            Optional[str]: 文件URI，上传失败时为None
+        """
+        try:
+            file_size = file_path.stat().st_size
+            limiter = self.get_rate_limiter('yunwu')
+            
+            start_response = limiter.call(
+                self.session.post,
+                self.get_upload_url(),
+                params={"key": api_key},
+                headers={
+                    "X-Goog-Upload-Protocol": "resumable",
+                    "X-Goog-Upload-Command": "start",
+                    "X-Goog-Upload-Header-Content-Length": str(file_size),
+                    "X-Goog-Upload-Header-Content-Type": mime_type,
+                    "Content-Type": "application/json"
+                },
+                data=self.dumps_json({"file": {"display_name": file_path.name}}),
+                timeout=60
+            )
+            session_url = start_response.headers.get('X-Goog-Upload-URL')
+            if start_response.status_code != 200 or not session_url:
+                self.logger.warning(f"Files API上传初始化失败: {start_response.status_code}, {start_response.text[:200]}")
+                return None
+            
+            def send_file():
+                # 每次尝试重新打开文件，限流器退避重试时从头发送
+                with open(file_path, 'rb') as image_file:
+                    return self.session.post(
+                        session_url,
+                        headers={
+                            "Content-Length": str(file_size),
+                            "X-Goog-Upload-Offset": "0",
+                            "X-Goog-Upload-Command": "upload, finalize"
+                        },
+                        data=image_file,
+                        timeout=300
+                    )
+            
+            upload_response = limiter.call(send_file)
+            if upload_response.status_code != 200:
+                self.logger.warning(f"Files API上传失败: {upload_response.status_code}, {upload_response.text[:200]}")
+                return None
+            
+            return self.loads_json(upload_response.content).get('file', {}).get('uri')
+            
+        except Exception as e:
+            self.logger.warning(f"Files API上传出错，改用base64内联方式: {e}")
+            return None
     
     def extract_text_from_image(self, file_path: Path, prompt: Optional[str] = None) -> str:
         """
@@ -85,33 +168,11 @@ class ImageProcessor(BaseProcessor):
             str: 提取的文本内容
         """
         try:
-            # 编码图像
-            base64_image = self.encode_image(file_path)
             mime_type = self.get_mime_type(file_path)
             
             # 默认提示词
             if prompt is None:
-                prompt = "请提取这个图像中的所有文本内容，并以Markdown格式返回。保留原始格式和表格结构，忽略水印和印章。"
-            
-            # 构建请求数据
-            request_data = {
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [
-                            {
-                                "inline_data": {
-                                    "mime_type": mime_type,
-                                    "data": base64_image
-                                }
-                            },
-                            {
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            }
+                prompt = DEFAULT_PROMPT
             
             # 验证API key
             api_key = self.config.get('yunwu_api_key') if self.config else None
@@ -119,51 +180,228 @@ class ImageProcessor(BaseProcessor):
                 self.logger.error("云雾API密钥未配置")
                 return ""
             
-            # 构建API URL
-            base_url = self.config.get('yunwu_api_base_url', 'https://yunwu.ai/v1beta/models')
-            model_name = self.config.get('gemini_model', 'gemini-2.0-flash')
-            url = f"{base_url}/{model_name}:generateContent"
+            # 开启Files API时先上传原始图片再按URI引用，上传失败则回退到base64内联方式
+            file_uri = self.upload_image(file_path, mime_type, api_key) if self.config.get('use_files_api') else None
+            if file_uri:
+                image_part = {
+                    "file_data": {
+                        "mime_type": mime_type,
+                        "file_uri": file_uri
+                    }
+                }
+                inline_files = []
+            else:
+                image_part = self._inline_image_part(file_path)
+                inline_files = [file_path]
             
-            headers = {
-                "Content-Type": "application/json"
-            }
-            params = {
-                "key": api_key
-            }
+            return self._generate_content([image_part, {"text": prompt}], inline_files, api_key)
+                
+        except Exception as e:
+            self.logger.error(f"提取图像文本时出错: {e}")
+            return ""
+    
+    def extract_text_from_images(self, file_paths: List[Path]) -> Optional[List[str]]:
+        """
+        在一次请求中提取多张图像的文本
+        
+        图像按顺序作为多个 inline_data 传入，要求模型在每张图像的内容前输出分隔行，
+        再按分隔行拆分结果
+        
+        Args:
+            file_paths: 图像文件路径列表
+            
+        Returns:
+            Optional[List[str]]: 与输入顺序一致的文本内容；请求失败或结果无法按图像拆分时为None
+        """
+        try:
+            api_key = self.config.get('yunwu_api_key') if self.config else None
+            if not api_key:
+                self.logger.error("云雾API密钥未配置")
+                return None
             
-            response = requests.post(
-                url,
-                json=request_data,
-                headers=headers,
-                params=params,
-                timeout=300
+            prompt = (
+                f"{DEFAULT_PROMPT}\n"
+                f"以上共 {len(file_paths)} 张图像，请按顺序分别提取，"
+                f"每张图像的内容之前单独一行输出 ---PAGE N---（N为图像序号，从1开始）。"
             )
+            parts = [self._inline_image_part(file_path) for file_path in file_paths]
+            parts.append({"text": prompt})
             
-            if response.status_code == 200:
-                result = response.json()
-                if 'candidates' in result and len(result['candidates']) > 0:
-                    content = result['candidates'][0]['content']['parts'][0]['text']
-                    return content
-                else:
-                    self.logger.error("Gemini API返回格式异常")
-                    return ""
-            elif response.status_code == 502:
-                self.logger.error("API网关错误 (502) - 云雾AI服务暂时不可用，请稍后重试")
-                return ""
-            elif response.status_code == 429:
-                self.logger.error("API请求频率限制 (429) - 请稍后重试")
-                return ""
-            elif response.status_code == 401:
-                self.logger.error("API认证失败 (401) - 请检查API密钥是否正确")
-                return ""
+            content = self._generate_content(parts, file_paths, api_key)
+            if not content:
+                return None
+            
+            pages = {}
+            matches = list(_PAGE_MARKER_RE.finditer(content))
+            for match, next_match in zip(matches, matches[1:] + [None]):
+                end = next_match.start() if next_match else len(content)
+                pages[int(match.group(1))] = content[match.end():end].strip()
+            
+            texts = [pages.get(index, "") for index in range(1, len(file_paths) + 1)]
+            if len(pages) != len(file_paths) or not all(texts):
+                self.logger.warning(f"合并请求的结果无法按图像拆分（识别到 {len(pages)}/{len(file_paths)} 段）")
+                return None
+            return texts
+            
+        except Exception as e:
+            self.logger.error(f"批量提取图像文本时出错: {e}")
+            return None
+    
+    def _inline_image_part(self, file_path: Path) -> Dict[str, Any]:
+        """生成以base64内联图像的请求片段，数据在生成请求体时填入"""
+        return {
+            "inline_data": {
+                "mime_type": self.get_mime_type(file_path),
+                "data": BASE64_PLACEHOLDER
+            }
+        }
+    
+    def _generate_content(self, parts: List[Dict[str, Any]], inline_files: List[Path], api_key: str) -> str:
+        """
+        调用Gemini generateContent接口
+        
+        Args:
+            parts: 请求内容片段
+            inline_files: 按顺序对应 parts 中 BASE64_PLACEHOLDER 的图像文件
+            api_key: 云雾API密钥
+            
+        Returns:
+            str: 模型返回的文本，失败时为空字符串
+        """
+        # 构建API URL
+        base_url = self.config.get('yunwu_api_base_url', 'https://yunwu.ai/v1beta/models')
+        model_name = self.config.get('gemini_model', 'gemini-2.0-flash')
+        url = f"{base_url}/{model_name}:generateContent"
+        
+        headers = {
+            "Content-Type": "application/json"
+        }
+        params = {
+            "key": api_key
+        }
+        
+        # 构建请求数据
+        request_data = {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": parts
+                }
+            ]
+        }
+        # 内联的图像在生成请求体时直接编码进去
+        body = self.build_json_body(request_data, *inline_files) if inline_files else self.dumps_json(request_data)
+        
+        response = self.get_rate_limiter('yunwu').call(
+            self.session.post,
+            url,
+            data=body,
+            headers=headers,
+            params=params,
+            timeout=300
+        )
+        
+        if response.status_code == 200:
+            result = self.loads_json(response.content)
+            if 'candidates' in result and len(result['candidates']) > 0:
+                content = result['candidates'][0]['content']['parts'][0]['text']
+                return content
             else:
-                self.logger.error(f"Gemini API调用失败: {response.status_code}, {response.text}")
+                self.logger.error("Gemini API返回格式异常")
                 return ""
-                
-        except Exception as e:
-            self.logger.error(f"提取图像文本时出错: {e}")
+        elif response.status_code == 502:
+            self.logger.error("API网关错误 (502) - 云雾AI服务暂时不可用，请稍后重试")
+            return ""
+        elif response.status_code == 429:
+            self.logger.error("API请求频率限制 (429) - 请稍后重试")
+            return ""
+        elif response.status_code == 401:
+            self.logger.error("API认证失败 (401) - 请检查API密钥是否正确")
+            return ""
+        else:
+            self.logger.error(f"Gemini API调用失败: {response.status_code}, {response.text}")
             return ""
     
+    def process_batch(self, file_paths: List[Path]) -> List[ProcessingResult]:
+        """
+        批量处理图像文件
+        
+        每张图片的耗时几乎全部是等待云雾API响应，使用线程池并发调用，
+        并发数与限流器的最大并发一致（实际请求仍受共享限流器控制）。
+        配置 image_ocr_batch_size 大于1时，每组图片合并为一次请求。
+        
+        Args:
+            file_paths: 图像文件路径列表
+            
+        Returns:
+            List[ProcessingResult]: 与输入顺序一致的处理结果
+        """
+        batch_size = max(1, int(self.config.get('image_ocr_batch_size', 1)))
+        grouped = batch_size > 1 and len(file_paths) > 1
+        if grouped:
+            task = self._process_group
+            tasks = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+        else:
+            task, tasks = self.process_with_timing, file_paths
+        
+        max_workers = min(len(tasks), max(1, int(self.config.get('api_max_concurrency', 4))))
+        if max_workers <= 1:
+            results = [task(item) for item in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-ocr') as executor:
+                results = list(executor.map(task, tasks))
+        
+        if not grouped:
+            return results
+        return [result for group_results in results for result in group_results]
+    
+    def _process_group(self, file_paths: List[Path]) -> List[ProcessingResult]:
+        """
+        合并为一次请求处理一组图像，结果无法按图像拆分时逐张处理
+        
+        Args:
+            file_paths: 图像文件路径列表
+            
+        Returns:
+            List[ProcessingResult]: 与输入顺序一致的处理结果
+        """
+        start_time = time.perf_counter()
+        # 命中结果缓存的图像不再参与合并请求，与单文件处理行为一致
+        cached_results: Dict[Path, ProcessingResult] = {}
+        cache_keys: Dict[Path, Optional[str]] = {}
+        for file_path in file_paths:
+            if not self.validate_file(file_path):
+                continue
+            cache_keys[file_path], cached = self.lookup_cached_result(file_path, start_time)
+            if cached is not None:
+                cached_results[file_path] = cached
+        valid = [file_path for file_path in cache_keys if file_path not in cached_results]
+        if len(valid) < 2:
+            return [cached_results.get(file_path) or self.process_with_timing(file_path) for file_path in file_paths]
+        
+        start_time = time.perf_counter()
+        self.logger.info(f"合并请求提取 {len(valid)} 张图像文本: {', '.join(p.name for p in valid)}")
+        texts = self.extract_text_from_images(valid)
+        if texts is None:
+            return [cached_results.get(file_path) or self.process_with_timing(file_path) for file_path in file_paths]
+        
+        # 合并请求的耗时平均分摊到每张图像
+        processing_time = (time.perf_counter() - start_time) / len(valid)
+        contents = dict(zip(valid, texts))
+        results = []
+        for file_path in file_paths:
+            if file_path in cached_results:
+                results.append(cached_results[file_path])
+                continue
+            if file_path not in contents:
+                results.append(ProcessingResult(success=False, error="文件验证失败"))
+                continue
+            result = self._build_result(file_path, contents[file_path])
+            self.store_cached_result(cache_keys[file_path], result)
+            result.processing_time = processing_time
+            results.append(result)
+        return results
+    
     def process(self, file_path: Path) -> ProcessingResult:
         """
         处理图像文件
@@ -180,26 +418,7 @@ class ImageProcessor(BaseProcessor):
             # 提取文本
             content = self.extract_text_from_image(file_path)
             
-            if not content:
-                return ProcessingResult(
-                    success=False,
-                    error="未能从图像中提取到文本内容"
-                )
-            
-            # 构建元数据
-            file_info = self.get_file_info(file_path)
-            metadata = {
-                'file_type': 'image',
-                'mime_type': self.get_mime_type(file_path),
-                'file_size': file_info.get('size', 0),
-                'model_used': 'gemini-2.0-flash'
-            }
-            
-            return ProcessingResult(
-                success=True,
-                content=content,
-                metadata=metadata
-            )
+            return self._build_result(file_path, content)
             
         except Exception as e:
             error_msg = f"处理图像文件失败: {str(e)}"
@@ -208,3 +427,35 @@ class ImageProcessor(BaseProcessor):
                 success=False,
                 error=error_msg
             )
+    
+    def _build_result(self, file_path: Path, content: str) -> ProcessingResult:
+        """
+        根据提取的文本构建处理结果
+        
+        Args:
+            file_path: 图像文件路径
+            content: 提取的文本内容
+            
+        Returns:
+            ProcessingResult: 处理结果
+        """
+        if not content:
+            return ProcessingResult(
+                success=False,
+                error="未能从图像中提取到文本内容"
+            )
+        
+        # 构建元数据
+        file_info = self.get_file_info(file_path)
+        metadata = {
+            'file_type': 'image',
+            'mime_type': self.get_mime_type(file_path),
+            'file_size': file_info.get('size', 0),
+            'model_used': 'gemini-2.0-flash'
+        }
+        
+        return ProcessingResult(
+            success=True,
+            content=content,
+            metadata=metadata
+        )
@@ -4,21 +4,26 @@ PDF处理器
 """
 
 import os
+import sys
 import json
-import base64
+import mmap
+import multiprocessing
 import tempfile
+import threading
 import time
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
-from .base import BaseProcessor, ProcessingResult
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+from .base import BaseProcessor, ProcessingResult, IO_BUFFER_SIZE, BASE64_PLACEHOLDER
 from zhipu_ocr_client import ZhipuOCRClient, process_scanned_pdf_with_zhipu
 import re
-import pdfplumber
 # PDF处理相关导入
 try:
-    from docling.datamodel.base_models import InputFormat
-    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.datamodel.base_models import ConversionStatus, InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, AcceleratorOptions, AcceleratorDevice, TableFormerMode
     #from docling.datamodel.accelerator_options import AcceleratorOptions, AcceleratorDevice #20250802lrr注释，本地报错
     from docling.document_converter import DocumentConverter, PdfFormatOption
     from docling_core.types.doc import ImageRefMode
@@ -31,6 +36,7 @@ except ImportError:
 # 扫描PDF检测
 try:
     import fitz  # PyMuPDF
+    from .pdf_text_worker import extract_page_texts, read_page_text
     PYMUPDF_AVAILABLE = True
 except ImportError:
     PYMUPDF_AVAILABLE = False
@@ -42,10 +48,102 @@ try:
 except ImportError:
     PYPDF2_AVAILABLE = False
 
+# PDF类型分析中的逐字符统计
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+@lru_cache(maxsize=1)
+def _digit_table():
+    """所有Unicode码位是否为数字（与 str.isdigit 一致）的查找表，首次使用时构建（约1MB）"""
+    table = np.zeros(sys.maxunicode + 1, dtype=bool)
+    table[[code for code in range(sys.maxunicode + 1) if chr(code).isdigit()]] = True
+    return table
+
+
+def _count_digits(text: str) -> int:
+    """统计文本中的数字字符数，按码位查表向量化计算"""
+    if not NUMPY_AVAILABLE:
+        return sum(1 for char in text if char.isdigit())
+    codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    return int(np.count_nonzero(_digit_table()[codes]))
+
+
+@lru_cache(maxsize=1)
+def _detect_accelerator_device() -> str:
+    """检测docling可用的最佳设备（mps/cuda/cpu），torch探测每个进程只执行一次"""
+    import torch
+    if torch.backends.mps.is_available():
+        return 'mps'
+    if torch.cuda.is_available():
+        return 'cuda'
+    return 'cpu'
+
+
+@lru_cache(maxsize=4)
+def _build_doc_converter(artifacts_path: Optional[str], device_name: str, tableformer_mode: str, num_threads: int):
+    """按配置创建docling转换器，返回 (转换器, PDF处理选项)，结果由lru_cache缓存复用"""
+    # 配置PDF处理选项
+    pipeline_options = PdfPipelineOptions(artifacts_path=artifacts_path)
+    pipeline_options.do_ocr = False
+    pipeline_options.do_table_structure = True
+    pipeline_options.table_structure_options.do_cell_matching = False
+    pipeline_options.table_structure_options.mode = (
+        TableFormerMode.FAST if tableformer_mode == 'fast' else TableFormerMode.ACCURATE
+    )
+    pipeline_options.generate_page_images = False
+    pipeline_options.generate_picture_images = False
+    
+    # 配置加速器选项
+    pipeline_options.accelerator_options = AcceleratorOptions(
+        num_threads=num_threads,  # 每个worker进程的推理线程数，多个worker时应按CPU核数分摊
+        device=AcceleratorDevice(device_name)  # 使用检测到的最佳设备
+    )
+    
+    converter = DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        }
+    )
+    # docling默认在首次convert()时才创建流水线并加载版面/表格模型，这里立即加载，
+    # 使预加载（及 /api/health 的就绪状态）覆盖模型加载耗时，首个请求不再等待
+    converter.initialize_pipeline(InputFormat.PDF)
+    return converter, pipeline_options
+
+
+# 多个处理器实例同时初始化时只创建一个转换器
+_doc_converter_lock = threading.Lock()
+
+
+def _get_doc_converter(artifacts_path: Optional[str], device_name: str, tableformer_mode: str, num_threads: int):
+    """获取共享的docling转换器，同一配置在进程内只加载一次模型"""
+    with _doc_converter_lock:
+        return _build_doc_converter(artifacts_path, device_name, tableformer_mode, num_threads)
+
+
+# Markdown清洗用的正则，模块加载时编译一次
+# 图片引用的替代文本和链接用字符类匹配，避免 .*? 回溯
+_MARKDOWN_IMAGE_RE = re.compile(r'!\[[^\]\n]*\]\([^)\n]*\)')
+# 所有<img>标签（包括内嵌base64数据的图片）
+# 两种图片保持为独立的模式：各自有固定前缀可快速定位，合并为分支后无图片的长文本反而慢数倍
+_HTML_IMAGE_RE = re.compile(r'<img[^>]*>', re.IGNORECASE)
+# 空白已合并为单个空格后的PDF文本瑕疵：断词连字符（"-"后接空格和单词字符）、标点前的空格
+_TEXT_ARTIFACT_RE = re.compile(r'- (\w)| ([.,;:!?)])')
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n')
+_LINE_ENDING_RE = re.compile(r'\r\n?')
+
 
 class PDFProcessor(BaseProcessor):
     """PDF文档处理器"""
     
+    # 页数达到该值时才多进程并行提取文本，页数少时启动/通信开销大于收益
+    PARALLEL_TEXT_MIN_PAGES = 32
+    # 每个子进程任务提取的页数
+    PARALLEL_TEXT_PAGES_PER_TASK = 16
+    
     def __init__(self, config: Dict[str, Any] = None):
         """
         初始化PDF处理器
@@ -64,70 +162,193 @@ class PDFProcessor(BaseProcessor):
     
         # 处理选项
         self.save_intermediate = config.get('save_intermediate', False) if config else False
+        
+        # MonkeyOCR接口的长连接会话
+        self.session = self.create_session(self._get_int_config('api_max_concurrency', 4))
+        
+        # 智谱OCR客户端在首次处理扫描PDF时创建，之后跨文件复用其连接池
+        self._zhipu_client = None
+        self._zhipu_client_lock = threading.Lock()
+        
+        # 多页文本并行提取的进程池，首次遇到大文档时创建
+        self._page_text_pool = None
+        self._page_text_pool_lock = threading.Lock()
     
     def _init_converter(self):
-        """初始化文档转换器"""
-        
-                # 导入加速器选项
-        from docling.datamodel.pipeline_options import AcceleratorOptions, AcceleratorDevice
-        import torch
-        # 检测可用的设备
-        if torch.backends.mps.is_available():
-            device = AcceleratorDevice.MPS
+        """初始化文档转换器（同一配置的转换器及其模型在进程内共享）"""
+        device_name = _detect_accelerator_device()
+        if device_name == 'mps':
             self.logger.info("检测到MPS支持，将使用Apple Silicon GPU加速")
-        elif torch.cuda.is_available():
-            device = AcceleratorDevice.CUDA
+        elif device_name == 'cuda':
             self.logger.info("检测到CUDA支持，将使用NVIDIA GPU加速")
         else:
-            device = AcceleratorDevice.CPU
             self.logger.info("使用CPU处理")
         
+        # Docling 的版面/表格模型没有提供半精度参数，CUDA上允许float32矩阵乘法和卷积使用TF32张量核心
+        if device_name == 'cuda' and self.config.get('docling_half_precision', False):
+            import torch
+            torch.set_float32_matmul_precision('high')
+            torch.backends.cudnn.allow_tf32 = True
+            self.logger.info("已开启TF32低精度矩阵运算")
+        
         # 检查是否有本地模型路径
         artifacts_path = os.environ.get('DOCLING_ARTIFACTS_PATH')
         if artifacts_path and Path(artifacts_path).exists():
             self.logger.info(f"使用本地模型路径: {artifacts_path}")
-
-        # 配置PDF处理选项
-        pipeline_options = PdfPipelineOptions(
-            artifacts_path=artifacts_path if artifacts_path and Path(artifacts_path).exists() else None
-        )
-        pipeline_options.do_ocr = False
-        pipeline_options.do_table_structure = True
-        pipeline_options.table_structure_options.do_cell_matching = False
+        else:
+            artifacts_path = None
         
         # 配置表格模型模式 (fast 或 accurate)
         tableformer_mode = self.config.get('docling_tableformer_mode', 'fast') if self.config else 'fast'
-        if tableformer_mode.lower() == 'fast':
-            from docling.datamodel.pipeline_options import TableFormerMode
-            pipeline_options.table_structure_options.mode = TableFormerMode.FAST
+        tableformer_mode = 'fast' if tableformer_mode.lower() == 'fast' else 'accurate'
+        if tableformer_mode == 'fast':
             self.logger.info("✅ 使用fast表格模型 (更快但精度稍低)")
         else:
-            from docling.datamodel.pipeline_options import TableFormerMode
-            pipeline_options.table_structure_options.mode = TableFormerMode.ACCURATE
             self.logger.info("✅ 使用accurate表格模型 (更精确但较慢)")
         
-        pipeline_options.generate_page_images = False
-        pipeline_options.generate_picture_images = False
-    
-        # 配置加速器选项
-        pipeline_options.accelerator_options = AcceleratorOptions(
-            num_threads=8,  # 使用8个线程
-            device=device   # 使用检测到的最佳设备
-        )
-        
         # 创建转换器
-        self.doc_converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-            }
+        num_threads = max(1, self._get_int_config('docling_num_threads', 8))
+        self.doc_converter, self.pipeline_options = _get_doc_converter(
+            artifacts_path, device_name, tableformer_mode, num_threads
         )
-        self.pipeline_options = pipeline_options
-        self.pipeline_options = pipeline_options
+    
+    def close(self):
+        """关闭HTTP会话和文本提取进程池"""
+        self.session.close()
+        if self._zhipu_client is not None:
+            self._zhipu_client.close()
+        if self._page_text_pool is not None:
+            self._page_text_pool.shutdown(wait=False, cancel_futures=True)
     
     def get_supported_extensions(self) -> list:
         """获取支持的文件扩展名"""
         return ['.pdf']
     
+    def is_cacheable(self, result: ProcessingResult) -> bool:
+        """
+        部分失败的结果不缓存：OCR有分段/页面失败（内容中是失败占位注释）或docling只部分转换成功时，
+        下次请求重新处理
+        
+        Args:
+            result: 处理结果
+            
+        Returns:
+            bool: 是否可以缓存
+        """
+        metadata = result.metadata
+        return (
+            result.success
+            and not metadata.get('chunks_failed')
+            and not metadata.get('pages_failed')
+            and metadata.get('docling_status', ConversionStatus.SUCCESS.value) == ConversionStatus.SUCCESS.value
+        )
+    
+    def get_zhipu_client(self) -> Optional[ZhipuOCRClient]:
+        """
+        获取共享的智谱OCR客户端
+        
+        Returns:
+            Optional[ZhipuOCRClient]: 客户端实例，未配置智谱API密钥时为None
+        """
+        zhipuai_api_key = self.config.get('zhipuai_api_key') if self.config else None
+        if not zhipuai_api_key:
+            return None
+        
+        with self._zhipu_client_lock:
+            if self._zhipu_client is None:
+                self._zhipu_client = ZhipuOCRClient(
+                    api_key=zhipuai_api_key,
+                    api_url=self.config.get('zhipuai_ocr_api_url'),
+                    language_type=self.config.get('zhipuai_ocr_language_type', 'CHN_ENG'),
+                    rate_limiter=self.get_rate_limiter('zhipu'),
+                    pool_size=self._get_int_config('api_max_concurrency', 4)
+                )
+            return self._zhipu_client
+    
+    def get_page_text_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        获取多页文本并行提取的进程池
+        
+        子进程使用spawn方式启动：gunicorn worker中已加载模型并启动了多个线程，fork不安全
+        
+        Returns:
+            Optional[ProcessPoolExecutor]: 进程池，pdf_text_workers 不大于1时为None（串行提取）
+        """
+        max_workers = self._get_page_text_workers()
+        if max_workers <= 1:
+            return None
+        
+        with self._page_text_pool_lock:
+            if self._page_text_pool is None:
+                self._page_text_pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._page_text_pool
+    
+    def _discard_page_text_pool(self, pool: ProcessPoolExecutor):
+        """丢弃已损坏的进程池（如子进程被OOM杀死），下次需要时重新创建"""
+        with self._page_text_pool_lock:
+            if self._page_text_pool is pool:
+                self._page_text_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _get_page_text_workers(self) -> int:
+        """并行提取文本的进程数，默认1（串行，不启动子进程）"""
+        return self._get_int_config('pdf_text_workers', 1)
+    
+    def iter_page_texts(self, pdf_path: Path, doc) -> Iterator[str]:
+        """
+        按页序逐页产出文本
+        
+        页数较多时按批提交到进程池并行提取，每批取完再提交下一批，调用方提前结束迭代时
+        不会提取剩余页面；进程池不可用时该批页面回退到在当前进程中提取
+        
+        Args:
+            pdf_path: PDF文件路径
+            doc: 已打开的PyMuPDF文档
+            
+        Yields:
+            str: 页面文本，未引用字体的页面为空字符串
+        """
+        pages_count = len(doc)
+        pool = self.get_page_text_pool() if pages_count >= self.PARALLEL_TEXT_MIN_PAGES else None
+        if pool is None:
+            for page in doc:
+                yield read_page_text(page)
+            return
+        
+        step = self.PARALLEL_TEXT_PAGES_PER_TASK
+        batch_pages = step * self._get_page_text_workers()
+        for batch_start in range(0, pages_count, batch_pages):
+            batch_stop = min(batch_start + batch_pages, pages_count)
+            try:
+                futures = [
+                    (start, pool.submit(extract_page_texts, str(pdf_path), start, min(start + step, batch_stop)))
+                    for start in range(batch_start, batch_stop, step)
+                ]
+            except BrokenProcessPool as e:
+                self.logger.warning(f"PDF文本提取进程池不可用，剩余页面改为逐页提取: {e}")
+                self._discard_page_text_pool(pool)
+                for page_num in range(batch_start, pages_count):
+                    yield read_page_text(doc[page_num])
+                return
+            
+            try:
+                for start, future in futures:
+                    try:
+                        texts = future.result()
+                    except Exception as e:
+                        self.logger.warning(f"并行提取PDF文本失败，改为逐页提取: {e}")
+                        if isinstance(e, BrokenProcessPool):
+                            self._discard_page_text_pool(pool)
+                        texts = [read_page_text(doc[page_num]) for page_num in range(start, min(start + step, batch_stop))]
+                    yield from texts
+            finally:
+                # 调用方提前结束时取消尚未开始的任务
+                for _, future in futures:
+                    future.cancel()
+    
     def is_scanned_pdf(self, file_path: Path) -> bool:
         """
         检测PDF是否为扫描件
@@ -149,8 +370,11 @@ class PDFProcessor(BaseProcessor):
             
             for page_num in range(sample_pages):
                 page = doc[page_num]
-                text = page.get_text()
-                total_chars += len(text.strip())
+                # 页面未引用任何字体时不可能有文本层，跳过文本提取
+                if not page.get_fonts():
+                    continue
+                # blocks 模式按文本块返回，不做逐行整理；flags=0 关闭连字/空白等额外处理
+                total_chars += sum(len(block[4].strip()) for block in page.get_text("blocks", flags=0))
             
             doc.close()
             
@@ -192,42 +416,53 @@ class PDFProcessor(BaseProcessor):
         sections: List[str] = [f"# {file_path.stem}\n"]
 
         with tempfile.TemporaryDirectory(prefix="pdf_ocr_chunks_") as temp_dir:
-            chunks = self._split_pdf_for_ocr(file_path, chunk_size, Path(temp_dir))
-            chunk_metadata['chunks_total'] = len(chunks)
+            # 各分块的OCR请求相互独立，耗时几乎全部是等待接口响应，提交到线程池并发执行
+            # （实际并发仍受 monkey_ocr 限流器控制），结果按分块顺序拼接。
+            # 分块边写出边提交，拆分后续分块与已提交分块的上传/识别同时进行
+            max_workers = max(1, self._get_int_config('ocr_page_workers', 8))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='monkey-ocr') as executor:
+                chunks: List[Tuple[Path, int, int]] = []
+                futures = []
+                for index, (chunk_path, start_page, end_page) in enumerate(
+                    self._iter_pdf_chunks(file_path, chunk_size, Path(temp_dir)), start=1
+                ):
+                    if delay > 0 and index > 1:
+                        time.sleep(delay)
+
+                    self.logger.info(
+                        f"扫描PDF OCR: 第 {index} 段, 页码 {start_page}-{end_page}, 文件大小 {chunk_path.stat().st_size} 字节"
+                    )
+                    chunks.append((chunk_path, start_page, end_page))
+                    futures.append(
+                        executor.submit(self._call_scanned_pdf_api, chunk_path, ocr_api_url, timeout)
+                    )
 
-            if not chunks:
-                raise RuntimeError("PDF分块失败，未生成任何章节")
+                chunk_metadata['chunks_total'] = len(chunks)
+                if not chunks:
+                    raise RuntimeError("PDF分块失败，未生成任何章节")
 
-            for index, (chunk_path, start_page, end_page) in enumerate(chunks, start=1):
-                self.logger.info(
-                    f"扫描PDF OCR: 第 {index}/{len(chunks)} 段, 页码 {start_page}-{end_page}, 文件大小 {chunk_path.stat().st_size} 字节"
-                )
+                for index, ((chunk_path, start_page, end_page), future) in enumerate(zip(chunks, futures), start=1):
+                    try:
+                        formatted_content = self._format_ocr_markdown(future.result())
 
-                try:
-                    raw_content = self._call_scanned_pdf_api(chunk_path, ocr_api_url, timeout)
-                    formatted_content = self._format_ocr_markdown(raw_content)
+                        if formatted_content:
+                            chunk_metadata['chunks_succeeded'] += 1
+                            sections.append(
+                                f"## 第 {index} 部分 (页码: {start_page}-{end_page})\n\n{formatted_content}\n"
+                            )
+                        else:
+                            chunk_metadata['chunks_failed'] += 1
+                            sections.append(f"<!-- OCR接口返回空内容: {chunk_path.name} -->\n")
 
-                    if formatted_content:
-                        chunk_metadata['chunks_succeeded'] += 1
+                    except Exception as exc:
+                        chunk_metadata['chunks_failed'] += 1
+                        self.logger.error(
+                            f"扫描PDF OCR失败 (段 {index}): {exc}",
+                            exc_info=True
+                        )
                         sections.append(
-                            f"## 第 {index} 部分 (页码: {start_page}-{end_page})\n\n{formatted_content}\n"
+                            f"<!-- OCR处理失败: {chunk_path.name} - {exc} -->\n"
                         )
-                    else:
-                        chunk_metadata['chunks_failed'] += 1
-                        sections.append(f"<!-- OCR接口返回空内容: {chunk_path.name} -->\n")
-
-                except Exception as exc:
-                    chunk_metadata['chunks_failed'] += 1
-                    self.logger.error(
-                        f"扫描PDF OCR失败 (段 {index}): {exc}",
-                        exc_info=True
-                    )
-                    sections.append(
-                        f"<!-- OCR处理失败: {chunk_path.name} - {exc} -->\n"
-                    )
-
-                if delay > 0 and index < len(chunks):
-                    time.sleep(delay)
 
         if chunk_metadata['chunks_succeeded'] == 0:
             raise RuntimeError("OCR接口未返回可用内容，请检查服务状态")
@@ -251,23 +486,35 @@ class PDFProcessor(BaseProcessor):
             self.logger.warning(f"配置项 {key}={value} 无效，使用默认值 {default}")
             return default
 
-    def _split_pdf_for_ocr(self, pdf_path: Path, chunk_size: int, temp_dir: Path) -> List[Tuple[Path, int, int]]:
+    def _iter_pdf_chunks(self, pdf_path: Path, chunk_size: int, temp_dir: Path) -> Iterator[Tuple[Path, int, int]]:
         if chunk_size <= 0:
             self.logger.warning("扫描PDF分块大小配置无效，使用默认值50")
             chunk_size = 50
 
-        try:
-            reader = PdfReader(str(pdf_path))
-        except Exception as exc:
-            self.logger.error(f"读取PDF失败: {exc}")
-            raise
+        # PdfReader 传入路径时会把整个文件读入内存（BytesIO），改为传入内存映射，由内核按需换页
+        with open(pdf_path, 'rb') as pdf_file:
+            try:
+                pdf_map = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except Exception as exc:
+                self.logger.error(f"读取PDF失败: {exc}")
+                raise
 
+            with pdf_map:
+                try:
+                    reader = PdfReader(pdf_map)
+                except Exception as exc:
+                    self.logger.error(f"读取PDF失败: {exc}")
+                    raise
+
+                yield from self._write_pdf_chunks(reader, pdf_path, chunk_size, temp_dir)
+
+    def _write_pdf_chunks(self, reader, pdf_path: Path, chunk_size: int, temp_dir: Path) -> Iterator[Tuple[Path, int, int]]:
         total_pages = len(reader.pages)
         if total_pages == 0:
             self.logger.warning("PDF文件没有可用页面")
-            return []
+            return
 
-        chunk_files: List[Tuple[Path, int, int]] = []
+        chunk_count = 0
         temp_dir = Path(temp_dir)
 
         for start in range(0, total_pages, chunk_size):
@@ -279,23 +526,25 @@ class PDFProcessor(BaseProcessor):
             chunk_filename = f"{pdf_path.stem}_pages_{start + 1}-{end}.pdf"
             chunk_path = temp_dir / chunk_filename
 
-            with open(chunk_path, 'wb') as output:
+            # PdfWriter 按对象逐个小块写入，使用大缓冲区合并写操作
+            with open(chunk_path, 'wb', buffering=IO_BUFFER_SIZE) as output:
                 writer.write(output)
 
-            chunk_files.append((chunk_path, start + 1, end))
+            chunk_count += 1
+            yield chunk_path, start + 1, end
 
         self.logger.info(
-            f"扫描PDF分块完成: 总页数={total_pages}, 分块大小={chunk_size}, 分块数量={len(chunk_files)}"
+            f"扫描PDF分块完成: 总页数={total_pages}, 分块大小={chunk_size}, 分块数量={chunk_count}"
         )
 
-        return chunk_files
-
     def _call_scanned_pdf_api(self, chunk_path: Path, ocr_api_url: str, timeout: int) -> str:
         try:
-            with open(chunk_path, 'rb') as file_handle:
-                file_b64 = base64.b64encode(file_handle.read()).decode('utf-8')
-            payload = {'file_data': file_b64, 'filename': chunk_path.name}
-            response = requests.post(ocr_api_url, json=payload, timeout=timeout)
+            payload = {'file_data': BASE64_PLACEHOLDER, 'filename': chunk_path.name}
+            body = self.build_json_body(payload, chunk_path)
+            response = self.get_rate_limiter('monkey_ocr').call(
+                self.session.post, ocr_api_url, data=body,
+                headers={'Content-Type': 'application/json'}, timeout=timeout
+            )
         except requests.exceptions.Timeout as exc:
             raise TimeoutError(f"OCR接口请求超时 ({chunk_path.name})") from exc
         except requests.exceptions.ConnectionError as exc:
@@ -312,7 +561,7 @@ class PDFProcessor(BaseProcessor):
             return ""
 
         try:
-            payload = response.json()
+            payload = self.loads_json(response.content)
         except ValueError:
             return response.text
 
@@ -332,16 +581,13 @@ class PDFProcessor(BaseProcessor):
         if not content:
             return ""
 
-        content = self._strip_inline_base64_images(content)
+        # remove_images_from_markdown 会移除所有<img>标签，内嵌base64的图片无需单独处理
         content = self.remove_images_from_markdown(content)
         return self._clean_ocr_markdown(content).strip()
 
-    def _strip_inline_base64_images(self, content: str) -> str:
-        return re.sub(r'<img[^>]+src="data:image/[^>]+>', '', content, flags=re.IGNORECASE)
-
     def _clean_ocr_markdown(self, content: str) -> str:
-        content = re.sub(r"\r\n?", "\n", content)
-        content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
+        content = _LINE_ENDING_RE.sub("\n", content)
+        content = _EXTRA_BLANK_LINES_RE.sub('\n\n', content)
 
         lines = content.split('\n')
         cleaned_lines = []
@@ -370,27 +616,27 @@ class PDFProcessor(BaseProcessor):
             str: 移除图像后的内容
         """
         # 移除图像引用 (Markdown语法和HTML标签)
-        content = re.sub(r'!\[.*?\]\(.*?\)', '', content)
-        content = re.sub(r'<img[^>]*>', '', content, flags=re.IGNORECASE)
+        content = _MARKDOWN_IMAGE_RE.sub('', content)
+        content = _HTML_IMAGE_RE.sub('', content)
         # 移除多余的空行
-        content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
+        content = _EXTRA_BLANK_LINES_RE.sub('\n\n', content)
         return content.strip()
     
     def clean_text_for_md(self,text: str) -> str:
         """Clean and format extracted text for Markdown."""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-    
-        # Handle common PDF artifacts
-        text = re.sub(r'-\s+(\w)', r'\1', text)  # Fix hyphenated words
-        text = re.sub(r'\s+([.,;:!?)])', r'\1', text)  # Fix punctuation spacing
+        text = ' '.join(text.split())
     
-        return text
+        # Fix hyphenated words and punctuation spacing in a single pass
+        return _TEXT_ARTIFACT_RE.sub(lambda match: match.group(1) or match.group(2), text)
 
     def extract_tables_from_page(self,page) -> str:
-        """Extract tables from a PDF page and format as Markdown tables."""
+        """Extract tables from a PyMuPDF page and format as Markdown tables."""
         md_tables = []
-        tables = page.extract_tables()
+        # Page.find_tables is available since PyMuPDF 1.23
+        if not hasattr(page, 'find_tables'):
+            return ""
+        tables = [table.extract() for table in page.find_tables().tables]
     
         for table in tables:
             if not table or len(table) < 1:
@@ -423,36 +669,57 @@ class PDFProcessor(BaseProcessor):
         if not os.path.exists(pdf_path):
             raise self.logger.error(f"PDF file not found: {pdf_path}")
     
-        markdown_content=""
+        # Collect parts and join once instead of repeated string concatenation
+        markdown_parts = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
+            with fitz.open(pdf_path) as pdf:
+                for page in pdf:
                     # Extract text
-                    text = page.extract_text()
+                    text = page.get_text()
                     cleaned_text = self.clean_text_for_md(text)
-                    markdown_content+=cleaned_text + "\n\n"
+                    markdown_parts.append(cleaned_text + "\n\n")
                 
                     # Extract tables if enabled
                     tables_md = self.extract_tables_from_page(page)
                     if tables_md:
-                        markdown_content+=tables_md + "\n\n"
+                        markdown_parts.append(tables_md + "\n\n")
                          
-            return markdown_content
+            return "".join(markdown_parts)
     
         except Exception as e:
             self.logger.error(f"Failed to convert PDF: {str(e)}")
 
     def analyze_pdf(self, pdf_path):
+        """判断PDF类型：text（纯文本）、scanned（扫描件）或 hybrid（复杂布局，使用docling）"""
+        return self._analyze(pdf_path)[0]
+    
+    def _analyze(self, pdf_path) -> Tuple[str, int, Optional[List[str]]]:
+        """
+        分析PDF类型，同时返回分析过程中得到的页数和各页文本，供随后的内容提取复用，
+        避免再次打开文档、重复提取文本
+        
+        Args:
+            pdf_path: PDF文件路径
+            
+        Returns:
+            Tuple[str, int, Optional[List[str]]]: (PDF类型, 页数, 各页文本)；只有纯文本PDF返回各页文本，其余类型为None
+        """
         doc = fitz.open(pdf_path)
-        has_text = any(page.get_text() for page in doc)  # 是否包含文本层
+        has_text = False  # 是否包含文本层
         
         # 检测复杂语义：表格、多列布局、复杂格式等
         has_complex_layout = False
         total_text_length = 0
         table_count = 0
+        page_texts = []
         
-        for page in doc:
-            page_text = page.get_text()
+        page_text_iter = self.iter_page_texts(pdf_path, doc)
+        for page_text in page_text_iter:
+            # 每页只提取一次文本
+            page_texts.append(page_text)
+            if not page_text:
+                continue
+            has_text = True
             total_text_length += len(page_text)
             
             # 检测表格特征
@@ -474,27 +741,39 @@ class PDFProcessor(BaseProcessor):
                 has_complex_layout = True
             
             # 3. 检测多列布局（文本行长度差异很大）
-            line_lengths = [len(line.strip()) for line in lines if line.strip()]
+            line_lengths = [len(stripped) for stripped in map(str.strip, lines) if stripped]
             if len(line_lengths) > 5:
-                avg_length = sum(line_lengths) / len(line_lengths)
-                variance = sum((l - avg_length) ** 2 for l in line_lengths) / len(line_lengths)
+                if NUMPY_AVAILABLE:
+                    variance = float(np.var(line_lengths))
+                else:
+                    # 行长度为整数，用平方和在整数域上精确计算总体方差，只遍历一次
+                    count = len(line_lengths)
+                    variance = (count * sum(l * l for l in line_lengths) - sum(line_lengths) ** 2) / (count * count)
                 if variance > 1000:  # 行长度差异很大
                     has_complex_layout = True
                 
             # 4. 检测数字密集区域（可能是表格数据）
-            digit_ratio = sum(1 for char in page_text if char.isdigit()) / len(page_text) if page_text else 0
+            digit_ratio = _count_digits(page_text) / len(page_text) if page_text else 0
             if digit_ratio > 0.15:  # 数字占比超过15%，可能包含大量表格数据
                 has_complex_layout = True
+            
+            # 已有足够文本且检测到复杂布局时结果必然是 hybrid，不必再检查后续页面
+            if has_complex_layout and total_text_length >= 100:
+                break
+        page_text_iter.close()
         
+        pages_count = len(doc)
         doc.close()
         
         # 判断PDF类型
         if not has_text or total_text_length < 100:
-            return "scanned"  # 无文本或文本很少，需要OCR
+            pdf_type = "scanned"  # 无文本或文本很少，需要OCR
         elif has_complex_layout or table_count >= 2:  # 有复杂布局或多个表格
-            return "hybrid"  # 使用docling处理
+            pdf_type = "hybrid"  # 使用docling处理
         else:
-            return "text"  # 纯文本，直接提取
+            pdf_type = "text"  # 纯文本，直接提取
+        
+        return pdf_type, pages_count, page_texts if pdf_type == "text" else None
     
     def process(self, file_path: Path) -> ProcessingResult:
         """
@@ -507,83 +786,81 @@ class PDFProcessor(BaseProcessor):
             ProcessingResult: 处理结果
         """
         try:
-            markdown_content=""
-            pdf_type = self.analyze_pdf(file_path)
-            scanned_details: Dict[str, Any] = {}
-
-           #根据pdf_type实现合适的处理方式，如果是text，就采用
-            if pdf_type == "text":
-                #markdown_content=self.convert_pdf_to_md(file_path) #LRR：这个版本还能提取表格，正则提取，不过我觉得效果太差，还不如简单版本
-                #PyMuPDF直接提取
-                doc = fitz.open(file_path)
-                markdown_content = ""
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    page_text = page.get_text()
-                    if page_text.strip():
-                        markdown_content += f"\n\n## 第 {page_num + 1} 页\n\n{page_text}"
-                doc.close()
-            elif pdf_type == "scanned":
-                zhipuai_api_key = self.config.get('zhipuai_api_key') if self.config else None
-                if zhipuai_api_key:
-                    self.logger.info("检测到扫描PDF，使用智谱OCR服务处理")
-                    zhipu_client = ZhipuOCRClient(
-                        api_key=zhipuai_api_key,
-                        api_url=self.config.get('zhipuai_ocr_api_url'),
-                        language_type=self.config.get('zhipuai_ocr_language_type', 'CHN_ENG')
-                    )
-                    markdown_content, scanned_details = process_scanned_pdf_with_zhipu(
-                        file_path=file_path,
-                        zhipu_client=zhipu_client,
-                        logger_instance=self.logger,
-                        delay=self._get_float_config('scanned_pdf_request_delay', 0.0),
-                        timeout=self._get_int_config('scanned_pdf_api_timeout', 300)
-                    )
-                else:
-                    self.logger.info("检测到扫描PDF，使用MonkeyOCR接口处理")
-                    markdown_content, scanned_details = self.process_scanned_pdf(file_path)
-            else:  # 混合型
-                conv_result = self.doc_converter.convert(str(file_path))
-                #直接导出Markdown
-                markdown_content = conv_result.document.export_to_markdown(
-                    image_mode=ImageRefMode.EMBEDDED
-                )
-                # 移除图像引用
-                markdown_content = self.remove_images_from_markdown(markdown_content)
-                
+            return self._process_by_type(file_path, self._analyze(file_path))
             
-            if not markdown_content:
-                return ProcessingResult(
-                    success=False,
-                    error="未能提取到文档内容"
-                )
+        except Exception as e:
+            error_msg = f"处理PDF文件失败: {str(e)}"
+            self.logger.error(error_msg, exc_info=True)
+            return ProcessingResult(
+                success=False,
+                error=error_msg
+            )
+    
+    def process_batch(self, file_paths: List[Path]) -> List[ProcessingResult]:
+        """
+        批量处理PDF文件
+        
+        需要docling解析的混合型PDF合并为一次 convert_all 调用，模型与设备只初始化一次、
+        批次内共享；纯文本和扫描PDF仍逐个处理。混合型PDF的处理时间按批次内平均值计。
+        命中结果缓存的文件不再解析，与单文件处理行为一致。
+        
+        Args:
+            file_paths: PDF文件路径列表
             
-            # 构建元数据
-            if pdf_type in ["text", "scanned"]:
-                # 获取页数
-                doc = fitz.open(file_path)
-                pages_count = len(doc)
-                doc.close()
-            else:
-                # 混合型，从conv_result获取
-                pages_count = len(conv_result.document.pages) if conv_result and conv_result.document.pages else 0
+        Returns:
+            List[ProcessingResult]: 与输入顺序一致的处理结果
+        """
+        results: List[Optional[ProcessingResult]] = [None] * len(file_paths)
+        hybrid_items: List[Tuple[int, Path, Optional[str], tuple]] = []
+        
+        for index, file_path in enumerate(file_paths):
+            start_time = time.perf_counter()
+            if not self.validate_file(file_path):
+                results[index] = ProcessingResult(success=False, error="文件验证失败")
+                continue
             
-            metadata = {
-                'file_type': 'pdf',
-                'pdf_type': pdf_type,
-                'is_scanned': pdf_type == "scanned",
-                'pages_count': pages_count
-            }
-
-            if scanned_details:
-                metadata.update(scanned_details)
+            try:
+                # 与单文件处理共用结果缓存
+                cache_key, cached = self.lookup_cached_result(file_path, start_time)
+                if cached is not None:
+                    results[index] = cached
+                    continue
+                analysis = self._analyze(file_path)
+            except Exception as e:
+                error_msg = f"处理PDF文件失败: {str(e)}"
+                self.logger.error(error_msg, exc_info=True)
+                results[index] = ProcessingResult(success=False, error=error_msg)
+                continue
             
-            return ProcessingResult(
-                success=True,
-                content=markdown_content,
-                metadata=metadata
+            if analysis[0] == "hybrid":
+                hybrid_items.append((index, file_path, cache_key, analysis))
+                continue
+            
+            results[index] = self._process_by_type_safe(file_path, analysis)
+            self.store_cached_result(cache_key, results[index])
+            results[index].processing_time = time.perf_counter() - start_time
+        
+        if hybrid_items:
+            start_time = time.perf_counter()
+            self.logger.info(f"批量docling转换: {len(hybrid_items)} 个混合型PDF")
+            conv_results = self.doc_converter.convert_all(
+                [str(file_path) for _, file_path, _, _ in hybrid_items],
+                raises_on_error=False
             )
+            for (index, file_path, cache_key, analysis), conv_result in zip(hybrid_items, conv_results):
+                results[index] = self._process_by_type_safe(file_path, analysis, conv_result)
+                self.store_cached_result(cache_key, results[index])
             
+            average_time = (time.perf_counter() - start_time) / len(hybrid_items)
+            for index, _, _, _ in hybrid_items:
+                results[index].processing_time = average_time
+        
+        return results
+    
+    def _process_by_type_safe(self, file_path: Path, analysis: tuple, conv_result=None) -> ProcessingResult:
+        """_process_by_type 的异常安全版本，供批量处理逐个文件调用"""
+        try:
+            return self._process_by_type(file_path, analysis, conv_result)
         except Exception as e:
             error_msg = f"处理PDF文件失败: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
@@ -591,3 +868,90 @@ class PDFProcessor(BaseProcessor):
                 success=False,
                 error=error_msg
             )
+    
+    def _process_by_type(self, file_path: Path, analysis: tuple, conv_result=None) -> ProcessingResult:
+        """
+        按PDF类型提取内容并构建处理结果
+        
+        Args:
+            file_path: PDF文件路径
+            analysis: _analyze 返回的 (PDF类型, 页数, 各页文本)
+            conv_result: 混合型PDF已完成的docling转换结果，为None时在此转换
+            
+        Returns:
+            ProcessingResult: 处理结果
+        """
+        markdown_content=""
+        scanned_details: Dict[str, Any] = {}
+        
+        # 复用 _analyze 得到的页数和各页文本
+        pdf_type, analyzed_pages_count, analyzed_page_texts = analysis
+
+       #根据pdf_type实现合适的处理方式，如果是text，就采用
+        if pdf_type == "text":
+            #markdown_content=self.convert_pdf_to_md(file_path) #LRR：这个版本还能提取表格，正则提取，不过我觉得效果太差，还不如简单版本
+            #PyMuPDF直接提取（直接使用 _analyze 已提取的各页文本）
+            page_parts = []
+            for page_num, page_text in enumerate(analyzed_page_texts):
+                if page_text.strip():
+                    page_parts.append(f"\n\n## 第 {page_num + 1} 页\n\n{page_text}")
+            markdown_content = "".join(page_parts)
+        elif pdf_type == "scanned":
+            zhipu_client = self.get_zhipu_client()
+            if zhipu_client is not None:
+                self.logger.info("检测到扫描PDF，使用智谱OCR服务处理")
+                markdown_content, scanned_details = process_scanned_pdf_with_zhipu(
+                    file_path=file_path,
+                    zhipu_client=zhipu_client,
+                    logger_instance=self.logger,
+                    delay=self._get_float_config('scanned_pdf_request_delay', 0.0),
+                    timeout=self._get_int_config('scanned_pdf_api_timeout', 300),
+                    max_workers=self._get_int_config('ocr_page_workers', 8),
+                    image_format=self.config.get('zhipuai_ocr_image_format', 'jpeg')
+                )
+            else:
+                self.logger.info("检测到扫描PDF，使用MonkeyOCR接口处理")
+                markdown_content, scanned_details = self.process_scanned_pdf(file_path)
+        else:  # 混合型
+            if conv_result is None:
+                conv_result = self.doc_converter.convert(str(file_path))
+            elif conv_result.status not in (ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS):
+                raise RuntimeError(f"docling转换失败: {conv_result.status}")
+            scanned_details = {'docling_status': conv_result.status.value}
+            #直接导出Markdown；图片随后会被移除，使用占位符模式，导出时不再把图片编码为base64
+            #（未生成图片数据时EMBEDDED模式同样输出占位符，结果不变）
+            markdown_content = conv_result.document.export_to_markdown(
+                image_mode=ImageRefMode.PLACEHOLDER
+            )
+            # 移除图像引用
+            markdown_content = self.remove_images_from_markdown(markdown_content)
+            
+        
+        if not markdown_content:
+            return ProcessingResult(
+                success=False,
+                error="未能提取到文档内容"
+            )
+        
+        # 构建元数据
+        if pdf_type in ["text", "scanned"]:
+            pages_count = analyzed_pages_count
+        else:
+            # 混合型，从conv_result获取
+            pages_count = len(conv_result.document.pages) if conv_result and conv_result.document.pages else 0
+        
+        metadata = {
+            'file_type': 'pdf',
+            'pdf_type': pdf_type,
+            'is_scanned': pdf_type == "scanned",
+            'pages_count': pages_count
+        }
+
+        if scanned_details:
+            metadata.update(scanned_details)
+        
+        return ProcessingResult(
+            success=True,
+            content=markdown_content,
+            metadata=metadata
+        )
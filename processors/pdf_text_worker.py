@@ -0,0 +1,40 @@
+"""
+PDF页面文本提取（子进程任务）
+PyMuPDF调用期间不释放GIL，且同一进程内多线程使用并不安全，多页并行提取需放在独立进程中；
+本模块只依赖PyMuPDF，子进程以spawn方式导入时不会加载docling等重量级依赖
+"""
+
+from typing import List
+
+import fitz  # PyMuPDF
+
+
+def read_page_text(page) -> str:
+    """
+    提取单页文本；页面未引用任何字体时不可能有文本层，直接返回空字符串
+
+    Args:
+        page: PyMuPDF页面对象
+
+    Returns:
+        str: 页面文本
+    """
+    if not page.get_fonts():
+        return ""
+    return page.get_text()
+
+
+def extract_page_texts(pdf_path: str, start: int, stop: int) -> List[str]:
+    """
+    在子进程中打开PDF并提取 [start, stop) 范围内各页的文本
+
+    Args:
+        pdf_path: PDF文件路径
+        start: 起始页（包含）
+        stop: 结束页（不包含）
+
+    Returns:
+        List[str]: 各页文本
+    """
+    with fitz.open(pdf_path) as doc:
+        return [read_page_text(doc[page_num]) for page_num in range(start, min(stop, len(doc)))]
@@ -8,6 +8,8 @@ import os
 import shutil
 from pathlib import Path
 
+from setup_models import get_dir_size, link_or_copy
+
 def restore_models():
     """恢复模型文件"""
     
@@ -29,10 +31,10 @@ def restore_models():
         try:
             if target_models.exists():
                 shutil.rmtree(target_models)
-            shutil.copytree(system_cache, target_models)
+            shutil.copytree(system_cache, target_models, copy_function=link_or_copy)
             
             # 计算大小
-            total_size = sum(f.stat().st_size for f in target_models.rglob('*') if f.is_file())
+            total_size = get_dir_size(target_models)
             print(f"✅ 模型复制完成，大小: {total_size / 1024 / 1024:.1f} MB")
             
             # 设置缓存
@@ -70,7 +72,7 @@ def setup_cache(models_dir, cache_dir):
             models_link.symlink_to(models_dir.absolute())
             print(f"✅ 创建符号链接: {models_link} -> {models_dir}")
         except OSError:
-            shutil.copytree(models_dir, models_link)
+            shutil.copytree(models_dir, models_link, copy_function=link_or_copy)
             print(f"✅ 复制模型目录: {models_link}")
             
     except Exception as e:
@@ -91,15 +93,15 @@ def check_alternatives():
         if location.exists():
             print(f"   找到: {location}")
             if location.is_dir() and any(location.iterdir()):
+                # location 已确认存在，models_dir 无需再次检查
                 models_dir = location / "models" if (location / "models").exists() else location
-                if models_dir.exists():
-                    total_size = sum(f.stat().st_size for f in models_dir.rglob('*') if f.is_file())
-                    print(f"     大小: {total_size / 1024 / 1024:.1f} MB")
-                    
-                    # 询问是否使用
-                    response = input(f"     是否使用此位置的模型? (y/n): ").lower()
-                    if response == 'y':
-                        return models_dir
+                total_size = get_dir_size(models_dir)
+                print(f"     大小: {total_size / 1024 / 1024:.1f} MB")
+                
+                # 询问是否使用
+                response = input(f"     是否使用此位置的模型? (y/n): ").lower()
+                if response == 'y':
+                    return models_dir
         else:
             print(f"   不存在: {location}")
     
@@ -117,7 +119,7 @@ if __name__ == "__main__":
             try:
                 if target_models.exists():
                     shutil.rmtree(target_models)
-                shutil.copytree(alt_location, target_models)
+                shutil.copytree(alt_location, target_models, copy_function=link_or_copy)
                 setup_cache(target_models, target_cache)
                 print("✅ 模型恢复成功！")
             except Exception as e:
@@ -6,8 +6,32 @@
 
 import os
 import sys
+import shutil
 from pathlib import Path
 
+# get_dir_size / link_or_copy 也供 restore_models.py 使用
+def get_dir_size(root) -> int:
+    """统计目录下所有文件的总大小（字节），用 os.scandir 返回的目录项类型判断，每个文件只stat一次"""
+    total = 0
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    # 与 rglob + is_file 一致：统计指向文件的符号链接（如HuggingFace缓存）的目标大小
+                    total += entry.stat().st_size
+    return total
+
+def link_or_copy(src, dst):
+    """copytree 的复制函数：同一文件系统上创建硬链接（不占用额外空间、无需复制数据），否则复制文件"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
 def setup_models():
     """设置docling模型"""
     
@@ -23,7 +47,7 @@ def setup_models():
         print(f"   模型位置: {models_dir}")
         
         # 计算模型大小
-        total_size = sum(f.stat().st_size for f in models_dir.rglob('*') if f.is_file())
+        total_size = get_dir_size(models_dir)
         print(f"   模型大小: {total_size / 1024 / 1024:.1f} MB")
         
         # 设置缓存目录
@@ -77,15 +101,13 @@ def copy_models_to_project(source_dir, target_dir):
     print(f"   到: {target_dir}")
     
     try:
-        import shutil
-        
         if target_dir.exists():
             shutil.rmtree(target_dir)
         
-        shutil.copytree(source_dir, target_dir)
+        shutil.copytree(source_dir, target_dir, copy_function=link_or_copy)
         
         # 计算复制后的大小
-        total_size = sum(f.stat().st_size for f in target_dir.rglob('*') if f.is_file())
+        total_size = get_dir_size(target_dir)
         print(f"✅ 模型复制完成，大小: {total_size / 1024 / 1024:.1f} MB")
         
     except Exception as e:
@@ -107,7 +129,6 @@ def setup_cache_directory(models_dir, cache_dir):
             if models_link.is_symlink():
                 models_link.unlink()
             else:
-                import shutil
                 shutil.rmtree(models_link)
         
         try:
@@ -116,8 +137,7 @@ def setup_cache_directory(models_dir, cache_dir):
             print(f"✅ 创建符号链接: {models_link} -> {models_dir}")
         except OSError:
             # 如果符号链接失败，复制目录
-            import shutil
-            shutil.copytree(models_dir, models_link)
+            shutil.copytree(models_dir, models_link, copy_function=link_or_copy)
             print(f"✅ 复制模型目录: {models_link}")
         
         print(f"✅ 缓存目录设置完成: {cache_dir}")
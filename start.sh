@@ -37,9 +37,9 @@ echo "服务地址: http://localhost:$PORT"
 echo "按 Ctrl+C 停止服务"
 echo ""
 
-# 激活虚拟环境并启动
+# 激活虚拟环境并启动（gunicorn多worker，配置见 gunicorn.conf.py）
 if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
-python app.py
+exec gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,43 @@
+"""
+HTML处理器回归测试
+
+用法:
+    python -m unittest tests.test_html_processor
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from processors.html_processor import HTMLProcessor
+
+
+class HTMLProcessorCommentTest(unittest.TestCase):
+    """被移除标签内的注释不应导致处理失败"""
+
+    def setUp(self):
+        self.processor = HTMLProcessor({})
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def _process(self, html: str):
+        file_path = Path(self.temp_dir.name) / "page.html"
+        file_path.write_text(html, encoding="utf-8")
+        return self.processor.process(file_path)
+
+    def test_comment_inside_footer(self):
+        result = self._process("<html><body><footer><!-- c --></footer><p>Hello</p></body></html>")
+        self.assertTrue(result.success, result.error)
+        self.assertEqual(result.content, "Hello")
+
+    def test_comment_inside_script(self):
+        result = self._process(
+            "<html><body><script><!-- s --></script>"
+            "<nav><script>x</script><!-- n --></nav><p>Hello</p><!-- top --></body></html>"
+        )
+        self.assertTrue(result.success, result.error)
+        self.assertEqual(result.content, "Hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
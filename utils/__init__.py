@@ -5,5 +5,9 @@
 
 from .file_utils import FileUtils
 from .response_utils import ResponseUtils
+from .job_queue import JobQueue
+from .rate_limiter import RateLimiter
+from .json_provider import OrjsonProvider
+from .result_cache import ResultCache
 
-__all__ = ['FileUtils', 'ResponseUtils']
+__all__ = ['FileUtils', 'ResponseUtils', 'JobQueue', 'RateLimiter', 'OrjsonProvider', 'ResultCache']
@@ -3,13 +3,19 @@
 提供文件操作相关的工具函数
 """
 
+import io
 import os
+import re
 import uuid
 import shutil
 from pathlib import Path
 from typing import Optional, Tuple
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
+# secure_filename 会原样返回的文件名：只含ASCII字母数字和 _.-，且首尾不是 . 或 _
+_SAFE_FILENAME_RE = re.compile(r'[A-Za-z0-9-](?:[A-Za-z0-9_.-]*[A-Za-z0-9-])?')
+
 
 class FileUtils:
     """文件处理工具类"""
@@ -28,16 +34,20 @@ class FileUtils:
         # 获取文件扩展名
         name, ext = os.path.splitext(original_filename)
         
-        # 生成UUID
-        unique_id = str(uuid.uuid4())[:8]
+        # 生成UUID（十六进制形式的前8位与带横线形式相同）
+        unique_id = uuid.uuid4().hex[:8]
         
-        # 安全化文件名
-        safe_name = secure_filename(name)
+        # 安全化文件名；常见的纯ASCII安全文件名无需经过Unicode规范化和正则替换
+        # （Windows上还需检查设备名，始终走完整处理）
+        if os.name != 'nt' and _SAFE_FILENAME_RE.fullmatch(name):
+            safe_name = name
+        else:
+            safe_name = secure_filename(name)
         
         return f"{unique_id}_{safe_name}{ext}"
     
     @staticmethod
-    def save_uploaded_file(file, upload_folder: str) -> Tuple[bool, str, str]:
+    def save_uploaded_file(file, upload_folder: str) -> Tuple[bool, str, str, int]:
         """
         保存上传的文件
         
@@ -46,7 +56,7 @@ class FileUtils:
             upload_folder: 上传目录
             
         Returns:
-            Tuple[bool, str, str]: (是否成功, 文件路径, 错误信息)
+            Tuple[bool, str, str, int]: (是否成功, 文件路径, 错误信息, 写入字节数)
         """
         try:
             # 确保上传目录存在
@@ -59,13 +69,107 @@ class FileUtils:
             file_path = os.path.join(upload_folder, unique_filename)
             
             # 保存文件
-            file.save(file_path)
+            with open(file_path, 'wb') as dst:
+                bytes_written = FileUtils.copy_stream_to_file(file.stream, dst)
             
-            return True, file_path, ""
+            return True, file_path, "", bytes_written
             
         except Exception as e:
-            return False, "", f"保存文件失败: {str(e)}"
-    
+            return False, "", f"保存文件失败: {str(e)}", 0
+
+    @staticmethod
+    def copy_stream_to_file(stream, dst, chunk_size: int = 1024 * 1024) -> int:
+        """
+        将数据流复制到已打开的目标文件
+
+        数据流由磁盘文件承载时（如已溢出到磁盘的上传临时文件），使用
+        os.sendfile 在内核中完成复制，避免用户态缓冲；否则按块复制。
+
+        Args:
+            stream: 可读的二进制数据流
+            dst: 以二进制写模式打开的目标文件
+            chunk_size: 按块复制时的块大小（字节）
+
+        Returns:
+            int: 写入的字节数
+        """
+        in_fd = None
+        # 仍在内存中的SpooledTemporaryFile调用fileno()会先写入磁盘，直接按块复制更快
+        if hasattr(os, 'sendfile') and getattr(stream, '_rolled', True):
+            try:
+                in_fd = stream.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                in_fd = None
+
+        if in_fd is not None:
+            offset = stream.tell()
+            out_fd = dst.fileno()
+            sent_total = 0
+            try:
+                while True:
+                    sent = os.sendfile(out_fd, in_fd, offset + sent_total, chunk_size)
+                    if sent == 0:
+                        return sent_total
+                    sent_total += sent
+            except OSError:
+                # 部分平台（如macOS）只支持向socket发送，未写入数据时回退到按块复制
+                if sent_total:
+                    raise
+
+        return FileUtils._copy_chunks(stream, dst, chunk_size)
+
+    @staticmethod
+    def _copy_chunks(stream, dst, chunk_size: int) -> int:
+        """按块复制数据流并统计写入的字节数（等价于 shutil.copyfileobj）"""
+        bytes_written = 0
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return bytes_written
+            dst.write(chunk)
+            bytes_written += len(chunk)
+
+    @staticmethod
+    def save_stream_to_file(stream, filename: str, upload_folder: str,
+                            chunk_size: int = 1024 * 1024) -> Tuple[bool, str, str, int]:
+        """
+        将请求体数据流按块直接写入上传目录
+
+        Args:
+            stream: 可读的二进制数据流（如 request.stream）
+            filename: 原始文件名
+            upload_folder: 上传目录
+            chunk_size: 每次读取的块大小（字节）
+
+        Returns:
+            Tuple[bool, str, str, int]: (是否成功, 文件路径, 错误信息, 写入字节数)
+        """
+        file_path = ""
+        try:
+            # 确保上传目录存在
+            Path(upload_folder).mkdir(parents=True, exist_ok=True)
+
+            # 生成唯一文件名并构建文件路径
+            unique_filename = FileUtils.generate_unique_filename(filename)
+            file_path = os.path.join(upload_folder, unique_filename)
+
+            # 按块写入文件
+            with open(file_path, 'wb') as f:
+                bytes_written = FileUtils._copy_chunks(stream, f, chunk_size)
+
+            return True, file_path, "", bytes_written
+
+        except RequestEntityTooLarge:
+            # 超过 MAX_CONTENT_LENGTH，交由调用方返回413
+            if file_path:
+                FileUtils.cleanup_file(file_path)
+            raise
+
+        except Exception as e:
+            if file_path:
+                FileUtils.cleanup_file(file_path)
+            return False, "", f"保存文件失败: {str(e)}", 0
+
     @staticmethod
     def get_file_size_str(file_path: str) -> str:
         """
@@ -78,21 +182,31 @@ class FileUtils:
             str: 文件大小字符串
         """
         try:
-            size = os.path.getsize(file_path)
-            
-            # 转换为合适的单位
-            if size < 1024:
-                return f"{size} B"
-            elif size < 1024 * 1024:
-                return f"{size / 1024:.1f} KB"
-            elif size < 1024 * 1024 * 1024:
-                return f"{size / (1024 * 1024):.1f} MB"
-            else:
-                return f"{size / (1024 * 1024 * 1024):.1f} GB"
-                
+            return FileUtils.format_size(os.path.getsize(file_path))
         except Exception:
             return "Unknown"
     
+    @staticmethod
+    def format_size(size: int) -> str:
+        """
+        将字节数转换为字符串表示
+        
+        Args:
+            size: 字节数
+            
+        Returns:
+            str: 文件大小字符串
+        """
+        # 转换为合适的单位
+        if size < 1024:
+            return f"{size} B"
+        elif size < 1024 * 1024:
+            return f"{size / 1024:.1f} KB"
+        elif size < 1024 * 1024 * 1024:
+            return f"{size / (1024 * 1024):.1f} MB"
+        else:
+            return f"{size / (1024 * 1024 * 1024):.1f} GB"
+    
     @staticmethod
     def cleanup_file(file_path: str) -> bool:
         """
@@ -0,0 +1,254 @@
+"""
+异步任务队列
+在进程内使用线程池执行文件处理任务，请求线程只负责提交任务并立即返回任务ID；
+配置状态目录后任务状态同时写入该目录，多个worker进程可查询彼此的任务
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """基于线程池的异步任务队列"""
+
+    # 任务状态
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, max_workers: int = 2, result_ttl: int = 3600, state_dir: Optional[str] = None,
+                 max_runtime: int = 3 * 3600):
+        """
+        初始化任务队列
+
+        Args:
+            max_workers: 并发执行任务的工作线程数
+            result_ttl: 已完成任务结果的保留时间(秒)
+            state_dir: 任务状态目录，多个worker进程共享同一目录时可互相查询任务；为None时只保存在本进程内存中
+            max_runtime: 任务从提交起的最长处理时间(秒)；状态目录中超过该时间仍未完成的任务
+                （所在worker进程已退出或重启）视为失败
+        """
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.max_runtime = max_runtime
+        self.state_dir = Path(state_dir) if state_dir else None
+        if self.state_dir is not None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='ocr-job'
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, **kwargs) -> str:
+        """
+        提交任务
+
+        Args:
+            func: 任务函数，其返回值作为任务结果保存
+            *args: 任务函数的位置参数
+            **kwargs: 任务函数的关键字参数
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = uuid.uuid4().hex
+
+        job = {
+            'status': self.STATUS_QUEUED,
+            'created_at': time.time(),
+            'finished_at': None,
+            'result': None,
+            'error': ''
+        }
+        with self._lock:
+            self._prune_expired()
+            self._jobs[job_id] = job
+            self._save(job_id, job)
+
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict]: 任务信息副本，任务不存在或已过期时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        
+        # 由其他worker进程提交的任务
+        job = self._load(job_id)
+        if job is None:
+            return None
+        now = time.time()
+        if self._expire_unfinished(job, now):
+            return job
+        if job['finished_at'] is not None and now - job['finished_at'] > self.result_ttl:
+            return None
+        return job
+
+    def _run(self, job_id: str, func: Callable, args: tuple, kwargs: dict):
+        """在工作线程中执行任务并记录结果"""
+        self._update(job_id, status=self.STATUS_RUNNING)
+
+        try:
+            result = func(*args, **kwargs)
+            self._update(
+                job_id,
+                status=self.STATUS_FINISHED,
+                result=result,
+                finished_at=time.time()
+            )
+        except Exception as e:
+            logger.error(f"异步任务执行失败: {job_id}, 错误: {e}", exc_info=True)
+            self._update(
+                job_id,
+                status=self.STATUS_FAILED,
+                error=str(e),
+                finished_at=time.time()
+            )
+
+    def _update(self, job_id: str, **fields):
+        """更新任务信息"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                # 结果无法写入状态文件（如不能JSON序列化）时按失败处理，
+                # 避免本进程显示已完成而其他worker一直读到旧的运行中状态
+                if not self._save(job_id, job) and job['status'] == self.STATUS_FINISHED:
+                    job.update(status=self.STATUS_FAILED, result=None, error='任务结果保存失败')
+                    self._save(job_id, job)
+
+    def _expire_unfinished(self, job: Dict[str, Any], now: float) -> bool:
+        """
+        超过最长处理时间仍未完成的任务标记为失败
+
+        Args:
+            job: 任务信息（原地修改）
+            now: 当前时间
+
+        Returns:
+            bool: 是否标记为失败
+        """
+        if job['finished_at'] is not None or now - job['created_at'] <= self.max_runtime:
+            return False
+        job.update(status=self.STATUS_FAILED, error='任务处理超时或处理进程已退出', finished_at=now)
+        return True
+
+    def _prune_expired(self):
+        """清理超过保留时间的已完成任务（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and now - job['finished_at'] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._delete(job_id)
+        
+        if self.state_dir is not None:
+            self._prune_state_dir(now)
+
+    def _path_for(self, job_id: str) -> Optional[Path]:
+        # 任务ID来自URL，只接受 uuid4().hex 格式，防止路径穿越
+        if self.state_dir is None or len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        return self.state_dir / f"{job_id}.json"
+
+    def _save(self, job_id: str, job: Dict[str, Any]) -> bool:
+        """
+        写入任务状态文件，先写临时文件再原子替换，查询方不会读到不完整的内容
+
+        Returns:
+            bool: 是否写入成功（未配置状态目录时为True）
+        """
+        path = self._path_for(job_id)
+        if path is None:
+            return True
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(job, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"写入任务状态失败 ({job_id}): {e}")
+            return False
+        return True
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态文件"""
+        path = self._path_for(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取任务状态失败 ({job_id}): {e}")
+            return None
+
+    def _delete(self, job_id: str):
+        path = self._path_for(job_id)
+        if path is not None:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除任务状态失败 ({job_id}): {e}")
+
+    def _prune_state_dir(self, now: float):
+        """
+        清理状态目录中已过期的任务（包括其他worker进程的任务）；只检查超过保留时间或最长处理时间未更新的文件。
+        超过最长处理时间仍未完成的任务改写为失败，再经过保留时间后删除（调用方需持有锁）
+        """
+        try:
+            entries = list(os.scandir(self.state_dir))
+        except OSError:
+            return
+        min_age = min(self.result_ttl, self.max_runtime)
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime <= min_age:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    os.unlink(entry.path)
+                    continue
+                job_id = entry.name[:-len('.json')]
+                if job_id in self._jobs:
+                    continue
+                with open(entry.path, 'rb') as f:
+                    job = json.loads(f.read())
+                if self._expire_unfinished(job, now):
+                    self._save(job_id, job)
+                elif job.get('finished_at') is not None and now - job['finished_at'] > self.result_ttl:
+                    os.unlink(entry.path)
+            except (OSError, ValueError, KeyError):
+                continue
@@ -0,0 +1,45 @@
+"""
+JSON序列化
+使用 orjson 序列化API响应（包含大段Markdown内容时明显快于标准库json），未安装时回退到Flask默认实现
+"""
+
+import typing as t
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """基于 orjson 的Flask JSON提供器"""
+
+    # 允许非字符串键，numpy数组/标量（如Excel处理中的单元格数值）直接原生序列化，
+    # 其余序列化失败的类型交给Flask默认的 default 处理（日期、UUID、dataclass等）
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if ORJSON_AVAILABLE else 0
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        if not ORJSON_AVAILABLE:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode('utf-8')
+
+    def loads(self, s: t.Union[str, bytes], **kwargs: t.Any) -> t.Any:
+        if not ORJSON_AVAILABLE:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: t.Any, **kwargs: t.Any):
+        if not ORJSON_AVAILABLE:
+            return super().response(*args, **kwargs)
+
+        # 与 jsonify 的参数约定一致：单个参数直接序列化，多个参数视为列表，关键字参数视为字典
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs)
+
+        # orjson 直接生成bytes，省去 str -> bytes 的再次编码
+        body = orjson.dumps(obj, default=self.default, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,104 @@
+"""
+外部API限流工具
+按上游服务限制并发数和请求间隔，并在限流/服务繁忙时指数退避重试
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """上游API限流器"""
+
+    # 需要退避重试的HTTP状态码（请求频率限制 / 服务暂时不可用）
+    RETRY_STATUS_CODES = (429, 503)
+
+    _registry: Dict[str, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name: str, max_concurrency: int = 4, requests_per_second: float = 0.0,
+                 max_retries: int = 3, min_backoff: float = 1.0, max_backoff: float = 30.0):
+        """
+        初始化限流器
+
+        Args:
+            name: 上游服务名称
+            max_concurrency: 最大并发请求数
+            requests_per_second: 每秒最大请求数，0表示不限制
+            max_retries: 最大尝试次数（含首次请求）
+            min_backoff: 首次重试等待时间(秒)
+            max_backoff: 最长重试等待时间(秒)
+        """
+        self.name = name
+        self.max_retries = max(1, max_retries)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._interval_lock = threading.Lock()
+        self._next_request_time = 0.0
+
+    @classmethod
+    def for_upstream(cls, name: str, **kwargs) -> "RateLimiter":
+        """
+        获取指定上游服务的共享限流器，同一上游在进程内只创建一次
+
+        Args:
+            name: 上游服务名称
+            **kwargs: 首次创建时传给构造函数的参数
+
+        Returns:
+            RateLimiter: 限流器实例
+        """
+        with cls._registry_lock:
+            limiter = cls._registry.get(name)
+            if limiter is None:
+                limiter = cls(name, **kwargs)
+                cls._registry[name] = limiter
+            return limiter
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        在限流控制下发起请求
+
+        Args:
+            func: 发起HTTP请求的函数（如 requests.post），需返回带 status_code 的响应
+            *args: 请求函数的位置参数
+            **kwargs: 请求函数的关键字参数
+
+        Returns:
+            请求函数返回的响应对象（重试耗尽时为最后一次的响应）
+        """
+        for attempt in range(1, self.max_retries + 1):
+            with self._semaphore:
+                self._wait_for_interval()
+                response = func(*args, **kwargs)
+
+            if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+
+            # 退避等待期间释放并发名额
+            backoff = min(self.max_backoff, self.min_backoff * 2 ** (attempt - 1))
+            logger.warning(
+                f"{self.name} 返回 {response.status_code}，{backoff:.1f}秒后重试 "
+                f"({attempt}/{self.max_retries - 1})"
+            )
+            time.sleep(backoff)
+
+    def _wait_for_interval(self):
+        """保证相邻请求之间至少间隔 min_interval 秒"""
+        if not self.min_interval:
+            return
+
+        with self._interval_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            self._next_request_time = max(now, self._next_request_time) + self.min_interval
+
+        if wait > 0:
+            time.sleep(wait)
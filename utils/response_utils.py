@@ -3,9 +3,20 @@
 提供API响应格式化的工具函数
 """
 
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from flask import jsonify
 
+# 内容固定的错误响应，模块加载时构建一次，返回浅拷贝避免调用方修改共享对象
+_NO_FILE_RESPONSE = {"success": False, "error": "请选择要上传的文件", "code": 400}
+_SERVER_ERROR_RESPONSE = {"success": False, "error": "服务器内部错误", "code": 500}
+
+
+@lru_cache(maxsize=16)
+def _file_too_large_payload(max_size: str) -> Dict[str, Any]:
+    """按最大文件大小缓存413响应内容（取值只有少数几种）"""
+    return {"success": False, "error": f"文件大小超过限制，最大允许 {max_size}", "code": 413}
+
 
 class ResponseUtils:
     """响应处理工具类"""
@@ -113,10 +124,7 @@ class ResponseUtils:
         Returns:
             Dict: 响应字典
         """
-        return ResponseUtils.error_response(
-            error=f"文件大小超过限制，最大允许 {max_size}",
-            code=413
-        )
+        return _file_too_large_payload(max_size).copy()
     
     @staticmethod
     def unsupported_file_type_response(file_type: str, supported_types: list) -> Dict[str, Any]:
@@ -146,10 +154,7 @@ class ResponseUtils:
         Returns:
             Dict: 响应字典
         """
-        return ResponseUtils.error_response(
-            error="请选择要上传的文件",
-            code=400
-        )
+        return _NO_FILE_RESPONSE.copy()
     
     @staticmethod
     def server_error_response(error: str = "服务器内部错误") -> Dict[str, Any]:
@@ -162,6 +167,8 @@ class ResponseUtils:
         Returns:
             Dict: 响应字典
         """
+        if error == _SERVER_ERROR_RESPONSE["error"]:
+            return _SERVER_ERROR_RESPONSE.copy()
         return ResponseUtils.error_response(
             error=error,
             code=500
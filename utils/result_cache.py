@@ -0,0 +1,202 @@
+"""
+处理结果缓存
+按文件内容的SHA-256缓存处理结果，重复上传同一文件时跳过OCR/模型推理；
+超过保留时间的结果视为未命中，目录总大小超过上限时按写入时间从旧到新淘汰
+"""
+
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """基于目录的处理结果缓存，多个worker进程可共享同一目录"""
+
+    # 缓存格式版本，处理结果结构变化时递增以使旧缓存失效
+    VERSION = 1
+
+    # 两次清理缓存目录的最小间隔(秒)，清理需遍历整个目录，不在每次写入时进行
+    PRUNE_INTERVAL = 600
+
+    def __init__(self, cache_dir: str, max_age: int = 0, max_size: int = 0):
+        """
+        初始化结果缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_age: 结果保留时间(秒)，0表示不过期
+            max_size: 缓存目录总大小上限(字节)，0表示不限制
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+        self.max_size = max_size
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    @staticmethod
+    def file_digest(file_path: Path) -> str:
+        """
+        计算文件内容的SHA-256
+
+        直接对内存映射计算，不把文件读入内存
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 十六进制摘要
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file_handle:
+            # 空文件无法mmap
+            if os.fstat(file_handle.fileno()).st_size:
+                with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest.update(mm)
+        return digest.hexdigest()
+
+    @staticmethod
+    def config_digest(config: Dict[str, Any]) -> str:
+        """
+        计算处理器配置的短摘要
+
+        Args:
+            config: 影响处理结果的配置项
+
+        Returns:
+            str: 十六进制摘要（前16位）
+        """
+        serialized = repr(sorted(config.items(), key=lambda item: item[0]))
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]
+
+    def make_key(self, namespace: str, file_path: Path, config_digest: str = '') -> str:
+        """
+        生成缓存键
+
+        Args:
+            namespace: 命名空间（如处理器类名），不同处理器的结果互不混用
+            file_path: 文件路径
+            config_digest: 处理器配置摘要，配置不同的结果互不混用
+
+        Returns:
+            str: 缓存键
+        """
+        return f"{namespace}-v{self.VERSION}-{config_digest}-{self.file_digest(file_path)}"
+
+    def _path_for(self, key: str) -> Path:
+        # 按摘要末两位分目录，避免单个目录下文件过多
+        return self.cache_dir / key[-2:] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的处理结果
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[Dict]: 处理结果字典，未命中或缓存损坏时为None
+        """
+        path = self._path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                if self.max_age and time.time() - os.fstat(f.fileno()).st_mtime > self.max_age:
+                    return None
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取结果缓存失败 ({key}): {e}")
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """
+        写入处理结果，先写临时文件再原子替换，并发写入同一键时不会读到不完整的内容
+
+        Args:
+            key: 缓存键
+            value: 处理结果字典（需可JSON序列化）
+        """
+        path = self._path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(value, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"写入结果缓存失败 ({key}): {e}")
+            return
+        
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        """距上次清理超过 PRUNE_INTERVAL 时清理缓存目录；其他线程正在清理时直接返回"""
+        if not (self.max_age or self.max_size):
+            return
+        now = time.monotonic()
+        if now - self._last_prune < self.PRUNE_INTERVAL or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = now
+            self.prune()
+        finally:
+            self._prune_lock.release()
+
+    def prune(self):
+        """
+        清理缓存目录：删除过期结果和残留的临时文件，总大小超过上限时从最早写入的结果开始删除
+
+        多个worker进程可能同时清理同一目录，文件已被删除时忽略
+        """
+        now = time.time()
+        entries = []
+        try:
+            shards = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError as e:
+            logger.warning(f"清理结果缓存失败: {e}")
+            return
+        
+        for shard in shards:
+            try:
+                shard_entries = list(os.scandir(shard))
+            except OSError:
+                continue
+            for entry in shard_entries:
+                try:
+                    stat_result = entry.stat()
+                    age = now - stat_result.st_mtime
+                    if (entry.name.endswith('.tmp') and age > self.PRUNE_INTERVAL) or \
+                            (self.max_age and age > self.max_age):
+                        os.unlink(entry.path)
+                        continue
+                except OSError:
+                    continue
+                if not entry.name.endswith('.tmp'):
+                    entries.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+        
+        total_size = sum(size for _, size, _ in entries)
+        if not self.max_size or total_size <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
@@ -7,9 +7,12 @@ import requests
 import logging
 import time
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 
+from processors.base import BaseProcessor
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,10 +22,33 @@ class ZhipuOCRClient:
     DEFAULT_API_URL = 'https://open.bigmodel.cn/api/paas/v4/files/ocr'
     MAX_FILE_SIZE = 8 * 1024 * 1024  # 8MB
 
-    def __init__(self, api_key: str, api_url: str = None, language_type: str = 'CHN_ENG'):
+    def __init__(self, api_key: str, api_url: str = None, language_type: str = 'CHN_ENG', rate_limiter=None,
+                 pool_size: int = 4):
+        """
+        Args:
+            api_key: 智谱API密钥
+            api_url: OCR接口地址
+            language_type: 默认识别语言类型
+            rate_limiter: 可选的限流器（需提供 call(func, *args, **kwargs)），用于限制并发和退避重试
+            pool_size: 连接池大小（同时进行的请求数）
+        """
         self.api_key = api_key
         self.api_url = api_url or self.DEFAULT_API_URL
         self.language_type = language_type
+        self.rate_limiter = rate_limiter
+
+        # 所有页面的请求复用同一Session的长连接，避免逐页重新握手
+        self.session = BaseProcessor.create_session(pool_size)
+
+    def close(self):
+        """关闭HTTP会话，释放连接池中的连接"""
+        self.session.close()
+
+    def _post(self, **kwargs) -> requests.Response:
+        """向OCR接口发送请求，配置了限流器时经由限流器发送"""
+        if self.rate_limiter is not None:
+            return self.rate_limiter.call(self.session.post, self.api_url, **kwargs)
+        return self.session.post(self.api_url, **kwargs)
 
     def recognize_image(self, image_path: Path, language_type: str = None, probability: bool = False, timeout: int = 120) -> Dict[str, Any]:
         """
@@ -41,45 +67,15 @@ class ZhipuOCRClient:
         if file_size > self.MAX_FILE_SIZE:
             raise ValueError(f"图片文件大小 {file_size} 超过限制 {self.MAX_FILE_SIZE} 字节 (8MB)")
 
-        lang = language_type or self.language_type
-
-        with open(image_path, 'rb') as f:
-            files = {
-                'file': (image_path.name, f, self._get_content_type(image_path))
-            }
-            data = {
-                'tool_type': 'hand_write',
-                'language_type': lang,
-                'probability': str(probability).lower()
-            }
-            headers = {
-                'Authorization': f'Bearer {self.api_key}'
-            }
-
-            try:
-                response = requests.post(
-                    self.api_url,
-                    files=files,
-                    data=data,
-                    headers=headers,
-                    timeout=timeout
-                )
-            except requests.exceptions.Timeout:
-                raise TimeoutError(f"智谱OCR请求超时 ({image_path.name})")
-            except requests.exceptions.ConnectionError:
-                raise ConnectionError(f"无法连接到智谱OCR服务: {self.api_url}")
-            except requests.RequestException as exc:
-                raise RuntimeError(f"智谱OCR请求失败: {exc}")
-
-        if response.status_code != 200:
-            raise RuntimeError(f"智谱OCR返回错误状态 {response.status_code}: {response.text[:300]}")
-
-        result = response.json()
-
-        if result.get('status') != 'succeeded':
-            raise RuntimeError(f"智谱OCR识别失败: {result.get('message', '未知错误')}")
-
-        return result
+        # 先读入内存（最大8MB）再交给限流器：退避重试时会重新发送同一请求，
+        # 传入文件句柄的话第二次发送时句柄已读到末尾，上传的是空文件
+        return self.recognize_image_bytes(
+            image_path.read_bytes(),
+            image_path.name,
+            language_type=language_type,
+            probability=probability,
+            timeout=timeout
+        )
 
     def recognize_image_bytes(self, image_bytes: bytes, filename: str, language_type: str = None, probability: bool = False, timeout: int = 120) -> Dict[str, Any]:
         """
@@ -114,8 +110,7 @@ class ZhipuOCRClient:
         }
 
         try:
-            response = requests.post(
-                self.api_url,
+            response = self._post(
                 files=files,
                 data=data,
                 headers=headers,
@@ -161,17 +156,6 @@ class ZhipuOCRClient:
 
         return '\n'.join(lines)
 
-    @staticmethod
-    def _get_content_type(image_path: Path) -> str:
-        ext = image_path.suffix.lower()
-        content_types = {
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.bmp': 'image/bmp'
-        }
-        return content_types.get(ext, 'image/jpeg')
-
     @staticmethod
     def _get_content_type_by_suffix(suffix: str) -> str:
         content_types = {
@@ -185,10 +169,20 @@ class ZhipuOCRClient:
 
 DEFAULT_RENDER_DPI = 200
 
+# 页面图片格式：JPEG编码比PNG快且体积小得多，扫描件的识别效果基本不受影响
+DEFAULT_IMAGE_FORMAT = 'jpeg'
+JPEG_QUALITY = 85
+
+# 图片格式 -> 扩展名
+IMAGE_FORMAT_SUFFIXES = {
+    'png': '.png',
+    'jpeg': '.jpg'
+}
 
-def pdf_page_to_image(page, dpi: int = DEFAULT_RENDER_DPI) -> bytes:
+
+def pdf_page_to_image(page, dpi: int = DEFAULT_RENDER_DPI, image_format: str = DEFAULT_IMAGE_FORMAT) -> bytes:
     """
-    将PyMuPDF的page对象转为PNG图片字节
+    将PyMuPDF的page对象转为图片字节
 
     对于扫描件页面（页面内容通常是拍照后嵌入的单张图片），直接用
     page.get_pixmap()渲染会忽略图片自带的EXIF旋转信息，导致画面方向
@@ -199,23 +193,27 @@ def pdf_page_to_image(page, dpi: int = DEFAULT_RENDER_DPI) -> bytes:
     Args:
         page: fitz.Page 对象
         dpi: 渲染DPI
+        image_format: 图片格式（png 或 jpeg）
 
     Returns:
-        bytes: PNG图片字节数据
+        bytes: 图片字节数据
     """
-    corrected = _try_get_exif_corrected_image(page, dpi=dpi)
+    corrected = _try_get_exif_corrected_image(page, dpi=dpi, image_format=image_format)
     if corrected is not None:
         return corrected
 
     mat = fitz.Matrix(dpi / 72, dpi / 72)
     pix = page.get_pixmap(matrix=mat, alpha=False)
+    if image_format == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=JPEG_QUALITY)
     return pix.tobytes('png')
 
 
-def _try_get_exif_corrected_image(page, dpi: int = DEFAULT_RENDER_DPI) -> Optional[bytes]:
+def _try_get_exif_corrected_image(page, dpi: int = DEFAULT_RENDER_DPI,
+                                  image_format: str = DEFAULT_IMAGE_FORMAT) -> Optional[bytes]:
     """
     若页面内容仅由单张内嵌图片构成，且该图片带有非默认的EXIF方向信息，
-    则提取该图片并按EXIF方向校正后返回PNG字节；否则返回None，交由调用方
+    则提取该图片并按EXIF方向校正后返回图片字节；否则返回None，交由调用方
     走常规的页面渲染逻辑。
     """
     try:
@@ -257,7 +255,10 @@ def _try_get_exif_corrected_image(page, dpi: int = DEFAULT_RENDER_DPI) -> Option
             corrected = corrected.resize(new_size)
 
         buf = io.BytesIO()
-        corrected.save(buf, format='PNG')
+        if image_format == 'jpeg':
+            corrected.save(buf, format='JPEG', quality=JPEG_QUALITY)
+        else:
+            corrected.save(buf, format='PNG')
         return buf.getvalue()
     except Exception:
         return None
@@ -270,17 +271,38 @@ except ImportError:
     PYMUPDF_FOR_RENDER = False
 
 
+def _recognize_page(
+    zhipu_client: ZhipuOCRClient,
+    image_bytes: bytes,
+    page_num: int,
+    timeout: int,
+    suffix: str = '.png'
+) -> str:
+    """识别单页图片并返回文本，在线程池中执行"""
+    result = zhipu_client.recognize_image_bytes(
+        image_bytes=image_bytes,
+        filename=f"page_{page_num + 1}{suffix}",
+        timeout=timeout
+    )
+    return ZhipuOCRClient.extract_text_from_result(result)
+
+
 def process_scanned_pdf_with_zhipu(
     file_path: Path,
     zhipu_client: ZhipuOCRClient,
     logger_instance=None,
     dpi: int = 200,
     delay: float = 0.0,
-    timeout: int = 120
+    timeout: int = 120,
+    max_workers: int = 1,
+    image_format: str = DEFAULT_IMAGE_FORMAT
 ) -> Tuple[str, Dict[str, Any]]:
     """
     使用智谱OCR处理扫描PDF：逐页渲染为图片后调用OCR
 
+    页面在当前线程中依次渲染（PyMuPDF文档对象不是线程安全的），OCR请求
+    提交到线程池并发执行，最多同时缓存 2 * max_workers 页图片，结果按页码顺序拼接。
+
     Args:
         file_path: PDF文件路径
         zhipu_client: 智谱OCR客户端实例
@@ -288,6 +310,8 @@ def process_scanned_pdf_with_zhipu(
         dpi: PDF渲染DPI
         delay: 每页请求间隔(秒)
         timeout: OCR请求超时(秒)
+        max_workers: 并发OCR的页数
+        image_format: 页面图片格式（png 或 jpeg）
 
     Returns:
         (content, metadata) 元组
@@ -296,6 +320,11 @@ def process_scanned_pdf_with_zhipu(
         raise ImportError("PyMuPDF未安装，无法将PDF渲染为图片")
 
     log = logger_instance or logger
+    max_workers = max(1, max_workers)
+    if image_format not in IMAGE_FORMAT_SUFFIXES:
+        log.warning(f"不支持的页面图片格式 {image_format}，使用 {DEFAULT_IMAGE_FORMAT}")
+        image_format = DEFAULT_IMAGE_FORMAT
+    suffix = IMAGE_FORMAT_SUFFIXES[image_format]
 
     doc = fitz.open(file_path)
     total_pages = len(doc)
@@ -307,49 +336,66 @@ def process_scanned_pdf_with_zhipu(
         'pages_failed': 0
     }
 
-    sections = [f"# {file_path.stem}\n"]
+    page_sections: Dict[int, str] = {}
+    pending = {}
 
-    for page_num in range(total_pages):
-        page = doc[page_num]
-        log.info(f"智谱OCR: 处理第 {page_num + 1}/{total_pages} 页")
-
-        try:
-            image_bytes = pdf_page_to_image(page, dpi=dpi)
-
-            if len(image_bytes) > ZhipuOCRClient.MAX_FILE_SIZE:
-                scaled_dpi = int(dpi * (ZhipuOCRClient.MAX_FILE_SIZE / len(image_bytes)) ** 0.5)
-                scaled_dpi = max(scaled_dpi, 72)
-                log.warning(f"第 {page_num + 1} 页图片超过8MB，降低DPI至 {scaled_dpi} 重试")
-                image_bytes = pdf_page_to_image(page, dpi=scaled_dpi)
-
-            filename = f"page_{page_num + 1}.png"
-            result = zhipu_client.recognize_image_bytes(
-                image_bytes=image_bytes,
-                filename=filename,
-                timeout=timeout
-            )
-
-            page_text = ZhipuOCRClient.extract_text_from_result(result)
+    def collect(futures):
+        for future in futures:
+            page_num = pending.pop(future)
+            try:
+                page_text = future.result()
+            except Exception as exc:
+                metadata['pages_failed'] += 1
+                log.error(f"智谱OCR第 {page_num + 1} 页失败: {exc}", exc_info=True)
+                page_sections[page_num] = f"<!-- 第 {page_num + 1} 页OCR失败: {exc} -->\n"
+                continue
 
             if page_text:
                 metadata['pages_succeeded'] += 1
-                sections.append(f"## 第 {page_num + 1} 页\n\n{page_text}\n")
+                page_sections[page_num] = f"## 第 {page_num + 1} 页\n\n{page_text}\n"
             else:
                 metadata['pages_failed'] += 1
-                sections.append(f"<!-- 第 {page_num + 1} 页OCR返回空内容 -->\n")
-
-        except Exception as exc:
-            metadata['pages_failed'] += 1
-            log.error(f"智谱OCR第 {page_num + 1} 页失败: {exc}", exc_info=True)
-            sections.append(f"<!-- 第 {page_num + 1} 页OCR失败: {exc} -->\n")
-
-        if delay > 0 and page_num < total_pages - 1:
-            time.sleep(delay)
+                page_sections[page_num] = f"<!-- 第 {page_num + 1} 页OCR返回空内容 -->\n"
 
-    doc.close()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='zhipu-ocr') as executor:
+            for page_num in range(total_pages):
+                page = doc[page_num]
+                log.info(f"智谱OCR: 处理第 {page_num + 1}/{total_pages} 页")
+
+                try:
+                    image_bytes = pdf_page_to_image(page, dpi=dpi, image_format=image_format)
+
+                    if len(image_bytes) > ZhipuOCRClient.MAX_FILE_SIZE:
+                        scaled_dpi = int(dpi * (ZhipuOCRClient.MAX_FILE_SIZE / len(image_bytes)) ** 0.5)
+                        scaled_dpi = max(scaled_dpi, 72)
+                        log.warning(f"第 {page_num + 1} 页图片超过8MB，降低DPI至 {scaled_dpi} 重试")
+                        image_bytes = pdf_page_to_image(page, dpi=scaled_dpi, image_format=image_format)
+                except Exception as exc:
+                    metadata['pages_failed'] += 1
+                    log.error(f"智谱OCR第 {page_num + 1} 页失败: {exc}", exc_info=True)
+                    page_sections[page_num] = f"<!-- 第 {page_num + 1} 页OCR失败: {exc} -->\n"
+                    continue
+
+                future = executor.submit(_recognize_page, zhipu_client, image_bytes, page_num, timeout, suffix)
+                pending[future] = page_num
+
+                # 限制已渲染但尚未识别的页数，避免大文档一次占用过多内存
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                if delay > 0 and page_num < total_pages - 1:
+                    time.sleep(delay)
+
+            collect(list(pending))
+    finally:
+        doc.close()
 
     if metadata['pages_succeeded'] == 0:
         raise RuntimeError("智谱OCR未返回任何可用内容，请检查API Key和服务状态")
 
+    sections = [f"# {file_path.stem}\n"]
+    sections.extend(page_sections[page_num] for page_num in range(total_pages))
     content = "\n".join(sections).strip()
     return content, metadata